@@ -0,0 +1,177 @@
+"""
+Arrival statistics: how many are here, arrivals per time slot, who is
+still missing.
+
+The counts come from two summary tables that triggers in attendance_db
+update with every check-in (event_stats and arrival_buckets), so reading
+them costs the same whether 50 or 50,000 guests have arrived.
+
+The roster size and the number of roster guests who arrived are kept the
+same way (roster_stats and event_stats.arrived), so the "not yet arrived"
+count is a difference of two stored numbers.
+
+Listing who has not arrived is the roster minus the event's check-ins.
+ArrivalTracker keeps the checked-in names of the current event in a set,
+loaded once and then fed each new check-in, so the difference is a set
+lookup per roster name and is only recomputed after something changed.
+The report queries do the same difference in SQL: the event's names are
+collected once (NOT IN builds a temporary index of them) and the roster
+is checked against that, rather than probing attendance per roster name.
+"""
+
+import attendance_db
+
+SUMMARY_KEYS = ('event_id', 'checkins', 'first_at', 'last_at', 'arrived')
+
+
+def current_event(conn, day=None):
+    """(id, name) of the event covering day (default today), else the latest live one"""
+    event = attendance_db.event_for_day(conn, day or attendance_db.today(), create=False)
+    if event:
+        return event[0], event[1]
+    row = conn.execute('''
+        SELECT id, name FROM events WHERE archived_at IS NULL
+        ORDER BY last_day DESC, id DESC LIMIT 1
+    ''').fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def event_summary(conn, event_id):
+    """Check-in count, first/last arrival and per-slot arrivals of an event
+
+    Buckets are (slot start 'YYYY-MM-DD HH:MM', check-ins), oldest first.
+    'arrived' is the number of roster guests with a check-in, 'invited' the
+    roster size; both come from summary rows, not counts.
+    """
+    row = conn.execute(
+        'SELECT event_id, checkins, first_at, last_at, arrived FROM event_stats WHERE event_id = ?',
+        (event_id,)
+    ).fetchone()
+    summary = dict(zip(SUMMARY_KEYS, row)) if row else \
+        {'event_id': event_id, 'checkins': 0, 'first_at': None, 'last_at': None, 'arrived': 0}
+    summary['buckets'] = conn.execute('''
+        SELECT bucket, checkins FROM arrival_buckets
+        WHERE event_id = ? AND checkins > 0 ORDER BY bucket
+    ''', (event_id,)).fetchall()
+    summary['invited'] = attendance_db.attendee_count(conn)
+    return summary
+
+
+def missing_names(conn, event_id, limit=None):
+    """Roster names without a check-in for the event, alphabetically"""
+    query = '''
+        SELECT name FROM attendees
+        WHERE name NOT IN (SELECT name FROM attendance WHERE event_id = ?)
+        ORDER BY name
+    '''
+    params = (event_id,)
+    if limit is not None:
+        query += ' LIMIT ?'
+        params += (limit,)
+    return [name for (name,) in conn.execute(query, params)]
+
+
+def missing_count(conn, event_id):
+    """Roster names without a check-in for the event, from the summary rows"""
+    row = conn.execute('SELECT arrived FROM event_stats WHERE event_id = ?', (event_id,)).fetchone()
+    return attendance_db.attendee_count(conn) - (row[0] if row else 0)
+
+
+def peak_bucket(buckets):
+    """(slot, check-ins) of the busiest slot, or None"""
+    return max(buckets, key=lambda bucket: bucket[1]) if buckets else None
+
+
+def arrival_report(conn, event_id=None, missing_limit=0):
+    """event_summary plus the event's name and who has not arrived yet
+
+    Defaults to current_event(); returns None if there is no event at all.
+    'missing' is None for archived events, whose check-ins are no longer
+    in the database.
+    """
+    if event_id is None:
+        event = current_event(conn)
+        if event is None:
+            return None
+        event_id = event[0]
+    row = conn.execute('SELECT name, archived_at FROM events WHERE id = ?', (event_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"No event with id {event_id}")
+    report = event_summary(conn, event_id)
+    report['name'] = row[0]
+    report['archived'] = row[1] is not None
+    report['missing'] = None if report['archived'] else report['invited'] - report['arrived']
+    report['missing_names'] = []
+    if missing_limit and not report['archived']:
+        report['missing_names'] = missing_names(conn, event_id, missing_limit)
+    return report
+
+
+def format_report(report, width=40):
+    """Plain-text arrival_report with a bar per slot"""
+    title = f"{report['name']} (event {report['event_id']})"
+    lines = [title, '=' * len(title), f"Invited: {report['invited']}"]
+    if report['missing'] is not None:
+        lines.append(f"Arrived: {report['invited'] - report['missing']}")
+        lines.append(f"Not yet arrived: {report['missing']}")
+    lines.append(f"Check-ins: {report['checkins']}")
+    if report['first_at']:
+        lines.append(f"First arrival: {report['first_at']}, last: {report['last_at']}")
+
+    buckets = report['buckets']
+    if buckets:
+        peak = peak_bucket(buckets)
+        lines.append(f"Busiest {attendance_db.BUCKET_MINUTES} minutes: "
+                     f"from {peak[0]} ({peak[1]} arrivals)")
+        lines.append('')
+        for bucket, count in buckets:
+            bar = '#' * max(1, round(width * count / peak[1]))
+            lines.append(f"{bucket}  {count:>6}  {bar}")
+
+    missing = report['missing_names']
+    if missing:
+        lines.append('')
+        lines.append("Not yet arrived:")
+        lines.extend(f"  {name}" for name in missing)
+        if report['missing'] > len(missing):
+            lines.append(f"  ... and {report['missing'] - len(missing)} more")
+    return '\n'.join(lines)
+
+
+class ArrivalTracker:
+    """Names checked in to one event, kept current from new attendance rows"""
+
+    def __init__(self):
+        self.event_id = None
+        self.arrived = set()
+        self.version = 0
+        self._missing = None
+        self._missing_key = None
+
+    def load(self, conn, event_id):
+        """Start tracking an event (None clears) with its check-ins so far"""
+        self.event_id = event_id
+        if event_id is None:
+            self.arrived = set()
+        else:
+            rows = conn.execute('SELECT name FROM attendance WHERE event_id = ?', (event_id,))
+            self.arrived = {name for (name,) in rows}
+        self.version += 1
+
+    def add(self, name):
+        if name not in self.arrived:
+            self.arrived.add(name)
+            self.version += 1
+
+    def missing(self, roster):
+        """Roster names (in roster order) not checked in yet
+
+        Recomputed only when an arrival was added or the roster grew since
+        the last call.
+        """
+        key = (self.version, len(roster))
+        if self._missing_key != key:
+            arrived = self.arrived
+            self._missing = [name for name in roster if name not in arrived]
+            self._missing_key = key
+        return self._missing
@@ -0,0 +1,657 @@
+"""
+SQLite storage for the attendance system.
+
+The database runs in WAL mode with synchronous=NORMAL: readers never block
+the writer, and a commit only has to append to the WAL instead of syncing
+the main database file. Each check-in stores its event day in its own
+column, and a unique (name, day) index makes the duplicate check part of a
+single INSERT OR IGNORE.
+
+Every check-in also belongs to an event (one party, one or more days).
+Check-ins on a day no event covers get a one-day event of their own, so
+nothing has to be set up before the doors open. Queries for the event at
+hand go through the (event_id, id) index instead of the whole history, and
+past events can be moved out of the database by event_archive.archive_event.
+
+Triggers keep two summary tables in step with the attendance table:
+event_stats (check-ins and first/last arrival per event) and
+arrival_buckets (check-ins per event and BUCKET_MINUTES slot), so arrival
+statistics never have to scan the check-ins themselves.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+import qr_payload
+from roster_index import normalize_name
+
+DB_PATH = 'attendance.db'
+
+# Bumped whenever migrate() learns a new step
+SCHEMA_VERSION = 10
+
+# Name given to events created automatically for a day without one
+DEFAULT_EVENT_NAME = "Party {day}"
+
+# Width of the arrival_buckets time slots
+BUCKET_MINUTES = 15
+
+
+class EventArchived(Exception):
+    """A check-in for an event whose history has been moved to an archive"""
+
+    def __init__(self, event_id, name):
+        super().__init__(f"Event '{name}' is archived")
+        self.event_id = event_id
+        self.name = name
+
+
+def connect(path=DB_PATH, synchronous='NORMAL', check_same_thread=True):
+    """Open the database, apply connection settings and bring the schema up to date"""
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={synchronous}')
+    conn.execute('PRAGMA foreign_keys=ON')
+    init_schema(conn)
+    return conn
+
+
+def init_schema(conn):
+    """Create missing tables and run pending migrations"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            qr_code TEXT UNIQUE,
+            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            attendee_id INTEGER,
+            name TEXT NOT NULL,
+            checked_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            day TEXT,
+            FOREIGN KEY (attendee_id) REFERENCES attendees(id)
+        )
+    ''')
+    conn.commit()
+
+    migrate(conn)
+
+
+def migrate(conn):
+    """Upgrade databases created by older versions of the application"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+    with conn:
+        if version < 1:
+            _migrate_day_column(conn)
+        if version < 2:
+            _migrate_attendee_names(conn)
+        if version < 3:
+            _migrate_replication(conn)
+        if version < 4:
+            _migrate_events(conn)
+        if version < 5:
+            _migrate_arrival_stats(conn)
+        if version < 6:
+            _migrate_name_keys(conn)
+        if version < 7:
+            _migrate_event_time_index(conn)
+        if version < 8:
+            _migrate_stats_boundaries(conn)
+        if version < 9:
+            _migrate_change_seq(conn)
+        if version < 10:
+            _migrate_roster_stats(conn)
+        conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+
+def _migrate_day_column(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendance)')}
+    if 'day' not in columns:
+        conn.execute('ALTER TABLE attendance ADD COLUMN day TEXT')
+    conn.execute('UPDATE attendance SET day = DATE(checked_in_at) WHERE day IS NULL')
+
+    # Older versions compared a local timestamp with UTC DATE('now'), so a few
+    # same-day duplicates may exist. Keep the first check-in and move the rest
+    # aside instead of deleting them, so the unique index can be built.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_duplicates AS
+        SELECT * FROM attendance WHERE 0
+    ''')
+    conn.execute('''
+        INSERT INTO attendance_duplicates
+        SELECT * FROM attendance
+        WHERE id NOT IN (SELECT MIN(id) FROM attendance GROUP BY name, day)
+    ''')
+    conn.execute('''
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT MIN(id) FROM attendance GROUP BY name, day)
+    ''')
+
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_name_day
+        ON attendance (name, day)
+    ''')
+
+
+def _migrate_attendee_names(conn):
+    # The attendees table becomes the roster, one row per distinct name
+    conn.execute('''
+        DELETE FROM attendees
+        WHERE id NOT IN (SELECT MIN(id) FROM attendees GROUP BY name)
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendees_name
+        ON attendees (name)
+    ''')
+
+
+def _migrate_replication(conn):
+    # origin is NULL for check-ins made at this station, else the peer's station id
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendance)')}
+    if 'origin' not in columns:
+        conn.execute('ALTER TABLE attendance ADD COLUMN origin TEXT')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+def _migrate_events(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            first_day TEXT NOT NULL,
+            last_day TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            archived_at TIMESTAMP,
+            archive_path TEXT,
+            archived_rows INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_events_days
+        ON events (first_day, last_day)
+    ''')
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendance)')}
+    if 'event_id' not in columns:
+        conn.execute('ALTER TABLE attendance ADD COLUMN event_id INTEGER REFERENCES events(id)')
+    # Existing history becomes one event per day
+    assign_events(conn)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_event
+        ON attendance (event_id, id)
+    ''')
+
+
+def assign_events(conn):
+    """Give check-ins without an event the event of their day (one-day events as needed)"""
+    conn.execute('''
+        INSERT OR IGNORE INTO events (name, first_day, last_day)
+        SELECT REPLACE(?, '{day}', day), day, day
+        FROM (SELECT DISTINCT day FROM attendance WHERE event_id IS NULL AND day IS NOT NULL)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM events WHERE first_day <= day AND last_day >= day
+        )
+    ''', (DEFAULT_EVENT_NAME,))
+    conn.execute('''
+        UPDATE attendance SET event_id = (
+            SELECT id FROM events
+            WHERE first_day <= attendance.day AND last_day >= attendance.day
+            ORDER BY first_day DESC LIMIT 1
+        )
+        WHERE event_id IS NULL
+    ''')
+
+
+def event_for_day(conn, day, create=True):
+    """(id, name, archived) of the event covering day, or None
+
+    With create=True a day no event covers gets a one-day event (committed
+    with the caller's transaction).
+    """
+    query = '''
+        SELECT id, name, archived_at IS NOT NULL FROM events
+        WHERE first_day <= ? AND last_day >= ?
+        ORDER BY first_day DESC LIMIT 1
+    '''
+    row = conn.execute(query, (day, day)).fetchone()
+    if row is None and create:
+        # OR IGNORE: another connection may have created it a moment ago
+        conn.execute(
+            'INSERT OR IGNORE INTO events (name, first_day, last_day) VALUES (?, ?, ?)',
+            (DEFAULT_EVENT_NAME.format(day=day), day, day)
+        )
+        row = conn.execute(query, (day, day)).fetchone()
+    if row is None:
+        return None
+    event_id, name, archived = row
+    return event_id, name, bool(archived)
+
+
+def create_event(conn, name, first_day, last_day=None):
+    """Add an event covering first_day..last_day; returns its id
+
+    Not-yet-archived events lying entirely inside the range (such as the
+    automatic one-day events) are merged into the new one. Raises
+    ValueError for bad dates, a taken name or any other overlap.
+    """
+    last_day = last_day or first_day
+    for day in (first_day, last_day):
+        datetime.strptime(day, '%Y-%m-%d')
+    if last_day < first_day:
+        raise ValueError("The event ends before it starts")
+
+    overlapping = conn.execute('''
+        SELECT id, name, first_day, last_day, archived_at FROM events
+        WHERE first_day <= ? AND last_day >= ?
+    ''', (last_day, first_day)).fetchall()
+    absorbed = []
+    for event_id, other, other_first, other_last, archived_at in overlapping:
+        if archived_at or other_first < first_day or other_last > last_day:
+            raise ValueError(f"Overlaps event '{other}' ({other_first} to {other_last})")
+        absorbed.append(event_id)
+
+    with conn:
+        try:
+            cursor = conn.execute(
+                'INSERT INTO events (name, first_day, last_day) VALUES (?, ?, ?)',
+                (name, first_day, last_day)
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"An event named '{name}' already exists")
+        new_id = cursor.lastrowid
+        for event_id in absorbed:
+            conn.execute('UPDATE attendance SET event_id = ? WHERE event_id = ?', (new_id, event_id))
+            conn.execute('DELETE FROM events WHERE id = ?', (event_id,))
+            conn.execute('DELETE FROM event_stats WHERE event_id = ?', (event_id,))
+            conn.execute('DELETE FROM arrival_buckets WHERE event_id = ?', (event_id,))
+    return new_id
+
+
+def list_events(conn):
+    """Every event, oldest first, as dicts including the number of check-ins"""
+    rows = conn.execute('''
+        SELECT id, name, first_day, last_day, archived_at, archive_path,
+               COALESCE(archived_rows,
+                        (SELECT checkins FROM event_stats WHERE event_id = events.id), 0)
+        FROM events ORDER BY first_day, id
+    ''').fetchall()
+    keys = ('id', 'name', 'first_day', 'last_day', 'archived_at', 'archive_path', 'checkins')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def attendee_count(conn):
+    """Roster size, from the trigger-maintained roster_stats row"""
+    row = conn.execute('SELECT attendees FROM roster_stats WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def iter_attendee_names(conn, batch_size=1000):
+    """Yield roster names straight from a cursor, batch_size rows at a time"""
+    cursor = conn.execute('SELECT name FROM attendees')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for (name,) in rows:
+            yield name
+
+
+def add_attendee(conn, name):
+    """Add one name to the roster; returns False if it was already there
+
+    Names that differ only in case or spacing count as the same name.
+    """
+    cursor = conn.execute(
+        'INSERT OR IGNORE INTO attendees (name, name_key) VALUES (?, ?)',
+        (name, normalize_name(name))
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def add_attendees(conn, names):
+    """Add many names in one transaction; returns how many were new"""
+    with conn:
+        # rowcount, not total_changes: the roster_stats triggers write too
+        cursor = conn.executemany(
+            'INSERT OR IGNORE INTO attendees (name, name_key) VALUES (?, ?)',
+            ((name, normalize_name(name)) for name in names)
+        )
+        return cursor.rowcount
+
+
+def import_names_json(conn, path='names_list.json'):
+    """One-time import of a legacy names_list.json file into the attendees table"""
+    with open(path, 'r', encoding='utf-8') as f:
+        names = json.load(f)
+    return add_attendees(conn, (name.strip() for name in names if name.strip()))
+
+
+def sync_qr_codes(conn, secret=None, batch_size=5000):
+    """Store the compact QR payload of every attendee in attendees.qr_code
+
+    Only rows whose stored code differs (new attendees, or a changed secret)
+    are written. Returns the number of rows updated.
+    """
+    updates = []
+    cursor = conn.execute('SELECT id, qr_code FROM attendees')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for attendee_id, qr_code in rows:
+            payload = qr_payload.make_payload(attendee_id, secret)
+            if payload != qr_code:
+                updates.append((payload, attendee_id))
+
+    with conn:
+        conn.executemany('UPDATE attendees SET qr_code = ? WHERE id = ?', updates)
+    return len(updates)
+
+
+def iter_attendee_payloads(conn, batch_size=1000):
+    """Yield (name, qr_code) for every attendee, ordered by name"""
+    cursor = conn.execute('SELECT name, qr_code FROM attendees ORDER BY name')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def attendee_by_qr(conn, payload):
+    """Look up (id, name) by compact QR payload through the unique qr_code index"""
+    return conn.execute(
+        'SELECT id, name FROM attendees WHERE qr_code = ?', (payload,)
+    ).fetchone()
+
+
+def now_timestamp():
+    """Local time in the format stored in checked_in_at"""
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _bucket_sql(column):
+    # 'YYYY-MM-DD HH:MM:SS' -> start of its slot, 'YYYY-MM-DD HH:MM'
+    return (f"substr({column}, 1, 14) || printf('%02d', "
+            f"CAST(substr({column}, 15, 2) AS INTEGER) / {BUCKET_MINUTES} * {BUCKET_MINUTES})")
+
+
+def _migrate_arrival_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS event_stats (
+            event_id INTEGER PRIMARY KEY,
+            checkins INTEGER NOT NULL DEFAULT 0,
+            first_at TIMESTAMP,
+            last_at TIMESTAMP,
+            arrived INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS arrival_buckets (
+            event_id INTEGER NOT NULL,
+            bucket TEXT NOT NULL,
+            checkins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_id, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+    # Count the existing history once; the triggers take over from here
+    conn.execute('DELETE FROM event_stats')
+    conn.execute('DELETE FROM arrival_buckets')
+    conn.execute('''
+        INSERT INTO event_stats (event_id, checkins, first_at, last_at)
+        SELECT event_id, COUNT(*), MIN(checked_in_at), MAX(checked_in_at)
+        FROM attendance WHERE event_id IS NOT NULL GROUP BY event_id
+    ''')
+    conn.execute(f'''
+        INSERT INTO arrival_buckets (event_id, bucket, checkins)
+        SELECT event_id, {_bucket_sql('checked_in_at')}, COUNT(*)
+        FROM attendance WHERE event_id IS NOT NULL GROUP BY 1, 2
+    ''')
+
+    _create_stats_triggers(conn)
+
+
+def _create_stats_triggers(conn):
+    count_new = f'''
+        INSERT INTO event_stats (event_id, checkins, first_at, last_at)
+        SELECT NEW.event_id, 1, NEW.checked_in_at, NEW.checked_in_at
+        WHERE NEW.event_id IS NOT NULL
+        ON CONFLICT (event_id) DO UPDATE SET
+            checkins = checkins + 1,
+            first_at = MIN(COALESCE(first_at, excluded.first_at), excluded.first_at),
+            last_at = MAX(COALESCE(last_at, excluded.last_at), excluded.last_at);
+        INSERT INTO arrival_buckets (event_id, bucket, checkins)
+        SELECT NEW.event_id, {_bucket_sql('NEW.checked_in_at')}, 1
+        WHERE NEW.event_id IS NOT NULL
+        ON CONFLICT (event_id, bucket) DO UPDATE SET checkins = checkins + 1;
+        UPDATE event_stats SET arrived = arrived + 1
+        WHERE event_id = NEW.event_id
+            AND NEW.name IN (SELECT name FROM attendees)
+            AND NOT EXISTS (SELECT 1 FROM attendance WHERE name = NEW.name
+                            AND event_id = NEW.event_id AND id <> NEW.id);
+    '''
+    # When the first or last arrival moves or goes away, look the new one up
+    # (one probe of idx_attendance_event_time each). arrived counts roster
+    # names with a check-in; excluding the row's own id keeps an update
+    # within the same event from counting the guest twice.
+    uncount_old = f'''
+        UPDATE event_stats SET checkins = checkins - 1 WHERE event_id = OLD.event_id;
+        UPDATE event_stats SET
+            first_at = (SELECT MIN(checked_in_at) FROM attendance WHERE event_id = OLD.event_id),
+            last_at = (SELECT MAX(checked_in_at) FROM attendance WHERE event_id = OLD.event_id)
+        WHERE event_id = OLD.event_id AND OLD.checked_in_at IN (first_at, last_at);
+        UPDATE arrival_buckets SET checkins = checkins - 1
+        WHERE event_id = OLD.event_id AND bucket = {_bucket_sql('OLD.checked_in_at')};
+        UPDATE event_stats SET arrived = arrived - 1
+        WHERE event_id = OLD.event_id
+            AND OLD.name IN (SELECT name FROM attendees)
+            AND NOT EXISTS (SELECT 1 FROM attendance WHERE name = OLD.name
+                            AND event_id = OLD.event_id AND id <> OLD.id);
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_stats_insert
+        AFTER INSERT ON attendance
+        BEGIN {count_new} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_stats_update
+        AFTER UPDATE OF checked_in_at, event_id ON attendance
+        BEGIN {uncount_old} {count_new} END
+    ''')
+    # Archiving deletes an event's rows after marking it archived; its
+    # statistics are kept
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_stats_delete
+        AFTER DELETE ON attendance
+        WHEN (SELECT archived_at FROM events WHERE id = OLD.event_id) IS NULL
+        BEGIN {uncount_old} END
+    ''')
+
+
+def _migrate_stats_boundaries(conn):
+    # The first triggers never moved first/last arrival back; recreate them
+    # and correct the live events (archived ones have no rows left to read)
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS attendance_stats_{trigger}')
+    _create_stats_triggers(conn)
+    conn.execute('''
+        UPDATE event_stats SET
+            first_at = (SELECT MIN(checked_in_at) FROM attendance
+                        WHERE attendance.event_id = event_stats.event_id),
+            last_at = (SELECT MAX(checked_in_at) FROM attendance
+                       WHERE attendance.event_id = event_stats.event_id)
+        WHERE event_id IN (SELECT id FROM events WHERE archived_at IS NULL)
+    ''')
+
+
+def _migrate_roster_stats(conn):
+    # The statistics window refreshes every second: the roster size and the
+    # number of roster guests who arrived are kept in summary rows instead
+    # of being counted on each refresh
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(event_stats)')}
+    if 'arrived' not in columns:
+        conn.execute('ALTER TABLE event_stats ADD COLUMN arrived INTEGER NOT NULL DEFAULT 0')
+    conn.execute('''
+        UPDATE event_stats SET arrived = (
+            SELECT COUNT(DISTINCT name) FROM attendance
+            WHERE attendance.event_id = event_stats.event_id
+                AND name IN (SELECT name FROM attendees)
+        )
+        WHERE event_id IN (SELECT id FROM events WHERE archived_at IS NULL)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS roster_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            attendees INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR REPLACE INTO roster_stats (id, attendees) SELECT 1, COUNT(*) FROM attendees')
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS attendance_stats_{trigger}')
+    _create_stats_triggers(conn)
+
+    # A name joining or leaving the roster changes arrived for the events it
+    # already checked in to (found through idx_attendance_name_day)
+    add_new = '''
+        UPDATE roster_stats SET attendees = attendees + 1 WHERE id = 1;
+        UPDATE event_stats SET arrived = arrived + 1
+        WHERE event_id IN (SELECT event_id FROM attendance WHERE name = NEW.name);
+    '''
+    remove_old = '''
+        UPDATE roster_stats SET attendees = attendees - 1 WHERE id = 1;
+        UPDATE event_stats SET arrived = arrived - 1
+        WHERE event_id IN (SELECT event_id FROM attendance WHERE name = OLD.name);
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendees_stats_insert
+        AFTER INSERT ON attendees
+        BEGIN {add_new} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendees_stats_update
+        AFTER UPDATE OF name ON attendees
+        BEGIN {remove_old} {add_new} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendees_stats_delete
+        AFTER DELETE ON attendees
+        BEGIN {remove_old} END
+    ''')
+
+
+def _migrate_name_keys(conn):
+    # attendees.name_key is the normalized name; its unique index lets inserts
+    # skip "john  doe" once "John Doe" is on the roster without a lookup
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendees)')}
+    if 'name_key' not in columns:
+        conn.execute('ALTER TABLE attendees ADD COLUMN name_key TEXT')
+    conn.create_function('normalize_name', 1, normalize_name, deterministic=True)
+    conn.execute('UPDATE attendees SET name_key = normalize_name(name)')
+    # Near-duplicates already on the roster stay; only the first one keeps its key
+    conn.execute('''
+        UPDATE attendees SET name_key = NULL
+        WHERE id NOT IN (SELECT MIN(id) FROM attendees GROUP BY name_key)
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendees_name_key
+        ON attendees (name_key)
+    ''')
+
+
+def _migrate_event_time_index(conn):
+    # The kiosk lists an event's check-ins by time and pages on (checked_in_at, id)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_event_time
+        ON attendance (event_id, checked_in_at, id)
+    ''')
+
+
+def _migrate_change_seq(conn):
+    # change_seq orders local changes for the changefeed: a new check-in and a
+    # check-in moved to an earlier time both take the next number, so
+    # replication exports updates as well as inserts. Existing rows keep
+    # their id, which is what older changefeed segments are numbered by.
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(attendance)')}
+    if 'change_seq' not in columns:
+        conn.execute('ALTER TABLE attendance ADD COLUMN change_seq INTEGER')
+    conn.execute('UPDATE attendance SET change_seq = id WHERE origin IS NULL')
+    conn.execute('''
+        INSERT OR REPLACE INTO sync_state (key, value)
+        SELECT 'change_seq', COALESCE(MAX(id), 0) FROM attendance
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_change_seq
+        ON attendance (change_seq)
+    ''')
+
+    next_seq = '''
+        UPDATE sync_state SET value = CAST(value AS INTEGER) + 1 WHERE key = 'change_seq';
+        UPDATE attendance SET change_seq = (
+            SELECT CAST(value AS INTEGER) FROM sync_state WHERE key = 'change_seq'
+        ) WHERE id = NEW.id;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_change_seq_insert
+        AFTER INSERT ON attendance
+        WHEN NEW.origin IS NULL
+        BEGIN {next_seq} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_change_seq_update
+        AFTER UPDATE OF checked_in_at ON attendance
+        WHEN NEW.origin IS NULL
+        BEGIN {next_seq} END
+    ''')
+
+
+def today():
+    """Local date in the format stored in day"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def check_in(conn, name, checked_in_at=None, attendee_id=None, commit=True,
+             keep_earliest=False):
+    """Record a check-in; returns False if the name was already checked in that day
+
+    With keep_earliest an existing check-in that day is moved back to
+    checked_in_at if that is earlier (the rule replication applies), so
+    check-ins recorded after the fact keep the first sighting whatever
+    order they arrive in. Raises EventArchived if the day belongs to an
+    archived event.
+    """
+    if checked_in_at is None:
+        checked_in_at = now_timestamp()
+    day = checked_in_at[:10]
+    event_id, event_name, archived = event_for_day(conn, day)
+    if archived:
+        raise EventArchived(event_id, event_name)
+
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO attendance (attendee_id, name, checked_in_at, day, event_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (attendee_id, name, checked_in_at, day, event_id))
+    inserted = cursor.rowcount == 1
+    if not inserted and keep_earliest:
+        # The earlier time is now this station's own sighting, so replication
+        # publishes it (see _migrate_change_seq)
+        conn.execute('''
+            UPDATE attendance SET checked_in_at = ?, origin = NULL
+            WHERE name = ? AND day = ? AND checked_in_at > ?
+        ''', (checked_in_at, name, day, checked_in_at))
+    if commit:
+        conn.commit()
+    return inserted
@@ -0,0 +1,169 @@
+"""
+The kiosk's attendance list, without the widgets.
+
+Shows the check-ins of today's event by check-in time, newest first,
+without ever loading the whole history: refresh() loads the newest page,
+load_older() pages in the next block (keyset paging on (checked_in_at, id))
+when the list is scrolled to the bottom, and append_new() places only the
+rows added since the last update, dropping the oldest ones so the number of
+materialized rows stays bounded. Check-ins replicated from other stations
+can arrive late or move an existing row to an earlier time; refresh_times()
+moves shown rows whose time changed.
+
+The view only has to provide ttk.Treeview's get_children, insert and
+delete, so the benchmarks can drive the list without a display.
+"""
+
+import bisect
+
+import arrival_stats
+import attendance_db
+
+# Shown ids re-read per query by refresh_times
+REREAD_CHUNK = 500
+
+
+class AttendanceList:
+    """Windowed, incrementally updated list of the current event's check-ins"""
+
+    def __init__(self, conn, view, page_size=200, on_event=None):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.view = view
+        self.page_size = page_size
+        # Called with (id, name, archived) of today's event, or None, on every lookup
+        self.on_event = on_event
+
+        # Rows are keyed by attendance id
+        self.event_id = None
+        self.keys = []          # (checked_in_at, id) of the shown rows, oldest first
+        self.watermark = 0      # highest id seen; newer ids are new check-ins
+        self.exhausted = False  # no older rows left to page in
+
+        # Names checked in to the event, loaded when statistics are first shown
+        self.arrivals = arrival_stats.ArrivalTracker()
+
+    def current_event_id(self):
+        """Id of the event today's check-ins belong to (None before the first one)"""
+        event = attendance_db.event_for_day(self.conn, attendance_db.today(), create=False)
+        if self.on_event:
+            self.on_event(event)
+        return event[0] if event else None
+
+    def refresh(self):
+        """Rebuild the list from scratch (newest page only)"""
+        self.view.delete(*self.view.get_children())
+        self.keys = []
+        self.watermark = 0
+        self.exhausted = False
+
+        self.event_id = self.current_event_id()
+        if self.event_id is None:
+            # Nobody has checked in today yet
+            self.exhausted = True
+            return
+        self.cursor.execute('SELECT MAX(id) FROM attendance WHERE event_id = ?', (self.event_id,))
+        newest_id = self.cursor.fetchone()[0]
+        if newest_id is None:
+            self.exhausted = True
+            return
+
+        self.watermark = newest_id
+        self.load_older()
+
+    def append_new(self):
+        """Place only the rows added since the last update"""
+        if self.current_event_id() != self.event_id:
+            # First check-in of the day, or past midnight into a new event
+            self.refresh()
+            return
+        self.cursor.execute('''
+            SELECT id, name, checked_in_at
+            FROM attendance
+            WHERE event_id = ? AND id > ?
+            ORDER BY id
+        ''', (self.event_id, self.watermark))
+
+        records = self.cursor.fetchall()
+        if not records:
+            return
+        shown = len(self.keys)
+        tracking = self.arrivals.event_id == self.event_id
+        for row_id, name, checked_in_at in records:
+            self._place(row_id, name, checked_in_at)
+            if tracking:
+                self.arrivals.add(name)
+        self.watermark = records[-1][0]
+
+        # Keep the number of materialized rows bounded by dropping the oldest
+        excess = len(self.keys) - max(self.page_size, shown)
+        if excess > 0:
+            self.view.delete(*(str(row_id) for _, row_id in self.keys[:excess]))
+            del self.keys[:excess]
+            self.exhausted = False
+
+    def refresh_times(self):
+        """Move shown rows whose check-in time was changed in place
+
+        Replication keeps the earliest check-in of a name and day, so a peer
+        can move a row that is already shown to an earlier time.
+        """
+        times = {row_id: checked_in_at for checked_in_at, row_id in self.keys}
+        shown = list(times)
+        moved = []
+        for start in range(0, len(shown), REREAD_CHUNK):
+            chunk = shown[start:start + REREAD_CHUNK]
+            self.cursor.execute(f'''
+                SELECT id, name, checked_in_at
+                FROM attendance
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            moved.extend(row for row in self.cursor.fetchall() if row[2] != times[row[0]])
+
+        for row_id, name, checked_in_at in moved:
+            self.keys.remove((times[row_id], row_id))
+            self.view.delete(str(row_id))
+            self._place(row_id, name, checked_in_at)
+
+    def load_older(self):
+        """Page in the next block of older rows at the bottom of the list"""
+        if self.exhausted or self.event_id is None:
+            return
+
+        # Rows above the watermark are left to append_new; the unary + keeps
+        # SQLite on the (event_id, checked_in_at, id) index instead of sorting
+        if self.keys:
+            oldest_at, oldest_id = self.keys[0]
+            self.cursor.execute('''
+                SELECT id, name, checked_in_at
+                FROM attendance
+                WHERE event_id = ? AND (checked_in_at, id) < (?, ?) AND +id <= ?
+                ORDER BY checked_in_at DESC, id DESC
+                LIMIT ?
+            ''', (self.event_id, oldest_at, oldest_id, self.watermark, self.page_size))
+        else:
+            self.cursor.execute('''
+                SELECT id, name, checked_in_at
+                FROM attendance
+                WHERE event_id = ? AND +id <= ?
+                ORDER BY checked_in_at DESC, id DESC
+                LIMIT ?
+            ''', (self.event_id, self.watermark, self.page_size))
+
+        records = self.cursor.fetchall()
+        for row_id, name, checked_in_at in records:
+            self.view.insert('', 'end', iid=str(row_id), values=(name, checked_in_at))
+        self.keys[:0] = [(checked_in_at, row_id) for row_id, _, checked_in_at in reversed(records)]
+        if len(records) < self.page_size:
+            self.exhausted = True
+
+    def _place(self, row_id, name, checked_in_at):
+        # Insert a row at its position by time; rows older than everything
+        # shown are left to load_older unless there is nothing left to page
+        key = (checked_in_at, row_id)
+        if self.keys and key < self.keys[0] and not self.exhausted:
+            return
+        position = bisect.bisect(self.keys, key)
+        self.keys.insert(position, key)
+        self.view.insert('', len(self.keys) - 1 - position, iid=str(row_id),
+                         values=(name, checked_in_at))
@@ -1,80 +1,217 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import cv2
-from pyzbar import pyzbar
+import os
+import sys
 import json
-import sqlite3
+import argparse
+import bisect
+import queue
+import threading
 from datetime import datetime
-from PIL import Image, ImageTk
-import os
+import arrival_stats
+import attendance_db
+import metrics
+import qr_payload
+import roster_io
+from attendance_list import AttendanceList
+from checkin_engine import CheckinEngine, UnknownAttendee
+from roster_index import RosterIndex
+
+# OpenCV, pyzbar and PIL.ImageTk are imported when the scanner first starts
+# (or by warm_scanner_imports in the background); they dominate startup time.
+
+# Startup milestones, reported once all have been reached
+STARTUP_MILESTONES = ('imports', 'window', 'roster', 'history', 'scanner')
+
+# Statistics window: refresh interval, slots in the chart, missing names listed
+STATS_REFRESH_MS = 1000
+STATS_CHART_SLOTS = 16
+STATS_MISSING_SHOWN = 500
+
+def warm_scanner_imports(decoder='auto'):
+    """Import the camera/decoding stack so the first scanner start is instant"""
+    import cv2  # noqa: F401
+    import scan_pipeline  # noqa: F401
+    from PIL import ImageTk  # noqa: F401
+    import qr_decoder
+    if decoder == 'auto':
+        # Benchmarks the decoder backends once; start_scanner reuses the result
+        qr_decoder.select_backend_name()
 
 class AttendanceSystem:
-    def __init__(self, root):
+    def __init__(self, root, db_path=attendance_db.DB_PATH, metrics_path=None, preview_fps=15,
+                 measure_startup=False, decoder='auto', cameras=(0,)):
         self.root = root
         self.root.title("Christmas Party Attendance System")
         self.root.geometry("1200x800")
         self.root.configure(bg='#2b2b2b')
         
-        # Initialize database
-        self.init_database()
+        # Seconds since process start at which each startup milestone was reached
+        self.startup_times = {'imports': time.perf_counter() - STARTUP_T0}
+        self.measure_startup = measure_startup
+        # Process exit status returned by main() once the window is closed
+        self.exit_code = 0
+        
+        # The engine, roster and database connection are loaded in the background
+        self.db_path = db_path
+        self.engine = None
+        self.conn = None
+        self.checkin_results = queue.Queue()
+        self.replicated_seen = 0
+        self.startup_events = queue.Queue()
+        
+        # Empty until the engine has loaded the real roster
+        self.roster = RosterIndex()
         
-        # Load initial names list
-        self.load_names_list()
+        # Positions (in roster order) of the names shown in the listbox
+        self.listbox_positions = range(0)
+        self.filter_after_id = None
         
-        # Camera setup
-        self.camera = None
+        # Camera setup: one capture/decode pipeline per camera source
+        self.camera_sources = list(cameras)
+        self.cameras = []
         self.scanning = False
+        self.scanner = None
+        
+        # QR decoder backend ('auto' benchmarks the available ones)
+        self.decoder = decoder
+        
+        # One PhotoImage is reused for every preview frame
+        self.preview_fps = preview_fps
+        self.preview_photo = None
+        self.root_mapped = True
+        self.preview_obscured = False
+        
+        # Payloads seen recently are ignored in continuous mode (created with the scanner)
+        self.recent_scans = None
         
         # Selected name from QR scan
         self.scanned_name = None
         
+        # Attendance list of today's event (an AttendanceList once the database is open)
+        self.attendance = None
+        self.attendance_label = None
+        self.attendance_paging = False
+        
+        # Arrival statistics window
+        self.stats_window = None
+        self.stats_after_id = None
+        self.stats_shown = None
+        
+        # Optional per-stage timings, written to a file every few seconds
+        self.metrics_writer = None
+        if metrics_path:
+            metrics.enable()
+            self.metrics_writer = metrics.MetricsWriter(metrics_path, extra=self.metrics_extra)
+            self.metrics_writer.start()
+        
         # Setup GUI
         self.setup_gui()
+        self.status_label.config(text="Loading roster...", fg='#FF9800')
         
-    def init_database(self):
-        """Initialize SQLite database for attendance tracking"""
-        self.conn = sqlite3.connect('attendance.db')
-        self.cursor = self.conn.cursor()
-        
-        # Create tables
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                qr_code TEXT UNIQUE,
-                registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                attendee_id INTEGER,
-                name TEXT NOT NULL,
-                checked_in_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (attendee_id) REFERENCES attendees(id)
-            )
-        ''')
+        # Flush queued check-ins before the window goes away
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Show the window now; the roster and history arrive when loaded
+        self.loader = threading.Thread(target=self.load_in_background, name='startup-loader',
+                                       daemon=True)
+        self.loader.start()
+        self.poll_startup()
         
-        self.conn.commit()
+    def load_in_background(self):
+        """Open the database and load the roster off the Tk thread, then warm the scanner"""
+        try:
+            # The engine owns the roster and the check-in writer thread
+            engine = CheckinEngine(self.db_path, durability='normal')
+        except Exception as e:
+            self.startup_events.put(('error', e))
+            return
+        self.startup_events.put(('engine', engine))
+        
+        try:
+            warm_scanner_imports(self.decoder)
+            self.startup_events.put(('scanner', None))
+        except Exception as e:
+            # Reported again, with a dialog, if someone starts the scanner
+            self.startup_events.put(('scanner', e))
+        
+        # So the first "did you mean" suggestion does not wait for the index
+        engine.fuzzy_index()
     
-    def load_names_list(self):
-        """Load names list from JSON file or create default"""
-        if os.path.exists('names_list.json'):
-            with open('names_list.json', 'r', encoding='utf-8') as f:
-                self.names_list = json.load(f)
-        else:
-            # Default names list
-            self.names_list = [
-                "John Doe", "Jane Smith", "Bob Johnson", "Alice Williams",
-                "Charlie Brown", "Diana Prince", "Edward Norton", "Fiona Apple"
-            ]
-            self.save_names_list()
+    def poll_startup(self):
+        """Pick up results of the background loader on the Tk thread"""
+        while True:
+            try:
+                kind, value = self.startup_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'engine':
+                self.init_database(value)
+            elif kind == 'scanner':
+                self.mark_startup('scanner')
+            else:
+                self.status_label.config(text="Could not open the database", fg='#f44336')
+                if self.measure_startup:
+                    # Nobody is there to dismiss a dialog; fail the measurement instead
+                    print(f"Startup failed: error opening the attendance database: {value}",
+                          file=sys.stderr)
+                    self.exit_code = 1
+                    self.root.after(0, self.on_close)
+                    return
+                messagebox.showerror("Error", f"Error opening the attendance database: {value}")
+                return
+        if not self.startup_complete():
+            self.root.after(20, self.poll_startup)
     
-    def save_names_list(self):
-        """Save names list to JSON file"""
-        with open('names_list.json', 'w', encoding='utf-8') as f:
-            json.dump(self.names_list, f, indent=2, ensure_ascii=False)
+    def init_database(self, engine):
+        """Attach the loaded engine and fill in the roster and attendance history"""
+        self.engine = engine
+        self.roster = engine.roster
+        
+        # Share check-ins with the other doors if a sync directory is configured
+        sync_dir = os.environ.get('ATTENDANCE_SYNC_DIR')
+        if sync_dir:
+            self.engine.start_sync(sync_dir)
+        
+        # This connection serves the attendance list and the statistics window
+        self.conn = attendance_db.connect(self.db_path)
+        self.attendance = AttendanceList(self.conn, self.attendance_tree, on_event=self.show_event)
+        
+        self.update_names_listbox()
+        self.mark_startup('roster')
+        self.refresh_attendance_list()
+        self.mark_startup('history')
+        self.status_label.config(text="Ready to scan QR code", fg='#4CAF50')
+        self.poll_checkin_results()
+    
+    def mark_startup(self, milestone):
+        """Record a startup milestone; report once everything has loaded"""
+        if milestone in self.startup_times:
+            return
+        self.startup_times[milestone] = elapsed = time.perf_counter() - STARTUP_T0
+        metrics.record(f"startup.{milestone}", elapsed)
+        if not self.startup_complete():
+            return
+        
+        times = {key: round(value, 3) for key, value in self.startup_times.items()}
+        print("Startup: " + ", ".join(f"{key} {value:.2f}s" for key, value in times.items()),
+              file=sys.stderr)
+        if self.measure_startup:
+            print(json.dumps(times))
+            self.root.after(0, self.on_close)
+    
+    def startup_complete(self):
+        return all(milestone in self.startup_times for milestone in STARTUP_MILESTONES)
+    
+    def engine_ready(self):
+        """True once the roster is loaded; otherwise say so in the status line"""
+        if self.engine is None:
+            self.status_label.config(text="Still loading the roster, one moment...", fg='#FF9800')
+            return False
+        return True
     
     def setup_gui(self):
         """Setup the main GUI"""
@@ -123,6 +260,11 @@ class AttendanceSystem:
         )
         self.camera_label.pack(expand=True)
         
+        # Stop rendering the preview while it cannot be seen
+        self.camera_label.bind('<Visibility>', self.on_preview_visibility)
+        self.root.bind('<Map>', self.on_root_map, add='+')
+        self.root.bind('<Unmap>', self.on_root_map, add='+')
+        
         # Scanner controls
         control_frame = tk.Frame(left_panel, bg='#3b3b3b')
         control_frame.pack(pady=10)
@@ -142,6 +284,30 @@ class AttendanceSystem:
         )
         self.scan_button.pack(side=tk.LEFT, padx=5)
         
+        # Continuous mode keeps the camera open and avoids modal popups
+        self.continuous_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            control_frame,
+            text="Continuous mode",
+            variable=self.continuous_var,
+            font=('Arial', 10),
+            bg='#3b3b3b',
+            fg='#ffffff',
+            selectcolor='#2b2b2b',
+            activebackground='#3b3b3b',
+            activeforeground='#ffffff'
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Scanner throughput/latency readout
+        self.scanner_stats_label = tk.Label(
+            left_panel,
+            text="",
+            font=('Arial', 9),
+            bg='#3b3b3b',
+            fg='#888888'
+        )
+        self.scanner_stats_label.pack(pady=(0, 10))
+        
         # Right panel - Name Selection
         right_panel = tk.Frame(content_frame, bg='#3b3b3b', relief=tk.RAISED, bd=2)
         right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -274,14 +440,14 @@ class AttendanceSystem:
         bottom_panel = tk.Frame(main_frame, bg='#3b3b3b', relief=tk.RAISED, bd=2)
         bottom_panel.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
         
-        attendance_label = tk.Label(
+        self.attendance_label = tk.Label(
             bottom_panel,
             text="Registered Attendees",
             font=('Arial', 14, 'bold'),
             bg='#3b3b3b',
             fg='#ffffff'
         )
-        attendance_label.pack(pady=10)
+        self.attendance_label.pack(pady=10)
         
         # Attendance list with scrollbar
         attendance_list_frame = tk.Frame(bottom_panel, bg='#3b3b3b')
@@ -294,7 +460,7 @@ class AttendanceSystem:
             attendance_list_frame,
             columns=('Name', 'Time'),
             show='headings',
-            yscrollcommand=attendance_scrollbar.set,
+            yscrollcommand=lambda first, last: self.on_attendance_scroll(attendance_scrollbar, first, last),
             height=8
         )
         self.attendance_tree.heading('Name', text='Name')
@@ -320,9 +486,12 @@ class AttendanceSystem:
         self.attendance_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         attendance_scrollbar.config(command=self.attendance_tree.yview)
         
-        # Refresh button
+        # Refresh and statistics buttons
+        button_row = tk.Frame(bottom_panel, bg='#3b3b3b')
+        button_row.pack(pady=10)
+        
         refresh_button = tk.Button(
-            bottom_panel,
+            button_row,
             text="Refresh List",
             font=('Arial', 10),
             bg='#607D8B',
@@ -334,25 +503,63 @@ class AttendanceSystem:
             command=self.refresh_attendance_list,
             cursor='hand2'
         )
-        refresh_button.pack(pady=10)
+        refresh_button.pack(side=tk.LEFT, padx=5)
         
-        # Load initial attendance
-        self.refresh_attendance_list()
+        stats_button = tk.Button(
+            button_row,
+            text="Statistics",
+            font=('Arial', 10),
+            bg='#607D8B',
+            fg='white',
+            activebackground='#455A64',
+            activeforeground='white',
+            padx=15,
+            pady=5,
+            command=self.open_statistics,
+            cursor='hand2'
+        )
+        stats_button.pack(side=tk.LEFT, padx=5)
     
     def update_names_listbox(self):
-        """Update the names listbox with current names"""
+        """Update the names listbox with the names matching the current search"""
+        if self.filter_after_id is not None:
+            self.root.after_cancel(self.filter_after_id)
+            self.filter_after_id = None
+        
+        positions = self.roster.search(self.search_var.get())
+        names = self.roster.names
+        self.listbox_positions = positions
         self.names_listbox.delete(0, tk.END)
-        for name in sorted(self.names_list):
-            self.names_listbox.insert(tk.END, name)
+        if positions:
+            self.names_listbox.insert(tk.END, *(names[i] for i in positions))
     
     def filter_names(self, *args):
-        """Filter names based on search input"""
-        search_term = self.search_var.get().lower()
-        self.names_listbox.delete(0, tk.END)
-        
-        for name in sorted(self.names_list):
-            if search_term in name.lower():
-                self.names_listbox.insert(tk.END, name)
+        """Filter names based on search input (debounced while typing)"""
+        if self.filter_after_id is not None:
+            self.root.after_cancel(self.filter_after_id)
+        self.filter_after_id = self.root.after(150, self.update_names_listbox)
+    
+    def listbox_row_of(self, name):
+        """Row of a roster name in the (possibly filtered) listbox, or None"""
+        position = self.roster.index_of(name)
+        if position is None:
+            return None
+        positions = self.listbox_positions
+        row = bisect.bisect_left(positions, position)
+        if row < len(positions) and positions[row] == position:
+            return row
+        return None
+    
+    def notify(self, kind, title, message):
+        """Show a popup, unless continuous mode is on (status label only then)"""
+        if self.continuous_var.get():
+            return
+        if kind == 'error':
+            messagebox.showerror(title, message)
+        elif kind == 'warning':
+            messagebox.showwarning(title, message)
+        else:
+            messagebox.showinfo(title, message)
     
     def toggle_scanner(self):
         """Start or stop QR code scanner"""
@@ -363,13 +570,40 @@ class AttendanceSystem:
     
     def start_scanner(self):
         """Start the QR code scanner"""
+        if not self.engine_ready():
+            return
         try:
-            self.camera = cv2.VideoCapture(0)
-            if not self.camera.isOpened():
+            # Usually already imported by the background warm-up
+            import cv2
+            from qr_decoder import DecodeEngine, make_backend
+            from scan_pipeline import MultiCameraScanner, RecentScanCache
+            
+            if self.recent_scans is None:
+                # Shared by all cameras, so a badge seen by two registers once
+                self.recent_scans = RecentScanCache(cooldown=5.0)
+            for source in self.camera_sources:
+                camera = cv2.VideoCapture(source)
+                if camera.isOpened():
+                    self.cameras.append((source, camera))
+                else:
+                    camera.release()
+            if not self.cameras:
                 messagebox.showerror("Error", "Could not open camera. Please check if camera is connected.")
                 return
+            if len(self.cameras) < len(self.camera_sources):
+                opened = {source for source, _ in self.cameras}
+                missing = ', '.join(str(source) for source in self.camera_sources if source not in opened)
+                messagebox.showwarning("Warning", f"Could not open camera(s): {missing}")
             
             self.scanning = True
+            self.recent_scans.clear()
+            self.scanner = MultiCameraScanner(
+                self.cameras,
+                engine_factory=lambda: DecodeEngine(backend=make_backend(self.decoder)),
+                recent=self.recent_scans,
+                preview_fps=self.preview_fps,
+            )
+            self.scanner.start()
             self.scan_button.config(text="Stop Scanner", bg='#f44336', activebackground='#d32f2f')
             self.status_label.config(text="Scanning QR code...", fg='#FF9800')
             self.scan_camera()
@@ -380,89 +614,144 @@ class AttendanceSystem:
     def stop_scanner(self):
         """Stop the QR code scanner"""
         self.scanning = False
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+        if self.scanner:
+            self.scanner.stop()
+            self.scanner = None
+        for _, camera in self.cameras:
+            camera.release()
+        self.cameras = []
         
         self.scan_button.config(text="Start Scanner", bg='#4CAF50', activebackground='#45a049')
         self.camera_label.config(image='', text="Camera Feed\n\nClick 'Start Scanner' to begin")
+        self.scanner_stats_label.config(text="")
         self.status_label.config(text="Scanner stopped", fg='#888888')
     
     def scan_camera(self):
-        """Continuously scan camera feed for QR codes"""
+        """Poll the cameras for decoded QR codes and preview frames"""
         if not self.scanning:
             return
         
-        ret, frame = self.camera.read()
-        if ret:
-            # Decode QR codes
-            decoded_objects = pyzbar.decode(frame)
-            
-            # Draw rectangle around QR code and display
-            for obj in decoded_objects:
-                points = obj.polygon
-                if len(points) == 4:
-                    pts = [(point.x, point.y) for point in points]
-                    for i in range(4):
-                        cv2.line(frame, pts[i], pts[(i+1)%4], (0, 255, 0), 2)
-                
-                qr_data = obj.data.decode('utf-8')
-                self.scanned_name = qr_data
-                self.handle_qr_scan(qr_data)
-            
-            # Convert to RGB and display
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_resized = cv2.resize(frame_rgb, (400, 300))
-            img = Image.fromarray(frame_resized)
-            imgtk = ImageTk.PhotoImage(image=img)
-            
-            self.camera_label.config(image=imgtk, text='')
-            self.camera_label.image = imgtk
+        # Results from every camera arrive on one queue and register one at a time
+        scanner = self.scanner
+        for result in scanner.poll_results():
+            self.scanned_name = result.data
+            self.handle_qr_scan(result.data)
+            if not self.scanning:
+                return
+        
+        # Resizing happens on the capture thread; only copy the pixels into Tk here
+        scanner.preview_enabled = self.root_mapped and not self.preview_obscured
+        if scanner.preview_enabled:
+            if self.preview_photo is None:
+                from PIL import ImageTk
+                self.preview_photo = ImageTk.PhotoImage('RGBA', scanner.preview_size)
+            with metrics.stage('preview.paste'):
+                if scanner.paste_preview(self.preview_photo):
+                    if self.camera_label.cget('image') != str(self.preview_photo):
+                        self.camera_label.config(image=self.preview_photo, text='')
+        
+        self.scanner_stats_label.config(text=scanner.format_stats())
         
         if self.scanning:
-            self.root.after(10, self.scan_camera)
+            self.root.after(15, self.scan_camera)
+    
+    def on_preview_visibility(self, event):
+        """Track whether the camera preview is completely covered"""
+        self.preview_obscured = event.state == 'VisibilityFullyObscured'
+    
+    def on_root_map(self, event):
+        """Track whether the main window is minimized"""
+        if event.widget is self.root:
+            self.root_mapped = event.type == tk.EventType.Map
+            if self.root_mapped:
+                self.mark_startup('window')
     
     def handle_qr_scan(self, qr_data):
         """Handle QR code scan result"""
-        # Stop scanning after successful scan
-        self.stop_scanner()
+        # Stop scanning after successful scan, unless in continuous mode
+        if not self.continuous_var.get():
+            self.stop_scanner()
+        
+        # Compact ID badges resolve through the attendees.qr_code index
+        try:
+            name, attendee_id = self.engine.resolve(qr_data)
+        except qr_payload.InvalidPayload as e:
+            self.status_label.config(text=f"Invalid badge\n{e}", fg='#f44336')
+            return
+        except UnknownAttendee as e:
+            if e.compact:
+                self.status_label.config(text=f"Unknown badge: {qr_data}", fg='#f44336')
+                return
+            name, attendee_id = self.match_unknown_name(qr_data)
         
         # Check if name exists in list
-        if qr_data in self.names_list:
-            # Auto-select in listbox
-            index = sorted(self.names_list).index(qr_data)
+        if name is not None:
+            # Auto-select in listbox if it is currently shown
+            index = self.listbox_row_of(name)
             self.names_listbox.selection_clear(0, tk.END)
-            self.names_listbox.selection_set(index)
-            self.names_listbox.see(index)
+            if index is not None:
+                self.names_listbox.selection_set(index)
+                self.names_listbox.see(index)
             
             # Auto-register
-            self.register_attendance_by_name(qr_data)
+            self.register_attendance_by_name(name, attendee_id)
         else:
             # Name not in list - show option to add
+            suggestions = [match for match, _ in self.engine.suggest(qr_data, limit=3)]
+            hint = f"\nDid you mean: {', '.join(suggestions)}?" if suggestions else ''
             self.status_label.config(
-                text=f"QR Code: {qr_data}\nName not in list. Please add it below.",
+                text=f"QR Code: {qr_data}\nName not in list. Please add it below.{hint}",
                 fg='#FF9800'
             )
             self.new_name_var.set(qr_data)
-            messagebox.showinfo(
+            self.notify(
+                'info',
                 "Name Not Found",
                 f"QR Code scanned: {qr_data}\n\nThis name is not in the list. Please add it using the 'Add & Register' button."
             )
     
+    def match_unknown_name(self, text):
+        """Offer the closest roster name for an unknown one; returns (name or None, None)"""
+        same = self.engine.same_person(text)
+        if same:
+            # Only case, spacing or accents differ: "john  doe" is John Doe
+            return same[0], None
+        suggestions = self.engine.suggest(text, limit=1, min_score=0.8)
+        if not suggestions or self.continuous_var.get():
+            return None, None
+        best = suggestions[0][0]
+        if messagebox.askyesno("Did you mean?", f"'{text}' is not in the list.\n\nDid you mean {best}?"):
+            return best, None
+        return None, None
+    
     def add_and_register_name(self):
         """Add new name to list and register attendance"""
         new_name = self.new_name_var.get().strip()
         
+        if not self.engine_ready():
+            return
         if not new_name:
             messagebox.showwarning("Warning", "Please enter a name.")
             return
         
+        # A near-duplicate of a roster name registers that person instead
+        if new_name not in self.roster:
+            match, _ = self.match_unknown_name(new_name)
+            if match is not None:
+                self.register_attendance_by_name(match)
+                self.new_name_var.set('')
+                return
+        
         # Add to list if not already present
-        if new_name not in self.names_list:
-            self.names_list.append(new_name)
-            self.save_names_list()
-            self.update_names_listbox()
+        try:
+            added = self.engine.add_attendee(new_name)
+        except Exception as e:
+            self.status_label.config(text=f"{new_name} - Could not be added", fg='#f44336')
+            self.notify('error', "Error", f"Error adding {new_name} to the list: {str(e)}")
+            return
+        if added:
             self.search_var.set('')  # Clear search to show all names
+            self.update_names_listbox()
         
         # Register attendance
         self.register_attendance_by_name(new_name)
@@ -470,6 +759,8 @@ class AttendanceSystem:
     
     def register_attendance(self, event=None):
         """Register attendance for selected name"""
+        if not self.engine_ready():
+            return
         selection = self.names_listbox.curselection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a name from the list.")
@@ -478,66 +769,554 @@ class AttendanceSystem:
         selected_name = self.names_listbox.get(selection[0])
         self.register_attendance_by_name(selected_name)
     
-    def register_attendance_by_name(self, name):
+    def register_attendance_by_name(self, name, attendee_id=None):
         """Register attendance for a specific name"""
+        self.status_label.config(text=f"{name} - Registering...", fg='#FF9800')
+        # The writer thread commits in batches; the result comes back via poll_checkin_results
+        future = self.engine.submit_check_in(name, attendee_id)
+        future.add_done_callback(lambda f: self.checkin_results.put((name, f)))
+    
+    def poll_checkin_results(self):
+        """Apply finished check-ins from the writer thread on the Tk thread"""
+        while True:
+            try:
+                name, future = self.checkin_results.get_nowait()
+            except queue.Empty:
+                break
+            with metrics.stage('checkin.ui'):
+                self.finish_registration(name, future)
+        
+        # Show check-ins replicated from other stations; a replicated earlier
+        # check-in can also move a row that is already shown
+        if self.engine.sync and self.engine.sync.total_applied != self.replicated_seen:
+            self.replicated_seen = self.engine.sync.total_applied
+            self.append_new_attendance()
+            self.attendance.refresh_times()
+        self.root.after(50, self.poll_checkin_results)
+    
+    def finish_registration(self, name, future):
+        """Report the outcome of a queued check-in"""
         try:
-            # Check if already registered today
-            self.cursor.execute('''
-                SELECT * FROM attendance 
-                WHERE name = ? AND DATE(checked_in_at) = DATE('now')
-            ''', (name,))
-            
-            if self.cursor.fetchone():
-                messagebox.showinfo("Already Registered", f"{name} is already registered for today.")
-                self.status_label.config(text=f"{name} - Already registered", fg='#FF9800')
-                return
-            
-            # Register attendance
-            self.cursor.execute('''
-                INSERT INTO attendance (name, checked_in_at)
-                VALUES (?, ?)
-            ''', (name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", f"{name} has been registered successfully!")
-            self.status_label.config(text=f"{name} - Registered successfully!", fg='#4CAF50')
-            
-            # Refresh attendance list
-            self.refresh_attendance_list()
-            
+            registered = future.result().registered
         except Exception as e:
-            messagebox.showerror("Error", f"Error registering attendance: {str(e)}")
+            self.status_label.config(text=f"{name} - Registration failed", fg='#f44336')
+            self.notify('error', "Error", f"Error registering attendance: {str(e)}")
+            return
+        
+        if not registered:
+            self.notify('info', "Already Registered", f"{name} is already registered for today.")
+            self.status_label.config(text=f"{name} - Already registered", fg='#FF9800')
+            return
+        
+        self.notify('info', "Success", f"{name} has been registered successfully!")
+        self.status_label.config(text=f"{name} - Registered successfully!", fg='#4CAF50')
+        
+        # Show the new row without reloading the whole list
+        self.append_new_attendance()
     
     def refresh_attendance_list(self):
-        """Refresh the attendance list display"""
-        # Clear existing items
-        for item in self.attendance_tree.get_children():
-            self.attendance_tree.delete(item)
-        
-        # Fetch attendance records
-        self.cursor.execute('''
-            SELECT name, checked_in_at 
-            FROM attendance 
-            ORDER BY checked_in_at DESC
-        ''')
-        
-        records = self.cursor.fetchall()
-        for record in records:
-            self.attendance_tree.insert('', 'end', values=record)
+        """Rebuild the attendance list from scratch (newest page only)"""
+        if self.attendance is not None:
+            self.attendance.refresh()
+    
+    def show_event(self, event):
+        """Title the attendance list with today's event"""
+        title = f"Registered Attendees - {event[1]}" if event else "Registered Attendees"
+        self.attendance_label.config(text=title)
+    
+    def append_new_attendance(self):
+        """Place only the rows added since the last update"""
+        self.attendance.append_new()
+    
+    def load_older_attendance(self):
+        """Page in the next block of older rows at the bottom of the list"""
+        self.attendance_paging = False
+        self.attendance.load_older()
+    
+    def on_attendance_scroll(self, scrollbar, first, last):
+        """Keep the scrollbar in sync and page in older rows at the bottom"""
+        scrollbar.set(first, last)
+        if self.attendance is None or self.attendance.exhausted:
+            return
+        if float(last) >= 1.0 and float(first) > 0.0:
+            if not self.attendance_paging:
+                # Defer so we do not modify the tree from inside its own callback
+                self.attendance_paging = True
+                self.root.after_idle(self.load_older_attendance)
+    
+    def open_statistics(self):
+        """Open the live arrival statistics window (or bring it to the front)"""
+        if self.stats_window is not None:
+            self.stats_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Arrival Statistics")
+        window.geometry("560x680")
+        window.configure(bg='#2b2b2b')
+        window.protocol("WM_DELETE_WINDOW", self.close_statistics)
+        self.stats_window = window
+        self.stats_shown = None
+        
+        self.stats_title = tk.Label(
+            window,
+            text="Arrivals",
+            font=('Arial', 16, 'bold'),
+            bg='#2b2b2b',
+            fg='#ffffff'
+        )
+        self.stats_title.pack(pady=10)
+        
+        self.stats_counts = tk.Label(
+            window,
+            font=('Arial', 12),
+            bg='#2b2b2b',
+            fg='#ffffff',
+            justify=tk.LEFT
+        )
+        self.stats_counts.pack(padx=10, anchor='w')
+        
+        # Arrivals per slot for the latest STATS_CHART_SLOTS slots
+        self.stats_chart = tk.Canvas(window, height=170, bg='#3b3b3b', highlightthickness=0)
+        self.stats_chart.pack(padx=10, pady=10, fill=tk.X)
+        
+        self.stats_missing_label = tk.Label(
+            window,
+            text="Not yet arrived",
+            font=('Arial', 12, 'bold'),
+            bg='#2b2b2b',
+            fg='#ffffff'
+        )
+        self.stats_missing_label.pack(padx=10, anchor='w')
+        
+        missing_frame = tk.Frame(window, bg='#2b2b2b')
+        missing_frame.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
+        
+        missing_scrollbar = tk.Scrollbar(missing_frame)
+        missing_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.stats_missing = tk.Listbox(
+            missing_frame,
+            font=('Arial', 11),
+            bg='#3b3b3b',
+            fg='#ffffff',
+            yscrollcommand=missing_scrollbar.set
+        )
+        self.stats_missing.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        missing_scrollbar.config(command=self.stats_missing.yview)
+        
+        self.update_statistics()
+    
+    def close_statistics(self):
+        if self.stats_after_id is not None:
+            self.root.after_cancel(self.stats_after_id)
+            self.stats_after_id = None
+        if self.stats_window is not None:
+            self.stats_window.destroy()
+            self.stats_window = None
+    
+    def update_statistics(self):
+        """Redraw the statistics window if anything changed, then reschedule
+        
+        Only reads the trigger-maintained summary rows and the in-memory
+        arrival set, so a refresh stays cheap however large the event is.
+        """
+        self.stats_after_id = self.root.after(STATS_REFRESH_MS, self.update_statistics)
+        if self.conn is None:
+            self.stats_counts.config(text="Loading the roster...")
+            return
+        
+        event_id, arrivals = self.attendance.event_id, self.attendance.arrivals
+        if arrivals.event_id != event_id:
+            # First look at this event; from now on the attendance list feeds it
+            arrivals.load(self.conn, event_id)
+        summary = None
+        if event_id is not None:
+            summary = arrival_stats.event_summary(self.conn, event_id)
+        now = datetime.now()
+        minute = now.minute // attendance_db.BUCKET_MINUTES * attendance_db.BUCKET_MINUTES
+        slot = now.strftime('%Y-%m-%d %H:') + f"{minute:02d}"
+        shown = (event_id, arrivals.version, len(self.roster), slot,
+                 summary['checkins'] if summary else 0)
+        if shown == self.stats_shown:
+            return
+        self.stats_shown = shown
+        with metrics.stage('stats.ui'):
+            self.draw_statistics(summary, slot)
+    
+    def draw_statistics(self, summary, slot):
+        """Fill the statistics window from an event summary"""
+        missing = self.attendance.arrivals.missing(self.roster.names)
+        buckets = summary['buckets'] if summary else []
+        counts = dict(buckets)
+        
+        lines = [
+            f"Arrived: {len(self.roster) - len(missing)} of {len(self.roster)} invited",
+            f"Not yet arrived: {len(missing)}",
+            f"Check-ins: {summary['checkins'] if summary else 0}",
+            f"Arrivals since {slot[11:]}: {counts.get(slot, 0)}",
+        ]
+        peak = arrival_stats.peak_bucket(buckets)
+        if peak:
+            lines.append(f"Busiest {attendance_db.BUCKET_MINUTES} minutes: "
+                         f"from {peak[0][11:]} ({peak[1]} arrivals)")
+        if summary and summary['first_at']:
+            lines.append(f"First arrival: {summary['first_at'][11:16]}, "
+                         f"last: {summary['last_at'][11:16]}")
+        self.stats_counts.config(text='\n'.join(lines))
+        self.stats_title.config(
+            text=self.attendance_label.cget('text').replace("Registered Attendees", "Arrivals"))
+        
+        # Bar chart of the latest slots
+        chart = self.stats_chart
+        chart.delete('all')
+        recent = buckets[-STATS_CHART_SLOTS:]
+        if recent:
+            width = max(chart.winfo_width(), 200)
+            height = int(chart.cget('height'))
+            bar_width = width / STATS_CHART_SLOTS
+            tallest = max(count for _, count in recent)
+            for i, (bucket, count) in enumerate(recent):
+                left = i * bar_width + 3
+                middle = left + bar_width / 2 - 3
+                top = 20 + (height - 45) * (1 - count / tallest)
+                chart.create_rectangle(left, top, left + bar_width - 6, height - 25,
+                                       fill='#4CAF50', outline='')
+                chart.create_text(middle, top - 8, text=str(count), fill='white',
+                                  font=('Arial', 8))
+                chart.create_text(middle, height - 12, text=bucket[11:], fill='white',
+                                  font=('Arial', 8))
+        
+        # Only the first names are listed; filling a listbox with 50k rows is slow
+        self.stats_missing.delete(0, tk.END)
+        self.stats_missing.insert(tk.END, *missing[:STATS_MISSING_SHOWN])
+        if len(missing) > STATS_MISSING_SHOWN:
+            self.stats_missing.insert(tk.END, f"... and {len(missing) - STATS_MISSING_SHOWN} more")
+        self.stats_missing_label.config(text=f"Not yet arrived ({len(missing)})")
+    
+    def on_close(self):
+        """Stop the scanner, flush pending check-ins and close the window"""
+        if self.scanning:
+            self.stop_scanner()
+        self.close_statistics()
+        if self.engine is None:
+            # Closed while still loading: wait for the loader and close what it opened
+            self.loader.join()
+            while not self.startup_events.empty():
+                kind, value = self.startup_events.get_nowait()
+                if kind == 'engine':
+                    self.engine = value
+        if self.engine:
+            self.engine.close()
+        if self.metrics_writer:
+            self.metrics_writer.stop()
+        self.root.destroy()
+    
+    def metrics_extra(self):
+        """Scanner and writer counters added to each metrics snapshot"""
+        extra = {'checkins': self.engine.stats() if self.engine else {}}
+        scanner = self.scanner
+        if scanner is not None:
+            extra['cameras'] = scanner.stats()
+        return extra
     
     def __del__(self):
         """Cleanup on exit"""
-        if self.camera:
-            self.camera.release()
-        if hasattr(self, 'conn'):
+        if getattr(self, 'scanner', None):
+            self.scanner.stop()
+        for _, camera in getattr(self, 'cameras', []):
+            camera.release()
+        if getattr(self, 'engine', None):
+            self.engine.writer.close()
+        if getattr(self, 'conn', None):
             self.conn.close()
 
-def main():
+def run_import_roster(args):
+    """Stream a CSV/JSONL roster file into the attendees table"""
+    conn = attendance_db.connect(args.db)
+    progress = None if args.quiet else roster_io.print_progress("Imported")
+    started = time.perf_counter()
+    try:
+        summary = roster_io.import_roster(
+            conn, args.file, fmt=args.format, column=args.column,
+            batch_size=args.batch_size, progress=progress, header=not args.no_header
+        )
+    except ValueError as e:
+        print(f"Cannot import roster: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    if progress:
+        print(file=sys.stderr)
+    print(summary.format())
+    print(f"Finished in {time.perf_counter() - started:.2f}s")
+    return 1 if summary.rejected_count and args.strict else 0
+
+def run_export_attendance(args):
+    """Stream the attendance table to a CSV file"""
+    conn = attendance_db.connect(args.db)
+    progress = None if args.quiet else roster_io.print_progress("Exported")
+    started = time.perf_counter()
+    written = roster_io.export_attendance(conn, args.file, day=args.day, event_id=args.event,
+                                          progress=progress)
+    conn.close()
+    if progress:
+        print(file=sys.stderr)
+    print(f"Exported {written} check-ins to {args.file} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+def run_list_events(args):
+    """Print every event with its days, check-in count and archive"""
+    conn = attendance_db.connect(args.db)
+    events = attendance_db.list_events(conn)
+    conn.close()
+    for event in events:
+        days = event['first_day'] if event['first_day'] == event['last_day'] \
+            else f"{event['first_day']} to {event['last_day']}"
+        where = f"archived: {event['archive_path']}" if event['archived_at'] else 'live'
+        print(f"{event['id']:>5}  {event['name']}  ({days})  {event['checkins']} check-ins, {where}")
+    return 0
+
+def run_report(args):
+    """Print arrival statistics for an event (default: today's)"""
+    conn = attendance_db.connect(args.db)
+    try:
+        report = arrival_stats.arrival_report(conn, args.event, args.missing)
+    except ValueError as e:
+        print(f"Cannot report: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    if report is None:
+        print("No events yet", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(arrival_stats.format_report(report))
+    return 0
+
+def run_create_event(args):
+    """Name an event covering one or more days"""
+    conn = attendance_db.connect(args.db)
+    try:
+        event_id = attendance_db.create_event(conn, args.name, args.start, args.end)
+    except ValueError as e:
+        print(f"Cannot create event: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    print(f"Created event {event_id}: {args.name}")
+    return 0
+
+def run_archive_event(args):
+    """Move past events out of the live database into compressed archive files"""
+    import event_archive
+    conn = attendance_db.connect(args.db)
+    try:
+        event_ids = list(args.event_ids)
+        if args.ended_before:
+            event_ids += [
+                event['id'] for event in attendance_db.list_events(conn)
+                if event['last_day'] < args.ended_before and not event['archived_at']
+            ]
+        failed = 0
+        for event_id in event_ids:
+            started = time.perf_counter()
+            try:
+                path, rows = event_archive.archive_event(conn, event_id, args.dir,
+                                                         allow_current=args.force)
+            except ValueError as e:
+                print(f"Event {event_id}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            print(f"Event {event_id}: archived {rows} check-ins to {path} "
+                  f"({time.perf_counter() - started:.2f}s)")
+        if args.vacuum:
+            before = os.path.getsize(args.db)
+            event_archive.compact_database(conn)
+            print(f"Database compacted from {before / 1e6:.1f} MB to {os.path.getsize(args.db) / 1e6:.1f} MB")
+    finally:
+        conn.close()
+    return 1 if failed else 0
+
+def run_dedupe_roster(args):
+    """List groups of roster names that look like the same person"""
+    from fuzzy_index import FuzzyIndex
+    conn = attendance_db.connect(args.db)
+    started = time.perf_counter()
+    index = FuzzyIndex(attendance_db.iter_attendee_names(conn))
+    conn.close()
+    groups = index.duplicate_groups(min_score=args.min_score)
+    for group in groups:
+        print(' | '.join(group))
+    print(f"{len(groups)} possible duplicate group(s) among {len(index)} names "
+          f"({time.perf_counter() - started:.2f}s)", file=sys.stderr)
+    return 1 if groups and args.strict else 0
+
+def run_serve(args):
+    """Run the headless check-in engine behind the local HTTP API"""
+    import checkin_server
+    checkin_server.serve(args.db, host=args.host, port=args.port, durability=args.durability,
+                         sync_dir=args.sync_dir, metrics_path=args.metrics,
+                         allow_origin=args.allow_origin)
+    return 0
+
+def run_sync(args):
+    """Exchange check-ins with other stations through a shared directory"""
+    from replication import ChangeFeed
+    feed = ChangeFeed(args.db, args.dir)
+    print(f"Station {feed.station} syncing with {args.dir}")
+    try:
+        while True:
+            started = time.perf_counter()
+            exported, applied = feed.sync()
+            print(f"Exported {exported}, applied {applied} check-ins "
+                  f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+    return 0
+
+def run_scan_files(args):
+    """Check people in from recorded video files and image folders"""
+    import batch_scan
+    start = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S') if args.start else None
+    report = None
+    if args.verbose:
+        report = lambda s: print(f"{s.checked_in_at}  {s.payload}  ({os.path.basename(s.source)} @ {s.position})")
+    
+    engine = CheckinEngine(args.db, durability='fast')
+    try:
+        summary = batch_scan.run_batch(
+            engine, args.paths, workers=args.workers, sample_fps=args.sample_fps,
+            chunk_seconds=args.chunk_seconds, gap=args.gap, start=start,
+            backend=args.decoder, dry_run=args.dry_run, report=report,
+        )
+    finally:
+        engine.close()
+    print(summary.format())
+    return 0
+
+def camera_source(value):
+    """A device index ("0") or a path/URL understood by cv2.VideoCapture"""
+    return int(value) if value.isdigit() else value
+
+def default_cameras():
+    """Cameras from ATTENDANCE_CAMERAS (comma-separated), else camera 0"""
+    value = os.environ.get('ATTENDANCE_CAMERAS', '')
+    return [camera_source(part.strip()) for part in value.split(',') if part.strip()] or [0]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Christmas Party Attendance System")
+    parser.add_argument('--db', default=attendance_db.DB_PATH, help="SQLite database file")
+    parser.add_argument('--metrics', metavar='FILE', default=os.environ.get('ATTENDANCE_METRICS'),
+                        help="Record per-stage timings and append snapshots to this file")
+    parser.add_argument('--preview-fps', type=float, default=15.0,
+                        help="Camera preview refresh rate (decoding runs independently)")
+    parser.add_argument('--decoder', default=os.environ.get('ATTENDANCE_QR_BACKEND', 'auto'),
+                        choices=['auto', 'pyzbar', 'opencv', 'cascade', 'opencv+pyzbar'],
+                        help="QR decoder backend; 'auto' benchmarks them at startup")
+    parser.add_argument('--camera', dest='cameras', action='append', type=camera_source,
+                        help="Camera index or stream URL; repeat for several cameras (default: 0)")
+    parser.add_argument('--measure-startup', action='store_true',
+                        help="Print startup timings as JSON and exit once everything has loaded (status 1 if loading fails)")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    import_parser = subparsers.add_parser('import-roster', help="Import a CSV/JSONL roster")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from file extension")
+    import_parser.add_argument('--column', help="Name column/key (default: 'name', or the only column of a CSV)")
+    import_parser.add_argument('--no-header', action='store_true',
+                               help="The CSV has no header row; every row is a name in the first column")
+    import_parser.add_argument('--batch-size', type=int, default=5000)
+    import_parser.add_argument('--strict', action='store_true', help="Exit with 1 if any row was rejected")
+    import_parser.add_argument('--quiet', action='store_true', help="No progress output")
+    import_parser.set_defaults(func=run_import_roster)
+    
+    export_parser = subparsers.add_parser('export-attendance', help="Export check-ins to CSV")
+    export_parser.add_argument('file')
+    export_parser.add_argument('--day', help="Only export one day (YYYY-MM-DD)")
+    export_parser.add_argument('--event', type=int, help="Only export one event (id from 'events')")
+    export_parser.add_argument('--quiet', action='store_true', help="No progress output")
+    export_parser.set_defaults(func=run_export_attendance)
+    
+    events_parser = subparsers.add_parser('events', help="List events and their archives")
+    events_parser.set_defaults(func=run_list_events)
+    
+    report_parser = subparsers.add_parser('report', help="Arrival statistics: check-ins per 15 minutes, who is missing")
+    report_parser.add_argument('--event', type=int, help="Event id from 'events' (default: today's, else the latest)")
+    report_parser.add_argument('--missing', type=int, default=0, metavar='N',
+                               help="Also list up to N guests who have not arrived yet")
+    report_parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    report_parser.set_defaults(func=run_report)
+    
+    create_event_parser = subparsers.add_parser('create-event', help="Name an event spanning one or more days")
+    create_event_parser.add_argument('name')
+    create_event_parser.add_argument('--start', required=True, help="First day (YYYY-MM-DD)")
+    create_event_parser.add_argument('--end', help="Last day (default: the first day)")
+    create_event_parser.set_defaults(func=run_create_event)
+    
+    archive_parser = subparsers.add_parser('archive-event', help="Move past events to compressed archive files")
+    archive_parser.add_argument('event_ids', nargs='*', type=int)
+    archive_parser.add_argument('--ended-before', metavar='DAY', help="Also archive every event that ended before this day")
+    archive_parser.add_argument('--dir', default='archive', help="Archive directory (default: ./archive)")
+    archive_parser.add_argument('--vacuum', action='store_true', help="Shrink the database file afterwards")
+    archive_parser.add_argument('--force', action='store_true', help="Archive events that have not ended yet")
+    archive_parser.set_defaults(func=run_archive_event)
+    
+    dedupe_parser = subparsers.add_parser('dedupe-roster', help="List near-duplicate roster names")
+    dedupe_parser.add_argument('--min-score', type=float, default=0.85,
+                               help="Similarity (0-1) two names need to be reported")
+    dedupe_parser.add_argument('--strict', action='store_true', help="Exit with 1 if any group was found")
+    dedupe_parser.set_defaults(func=run_dedupe_roster)
+    
+    serve_parser = subparsers.add_parser('serve', help="Run the headless check-in HTTP API")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Use 0.0.0.0 to accept other kiosks")
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--durability', choices=['fast', 'normal', 'full'], default='normal')
+    serve_parser.add_argument('--sync-dir', default=os.environ.get('ATTENDANCE_SYNC_DIR'),
+                              help="Replicate check-ins with other stations via this directory")
+    serve_parser.add_argument('--allow-origin',
+                              help="Browser origin allowed to call the API, e.g. http://localhost:5173 "
+                                   "(default: none, CORS off)")
+    serve_parser.set_defaults(func=run_serve)
+    
+    sync_parser = subparsers.add_parser('sync', help="Replicate check-ins via a shared directory")
+    sync_parser.add_argument('--dir', required=True, help="Shared sync directory")
+    sync_parser.add_argument('--watch', type=float, metavar='SECONDS', help="Keep syncing at this interval")
+    sync_parser.set_defaults(func=run_sync)
+    
+    scan_parser = subparsers.add_parser('scan-files', help="Check in from recorded video files or image folders")
+    scan_parser.add_argument('paths', nargs='+', help="Video files and/or directories of images")
+    scan_parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    scan_parser.add_argument('--sample-fps', type=float, default=10.0,
+                             help="Video frames decoded per second of footage (0 = every frame)")
+    scan_parser.add_argument('--chunk-seconds', type=float, default=60.0, help="Footage per worker job")
+    scan_parser.add_argument('--gap', type=float, default=5.0,
+                             help="Seconds a badge must be out of view before it counts again")
+    scan_parser.add_argument('--start', help="Recording start 'YYYY-MM-DD HH:MM:SS' (default: file time minus duration)")
+    scan_parser.add_argument('--dry-run', action='store_true', help="Decode and report without registering")
+    scan_parser.add_argument('--verbose', action='store_true', help="Print every sighting")
+    scan_parser.set_defaults(func=run_scan_files)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command:
+        return args.func(args)
+    
     root = tk.Tk()
-    app = AttendanceSystem(root)
+    app = AttendanceSystem(root, db_path=args.db, metrics_path=args.metrics,
+                           preview_fps=args.preview_fps, measure_startup=args.measure_startup,
+                           decoder=args.decoder, cameras=args.cameras or default_cameras())
     root.mainloop()
+    return app.exit_code
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
@@ -0,0 +1,309 @@
+"""
+Headless batch check-in from recorded video files and image folders.
+
+Each input is split into chunks (a range of video frames, or a slice of a
+folder's images) and the chunks are decoded in a process pool, one
+DecodeEngine per worker. Video is sampled at ``sample_fps``: frames in
+between are only grabbed, not decoded. A sampled frame that is almost
+identical to the last decoded one (a door with nobody in front of it)
+reuses that frame's result instead of being decoded again; a tiny
+thumbnail difference decides. Together this keeps processing far faster
+than real time.
+
+Results come back in input order. A payload that keeps being seen in
+adjacent frames counts as one sighting until it has been out of view for
+``gap`` seconds (the same RecentScanCache the live scanner uses). Each
+sighting is registered through CheckinEngine.check_in with the frame's
+wall-clock time as checked_in_at, so compact badges, unknown names and
+the one-check-in-per-day rule behave exactly as at the kiosk. A guest
+seen in several recordings, or already checked in at a later time, keeps
+the earliest sighting (as with replicated check-ins), whatever order the
+inputs are processed in.
+
+A video's start time is taken from ``start`` if given, otherwise from the
+file's modification time minus its duration (cameras usually close the
+file when recording stops). Images use their modification time.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+
+import attendance_db
+import qr_payload
+from checkin_engine import UnknownAttendee
+from qr_decoder import DecodeEngine, make_backend, select_backend_name
+from scan_pipeline import RecentScanCache
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# Thumbnail used to spot unchanged frames, and the mean absolute difference
+# (0-255) below which a frame counts as unchanged
+THUMBNAIL_SIZE = (80, 45)
+STILL_THRESHOLD = 2.0
+
+
+class Sighting:
+    """A payload first seen at a given time in one input"""
+
+    def __init__(self, payload, source, position, seen_at):
+        self.payload = payload
+        self.source = source
+        self.position = position  # frame index or image path
+        self.seen_at = seen_at
+
+    @property
+    def checked_in_at(self):
+        return self.seen_at.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BatchSummary:
+    """Counters for a batch run"""
+
+    def __init__(self):
+        self.inputs = 0
+        self.frames = 0
+        self.unchanged = 0
+        self.media_seconds = 0.0
+        self.elapsed = 0.0
+        self.sightings = 0
+        self.registered = 0
+        self.already = 0
+        self.unknown = []
+        self.invalid = []
+        self.archived = 0
+
+    def format(self):
+        speed = self.media_seconds / self.elapsed if self.elapsed and self.media_seconds else 0.0
+        lines = [
+            f"Scanned {self.frames} frames ({self.unchanged} unchanged) from {self.inputs} "
+            f"input(s) in {self.elapsed:.1f}s" + (f" ({speed:.0f}x real time)" if speed else ''),
+            f"{self.sightings} sightings: {self.registered} registered, "
+            f"{self.already} already registered, {len(self.unknown)} unknown, "
+            f"{len(self.invalid)} invalid",
+        ]
+        if self.archived:
+            lines.append(f"  {self.archived} sightings fall on archived events and were skipped")
+        for payload in self.unknown[:20]:
+            lines.append(f"  unknown: {payload}")
+        for payload in self.invalid[:20]:
+            lines.append(f"  invalid: {payload}")
+        return '\n'.join(lines)
+
+
+def list_images(directory):
+    """Image files in a folder, oldest first"""
+    paths = [
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def video_info(path):
+    """(fps, frame count) of a video file; the count is 0 if unknown"""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise OSError(f"Cannot open video: {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        capture.release()
+    return fps, count
+
+
+_worker_engine = None
+
+
+def _engine(backend):
+    """One DecodeEngine per worker process, reused across chunks"""
+    global _worker_engine
+    if _worker_engine is None:
+        # Recorded footage is decoded frame by frame; never idle-skip
+        _worker_engine = DecodeEngine(idle_after=float('inf'), backend=make_backend(backend))
+    return _worker_engine
+
+
+def _scan_video_chunk(job):
+    """Worker: decode every step-th frame in [start, end)
+
+    Returns (frames scanned, frames unchanged, [(payload, index)]).
+    """
+    path, start, end, step, fps, backend = job
+    engine = _engine(backend)
+    engine.reset()
+    capture = cv2.VideoCapture(path)
+    found = []
+    scanned = unchanged = 0
+    last_thumbnail, last_payloads = None, []
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while end is None or index < end:
+            if (index - start) % step:
+                # Skipped frames are only grabbed, not converted to BGR
+                if not capture.grab():
+                    break
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                scanned += 1
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                thumbnail = cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+                if last_thumbnail is not None and \
+                        cv2.absdiff(thumbnail, last_thumbnail).mean() < STILL_THRESHOLD:
+                    # Same scene as the last decoded frame: same codes
+                    unchanged += 1
+                else:
+                    last_thumbnail = thumbnail
+                    last_payloads = [hit.data for hit in engine.decode(gray, now=index / fps)]
+                found.extend((payload, index) for payload in last_payloads)
+            index += 1
+    finally:
+        capture.release()
+    return scanned, unchanged, found
+
+
+def _scan_image_chunk(job):
+    """Worker: decode a list of image files; returns (images, 0, [(payload, path)])"""
+    paths, backend = job
+    engine = _engine(backend)
+    found = []
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        engine.reset()
+        for hit in engine.decode(frame):
+            found.append((hit.data, path))
+    return len(paths), 0, found
+
+
+def plan_jobs(paths, sample_fps=10.0, chunk_seconds=60.0, images_per_chunk=200,
+              backend='opencv', start=None):
+    """Split the inputs into worker jobs
+
+    Returns a list of (source, kind, job, timing) where timing turns a
+    worker result position into a datetime.
+    """
+    planned = []
+    for path in paths:
+        if os.path.isdir(path):
+            images = list_images(path)
+            for i in range(0, len(images), images_per_chunk):
+                planned.append((path, 'images', (images[i:i + images_per_chunk], backend), None))
+            continue
+
+        fps, count = video_info(path)
+        duration = count / fps if count else 0.0
+        if start is not None:
+            started_at = start
+        else:
+            started_at = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+        step = max(1, round(fps / sample_fps)) if sample_fps else 1
+        chunk = max(step, int(chunk_seconds * fps) // step * step)
+        timing = (started_at, fps, duration)
+        if not count:
+            planned.append((path, 'video', (path, 0, None, step, fps, backend), timing))
+            continue
+        for first in range(0, count, chunk):
+            job = (path, first, min(count, first + chunk), step, fps, backend)
+            planned.append((path, 'video', job, timing))
+    return planned
+
+
+def iter_sightings(planned, workers=None, gap=5.0, summary=None):
+    """Decode all jobs in parallel; yields Sightings per input in time order"""
+    summary = summary or BatchSummary()
+    executor = None
+    if workers != 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    run = executor.map if executor else map
+    try:
+        kinds = [kind for _, kind, _, _ in planned]
+        jobs = [job for _, _, job, _ in planned]
+        results = run(_scan_worker, zip(kinds, jobs))
+
+        recent, current = None, None
+        for (source, kind, job, timing), (scanned, unchanged, found) in zip(planned, results):
+            if source != current:
+                # Dedupe across adjacent frames (and chunk boundaries) of one input
+                current, recent = source, RecentScanCache(cooldown=gap)
+                summary.inputs += 1
+                if timing:
+                    summary.media_seconds += timing[2]
+            summary.frames += scanned
+            summary.unchanged += unchanged
+
+            if kind == 'video':
+                started_at, fps, _ = timing
+                seen = [(payload, index, started_at + timedelta(seconds=index / fps))
+                        for payload, index in found]
+            else:
+                seen = [(payload, path, datetime.fromtimestamp(os.path.getmtime(path)))
+                        for payload, path in found]
+                seen.sort(key=lambda item: item[2])
+
+            for payload, position, seen_at in seen:
+                if recent.check(payload, now=seen_at.timestamp()):
+                    summary.sightings += 1
+                    yield Sighting(payload, source, position, seen_at)
+    finally:
+        if executor:
+            executor.shutdown()
+
+
+def _scan_worker(item):
+    kind, job = item
+    if kind == 'video':
+        return _scan_video_chunk(job)
+    return _scan_image_chunk(job)
+
+
+def run_batch(engine, paths, workers=None, sample_fps=10.0, chunk_seconds=60.0, gap=5.0,
+              start=None, backend=None, dry_run=False, report=None):
+    """Decode the inputs and register every sighting through the check-in engine"""
+    summary = BatchSummary()
+    started = time.perf_counter()
+    # Resolve 'auto' once here instead of benchmarking in every worker
+    backend = backend or 'auto'
+    if backend == 'auto':
+        backend = select_backend_name()
+
+    planned = plan_jobs(paths, sample_fps, chunk_seconds, backend=backend, start=start)
+    pending = []
+    for sighting in iter_sightings(planned, workers, gap, summary):
+        if report:
+            report(sighting)
+        if dry_run:
+            continue
+        try:
+            future = engine.check_in(sighting.payload, checked_in_at=sighting.checked_in_at,
+                                     keep_earliest=True)
+        except qr_payload.InvalidPayload:
+            summary.invalid.append(sighting.payload)
+            continue
+        except UnknownAttendee:
+            summary.unknown.append(sighting.payload)
+            continue
+        pending.append(future)
+
+    # The writer group-commits everything queued above
+    for future in pending:
+        try:
+            registered = future.result().registered
+        except attendance_db.EventArchived:
+            summary.archived += 1
+            continue
+        if registered:
+            summary.registered += 1
+        else:
+            summary.already += 1
+    summary.elapsed = time.perf_counter() - started
+    return summary
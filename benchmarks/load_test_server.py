@@ -0,0 +1,154 @@
+"""
+Load test for the check-in HTTP API.
+
+Starts the server in a separate process on a throwaway database (or
+targets --url), then runs many concurrent keep-alive clients that post
+check-ins for random roster names. Prints a JSON summary with sustained
+requests and new check-ins per second, the number of duplicates (names
+drawn again, answered already_registered) and latency percentiles.
+
+    python benchmarks/load_test_server.py --clients 50 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import checkin_server  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def request(reader, writer, method, path, body=None):
+    data = b'' if body is None else json.dumps(body).encode('utf-8')
+    writer.write((
+        f"{method} {path} HTTP/1.1\r\nHost: load-test\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+    ).encode('latin-1') + data)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length) if length else b''
+    return status, body
+
+
+async def client(host, port, names, deadline, latencies, statuses, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, body = await request(reader, writer, 'POST', '/checkin',
+                                         {'name': random.choice(names)})
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                # 'registered' or 'already_registered'
+                result = json.loads(body).get('status')
+                results[result] = results.get(result, 0) + 1
+    finally:
+        writer.close()
+
+
+async def wait_until_up(host, port, timeout=15.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, _ = await request(reader, writer, 'GET', '/health')
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not come up")
+
+
+async def run_load(host, port, names, clients, duration):
+    await wait_until_up(host, port)
+    latencies, statuses, results = [], {}, {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        client(host, port, names, deadline, latencies, statuses, results) for _ in range(clients)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'duration_s': round(elapsed, 2),
+        'requests': len(latencies),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'checkins': results.get('registered', 0),
+        'checkins_per_s': round(results.get('registered', 0) / elapsed, 1),
+        'duplicates': results.get('already_registered', 0),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        'status_counts': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Existing server (default: start one on a temp database)")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--roster', type=int, default=20000, help="Synthetic roster size")
+    parser.add_argument('--durability', choices=['fast', 'normal', 'full'], default='normal')
+    args = parser.parse_args(argv)
+
+    names = [f"Guest {i:06d}" for i in range(args.roster)]
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='checkin-load-')
+        db_path = os.path.join(tmpdir, 'attendance.db')
+        conn = attendance_db.connect(db_path)
+        attendance_db.add_attendees(conn, names)
+        conn.close()
+        host, port = '127.0.0.1', 18765
+        server = multiprocessing.Process(
+            target=checkin_server.serve, args=(db_path, host, port, args.durability), daemon=True
+        )
+        server.start()
+
+    try:
+        summary = asyncio.run(run_load(host, port, names, args.clients, args.duration))
+    finally:
+        if server:
+            server.terminate()
+            server.join()
+    summary['durability'] = args.durability
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
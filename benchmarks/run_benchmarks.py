@@ -0,0 +1,629 @@
+"""
+Benchmark suite for the scanning, roster and check-in hot paths.
+
+Suites (all run by default, pick some with --suites):
+
+    decode      QR decode path on a synthetic frame corpus rendered with
+                generate_qr_for_name: several resolutions, code sizes, blur
+                and noise levels. Times DecodeEngine.decode with every
+                available decoder backend, both cold (no tracked region) and
+                while tracking, and the whole ScanPipeline (auto-selected
+                backend) fed by a synthetic camera instead of a webcam.
+    roster      RosterIndex build, search (what filter_names runs) and
+                duplicate lookups at 1k/10k/100k names; FuzzyIndex build,
+                suggestions for misspelled names and a whole-roster
+                duplicate pass.
+    checkin     CheckinEngine.submit_check_in (what register_attendance_by_name
+                runs) for new and duplicate check-ins, against databases
+                pre-filled with 10k to 1M check-ins.
+    attendance  AttendanceList (the kiosk's attendance list without its
+                widgets) refresh and paging of older rows against the same
+                databases, with a headless stand-in for the Treeview;
+                the arrival statistics report and the kiosk's "not yet
+                arrived" set difference against a 50k roster.
+
+Everything runs on throwaway data in a temp directory. Results are printed
+(or written with --output) as JSON, together with the machine, Python and
+library versions, so runs on different kiosk hardware can be compared.
+--compare checks a run against an earlier result file and exits with
+status 1 if any case got slower than --threshold times its baseline.
+
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --output kiosk-a.json
+    python benchmarks/run_benchmarks.py --compare kiosk-a.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arrival_stats  # noqa: E402
+import attendance_db  # noqa: E402
+from attendance_list import AttendanceList  # noqa: E402
+from fuzzy_index import FuzzyIndex  # noqa: E402
+from roster_index import RosterIndex  # noqa: E402
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Chen", "Wei", "Aisha", "Mohammed", "Sofia", "Mateo", "Zoë",
+    "François", "Ingrid", "Hiroshi", "Priya", "Olumide",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Nguyen", "Müller", "O'Brien",
+    "Kowalski", "Tanaka", "Okafor", "Van der Berg", "Fernández", "Johansson", "Patel",
+]
+
+# Payloads for the decode corpus: a typical name and a long one (denser code)
+DECODE_PAYLOADS = {
+    'short': "Jane Smith",
+    'long': "Bartholomew Featherstonehaugh-Wolfeschlegel Montgomery",
+}
+
+FULL_CONFIG = {
+    'resolutions': [(640, 480), (1280, 720), (1920, 1080)],
+    'code_fractions': [0.2, 0.45],
+    'blurs': [0.0, 2.0],
+    'noises': [0.0, 20.0],
+    'roster_sizes': [1000, 10000, 100000],
+    'db_sizes': [10000, 100000, 1000000],
+    'repeat': 7,
+    'checkins': 2000,
+    'pipeline_seconds': 3.0,
+}
+
+QUICK_CONFIG = {
+    'resolutions': [(640, 480), (1280, 720)],
+    'code_fractions': [0.3],
+    'blurs': [0.0, 2.0],
+    'noises': [0.0],
+    'roster_sizes': [1000, 10000],
+    'db_sizes': [10000, 100000],
+    'repeat': 3,
+    'checkins': 500,
+    'pipeline_seconds': 1.0,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples):
+    """Timing summary (in ms) of a list of durations in seconds"""
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'median_ms': round(percentile(samples, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 4),
+        'min_ms': round(samples[0] * 1000, 4) if samples else 0.0,
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 4) if samples else 0.0,
+    }
+
+
+def time_calls(fn, repeat, warmup=1, setup=None):
+    """Call fn() warmup + repeat times; returns the timed durations in seconds
+
+    setup(), if given, runs untimed before every call.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def synthetic_names(count, seed=0):
+    """Unique, realistic-looking names (repeats get a numeric suffix)"""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in names:
+            name = f"{name} {rng.randrange(1, count * 10)}"
+        names.add(name)
+    return sorted(names)
+
+
+class Recorder:
+    """Collects result rows and prints a short progress line for each"""
+
+    def __init__(self, verbose=True):
+        self.results = []
+        self.verbose = verbose
+
+    def add(self, suite, case, params, samples=None, **extra):
+        row = {'suite': suite, 'case': case, 'params': params}
+        if samples is not None:
+            row.update(summarize(samples))
+        row.update(extra)
+        self.results.append(row)
+        if self.verbose:
+            timing = f"median {row['median_ms']:.3f} ms" if 'median_ms' in row else ''
+            details = ' '.join(f"{k}={v}" for k, v in extra.items())
+            print(f"  {suite:<10} {case:<60} {timing} {details}", file=sys.stderr)
+
+    def skip(self, suite, reason):
+        self.results.append({'suite': suite, 'skipped': reason})
+        print(f"  {suite:<10} skipped: {reason}", file=sys.stderr)
+
+
+# Decode suite
+
+def build_frame(code, resolution, fraction, blur, noise, rng):
+    """Place a grayscale QR image on a textured background and degrade it"""
+    import cv2
+    import numpy as np
+
+    width, height = resolution
+    # Low-frequency texture so the background is not a flat colour
+    texture = rng.integers(70, 200, (height // 16 + 1, width // 16 + 1), dtype=np.uint8)
+    frame = cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    side = int(min(width, height) * fraction)
+    scaled = cv2.resize(code, (side, side), interpolation=cv2.INTER_AREA)
+    x, y = (width - side) // 3, (height - side) // 2
+    frame[y:y + side, x:x + side] = scaled
+
+    if blur:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    if noise:
+        noisy = frame.astype(np.float32) + rng.normal(0, noise, frame.shape)
+        frame = np.clip(noisy, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+def build_corpus(workdir, config, seed):
+    """Render the QR codes and compose one frame per (payload, condition)"""
+    import cv2
+    import numpy as np
+    from generate_qr_codes import generate_qr_for_name
+
+    rng = np.random.default_rng(seed)
+    qr_dir = os.path.join(workdir, 'qr')
+    corpus = []
+    for label, payload in DECODE_PAYLOADS.items():
+        path = generate_qr_for_name(payload, qr_dir, quiet=True)
+        code = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        for resolution in config['resolutions']:
+            for fraction in config['code_fractions']:
+                for blur in config['blurs']:
+                    for noise in config['noises']:
+                        params = {
+                            'payload': label, 'resolution': f"{resolution[0]}x{resolution[1]}",
+                            'code_fraction': fraction, 'blur_sigma': blur, 'noise_sigma': noise,
+                        }
+                        frame = build_frame(code, resolution, fraction, blur, noise, rng)
+                        corpus.append((params, payload, frame))
+    return corpus
+
+
+class SyntheticCamera:
+    """cv2.VideoCapture stand-in that replays frames at a fixed frame rate"""
+
+    def __init__(self, frames, fps=30.0):
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.index = 0
+        self.next_at = time.perf_counter()
+
+    def read(self):
+        delay = self.next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = max(self.next_at + self.interval, time.perf_counter())
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        # The pipeline draws on the frame, so hand out a copy like a camera would
+        return True, frame.copy()
+
+    def release(self):
+        pass
+
+
+def bench_decode(recorder, config, workdir, seed):
+    from qr_decoder import DecodeEngine, available_backends, make_backend
+    from scan_pipeline import ScanPipeline
+
+    corpus = build_corpus(workdir, config, seed)
+    for backend_name in available_backends():
+        for params, payload, frame in corpus:
+            params = dict(params, backend=backend_name)
+            case = '{backend}/{payload}/{resolution}/code{code_fraction}/blur{blur_sigma}/noise{noise_sigma}'.format(**params)
+            # Never idle-skip: we want the cost of every decode
+            engine = DecodeEngine(idle_after=float('inf'), backend=make_backend(backend_name))
+
+            decoded = []
+
+            def cold():
+                engine.reset()
+                hits = engine.decode(frame)
+                decoded.append(any(hit.data == payload for hit in hits))
+
+            samples = time_calls(cold, config['repeat'])
+            recorder.add('decode', f"cold/{case}", params, samples,
+                         decoded=all(decoded[1:]), passes=dict(engine.counts))
+
+            # Tracking: the region of interest from the previous hit is reused
+            engine = DecodeEngine(idle_after=float('inf'), backend=make_backend(backend_name))
+            samples = time_calls(lambda: engine.decode(frame), config['repeat'] * 3)
+            recorder.add('decode', f"tracking/{case}", params, samples, passes=dict(engine.counts))
+
+    # End to end: capture thread, decode thread and preview, from a 30 fps camera
+    for resolution in config['resolutions']:
+        label = f"{resolution[0]}x{resolution[1]}"
+        frames = [frame for params, _, frame in corpus if params['resolution'] == label]
+        pipeline = ScanPipeline(SyntheticCamera(frames))
+        pipeline.start()
+        time.sleep(config['pipeline_seconds'])
+        stats = pipeline.stats()
+        results = len(pipeline.poll_results())
+        pipeline.stop()
+        recorder.add('decode', f"pipeline/{label}", {'resolution': label, 'camera_fps': 30},
+                     capture_fps=round(stats['capture_fps'], 2),
+                     decode_fps=round(stats['decode_fps'], 2),
+                     latency_ms=round(stats['latency_ms'], 3),
+                     latency_p95_ms=round(stats['latency_p95_ms'], 3),
+                     dropped_frames=stats['dropped_frames'], results=results,
+                     backend=stats['backend'])
+
+
+# Roster suite
+
+def bench_roster(recorder, config, seed):
+    for size in config['roster_sizes']:
+        params = {'names': size}
+        names = synthetic_names(size, seed)
+        samples = time_calls(lambda: RosterIndex(names), max(1, config['repeat'] // 2), warmup=0)
+        recorder.add('roster', f"build/{size}", params, samples)
+
+        index = RosterIndex(names)
+        sample_name = names[len(names) // 2]
+        terms = {
+            'single_char': 'a',
+            'prefix': sample_name.split()[0][:3],
+            'surname': sample_name.split()[-1],
+            'full_name': sample_name,
+            'substring': sample_name[2:6],
+            'miss': 'zzqxj',
+        }
+        # An unrelated search first, so incremental narrowing does not kick in
+        forget = lambda: index.search('\x00')
+        for label, term in terms.items():
+            search = lambda: len(index.matching_names(term))
+            samples = time_calls(search, config['repeat'] * 3, setup=forget)
+            recorder.add('roster', f"search/{label}/{size}", dict(params, term=term), samples,
+                         matches=search())
+
+        # Typing a name one key at a time, as the debounced filter sees it
+        typed = sample_name.lower()
+
+        def typing():
+            for end in range(1, len(typed) + 1):
+                index.matching_names(typed[:end])
+        samples = time_calls(typing, config['repeat'], setup=forget)
+        recorder.add('roster', f"typing/{size}", dict(params, term=typed), samples)
+
+        # Duplicate checks: scanned name against the roster and the recent-scan cache
+        lookups = [names[i] for i in range(0, size, max(1, size // 1000))]
+        lookups += [f"{name} (not invited)" for name in lookups[:100]]
+
+        def lookup():
+            return sum(1 for name in lookups if name in index)
+        samples = time_calls(lookup, config['repeat'] * 3)
+        recorder.add('roster', f"duplicate_lookup/{size}", dict(params, lookups=len(lookups)),
+                     samples, per_lookup_us=round(min(samples) / len(lookups) * 1e6, 4))
+
+        # Fuzzy matching: "did you mean" for unknown scans, and roster dedupe
+        samples = time_calls(lambda: FuzzyIndex(names), 1, warmup=0)
+        recorder.add('roster', f"fuzzy_build/{size}", params, samples)
+        fuzzy = FuzzyIndex(names)
+        rng = random.Random(seed)
+        typos = [misspell(names[rng.randrange(size)], rng) for _ in range(50)]
+
+        def suggest():
+            return sum(1 for typo in typos if fuzzy.suggest(typo))
+        samples = time_calls(suggest, config['repeat'])
+        recorder.add('roster', f"fuzzy_suggest/{size}", dict(params, queries=len(typos)), samples,
+                     per_query_ms=round(min(samples) / len(typos) * 1000, 3), found=suggest())
+        samples = time_calls(fuzzy.duplicate_groups, 1, warmup=0)
+        recorder.add('roster', f"fuzzy_dedupe/{size}", params, samples,
+                     groups=len(fuzzy.duplicate_groups()))
+
+
+def misspell(name, rng):
+    """The name with one random typo: a dropped, doubled or swapped letter"""
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+
+# Check-in and attendance suites
+
+def prefill_database(path, rows, seed):
+    """Database with a small roster and `rows` check-ins on past days up to today
+
+    Every day is its own event, so today's event (what the kiosk shows)
+    holds at most one day's worth of the rows.
+    """
+    conn = attendance_db.connect(path)
+    attendance_db.add_attendees(conn, synthetic_names(1000, seed))
+    per_day = 50000
+    days = (rows + per_day - 1) // per_day
+    first = datetime.date.today() - datetime.timedelta(days=days - 1)
+    day_names = [(first + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+
+    def generate():
+        for i in range(rows):
+            day = day_names[i // per_day]
+            yield (f"Guest {i % per_day:06d}", f"{day} 18:{i % 60:02d}:00", day)
+
+    with conn:
+        conn.executemany(
+            'INSERT INTO attendance (name, checked_in_at, day) VALUES (?, ?, ?)', generate()
+        )
+        attendance_db.assign_events(conn)
+    conn.close()
+
+
+def bench_checkin(recorder, config, workdir, db_sizes, seed):
+    from checkin_engine import CheckinEngine
+
+    for rows in db_sizes:
+        path = os.path.join(workdir, f"checkin-{rows}.db")
+        prefill_database(path, rows, seed)
+        params = {'db_rows': rows, 'durability': 'normal'}
+        engine = CheckinEngine(path, durability='normal')
+        try:
+            count = config['checkins']
+            new_names = [f"Walk-in {i:06d}" for i in range(count)]
+
+            # Throughput: everything queued at once, as with several scanners
+            started = time.perf_counter()
+            futures = [engine.submit_check_in(name) for name in new_names]
+            registered = sum(1 for future in futures if future.result().registered)
+            elapsed = time.perf_counter() - started
+            recorder.add('checkin', f"burst_new/{rows}", dict(params, checkins=count),
+                         checkins_per_s=round(count / elapsed, 1), registered=registered,
+                         commits=engine.writer.commits)
+
+            started = time.perf_counter()
+            futures = [engine.submit_check_in(name) for name in new_names]
+            duplicates = sum(1 for future in futures if not future.result().registered)
+            elapsed = time.perf_counter() - started
+            recorder.add('checkin', f"burst_duplicate/{rows}", dict(params, checkins=count),
+                         checkins_per_s=round(count / elapsed, 1), duplicates=duplicates)
+
+            # Latency: one scan at a time, waiting for each to be committed
+            singles = iter(f"Single {i:06d}" for i in range(10 ** 6))
+            samples = time_calls(lambda: engine.submit_check_in(next(singles)).result(),
+                                 config['repeat'] * 20)
+            recorder.add('checkin', f"single_new/{rows}", params, samples)
+            samples = time_calls(lambda: engine.submit_check_in(new_names[0]).result(),
+                                 config['repeat'] * 20)
+            recorder.add('checkin', f"single_duplicate/{rows}", params, samples)
+        finally:
+            engine.close()
+
+
+class HeadlessTree:
+    """Just enough of ttk.Treeview for AttendanceList"""
+
+    def __init__(self):
+        self.items = []
+
+    def get_children(self, item=''):
+        return tuple(iid for iid, _ in self.items)
+
+    def insert(self, parent, index, iid=None, values=()):
+        position = len(self.items) if index == 'end' else index
+        self.items.insert(position, (iid, values))
+        return iid
+
+    def delete(self, *iids):
+        doomed = set(iids)
+        self.items = [item for item in self.items if item[0] not in doomed]
+
+
+def bench_attendance(recorder, config, workdir, db_sizes, seed):
+    for rows in db_sizes:
+        path = os.path.join(workdir, f"attendance-{rows}.db")
+        if not os.path.exists(path):
+            prefill_database(path, rows, seed)
+        params = {'db_rows': rows}
+
+        conn = sqlite3.connect(path)
+        tree = HeadlessTree()
+        attendance = AttendanceList(conn, tree)
+        try:
+            samples = time_calls(attendance.refresh, config['repeat'] * 3)
+            recorder.add('attendance', f"refresh/{rows}", params, samples,
+                         rows_shown=len(tree.items))
+
+            def page_through():
+                attendance.refresh()
+                for _ in range(9):
+                    attendance.load_older()
+            samples = time_calls(page_through, config['repeat'])
+            recorder.add('attendance', f"refresh_and_9_pages/{rows}", params, samples,
+                         rows_shown=len(tree.items))
+
+            attendance.refresh()
+            attendance_db.check_in(conn, 'Late Arrival')
+            samples = time_calls(attendance.append_new, config['repeat'] * 3, warmup=0)
+            recorder.add('attendance', f"append_new/{rows}", params, samples)
+
+            # Summary rows only; independent of how many check-ins there are
+            event_id = attendance.event_id
+            samples = time_calls(lambda: arrival_stats.event_summary(conn, event_id),
+                                 config['repeat'] * 3)
+            recorder.add('attendance', f"arrival_summary/{rows}", params, samples)
+
+            tracker = arrival_stats.ArrivalTracker()
+            samples = time_calls(lambda: tracker.load(conn, event_id), config['repeat'])
+            recorder.add('attendance', f"arrivals_load/{rows}", params, samples,
+                         arrived=len(tracker.arrived))
+            # Each sample follows a new arrival, so the difference is recomputed
+            roster = [f"Guest {i:06d}" for i in range(50000)]
+            arrivals = iter(f"Arrival {i:06d}" for i in range(10 ** 6))
+            samples = time_calls(lambda: tracker.missing(roster), config['repeat'],
+                                 setup=lambda: tracker.add(next(arrivals)))
+            recorder.add('attendance', f"not_yet_arrived/{rows}", dict(params, roster=len(roster)),
+                         samples, missing=len(tracker.missing(roster)))
+        finally:
+            conn.close()
+
+
+# Reporting
+
+def machine_info():
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+    for module in ('cv2', 'numpy', 'PIL', 'qrcode', 'pyzbar'):
+        try:
+            info[module] = getattr(__import__(module), '__version__', 'installed')
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def result_key(row):
+    return row.get('suite'), row.get('case')
+
+
+def compare(results, baseline_path, threshold):
+    """Print timing changes against a baseline; returns the regressed cases"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result_key(row): row for row in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (threshold {threshold:.2f}x):", file=sys.stderr)
+    for row in results:
+        old = baseline.get(result_key(row))
+        if old is None:
+            continue
+        # Timed cases compare medians; throughput cases compare rates
+        if row.get('median_ms') and old.get('median_ms'):
+            ratio = row['median_ms'] / old['median_ms']
+        elif row.get('checkins_per_s') and old.get('checkins_per_s'):
+            ratio = old['checkins_per_s'] / row['checkins_per_s']
+        else:
+            continue
+        flag = 'REGRESSION' if ratio > threshold else ''
+        print(f"  {row['suite']:<10} {row['case']:<60} {ratio:6.2f}x {flag}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(dict(row, ratio=round(ratio, 3)))
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--suites', default='decode,roster,checkin,attendance',
+                        help="Comma-separated suites to run")
+    parser.add_argument('--quick', action='store_true', help="Smaller corpus and sizes")
+    parser.add_argument('--roster-sizes', type=parse_sizes, help="e.g. 1000,10000,100000")
+    parser.add_argument('--db-sizes', type=parse_sizes, help="e.g. 10000,100000,1000000")
+    parser.add_argument('--repeat', type=int, help="Timed runs per case")
+    parser.add_argument('--seed', type=int, default=1225)
+    parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier result file to compare with")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Slowdown ratio that counts as a regression")
+    parser.add_argument('--keep', action='store_true', help="Keep the temp directory")
+    args = parser.parse_args(argv)
+
+    config = dict(QUICK_CONFIG if args.quick else FULL_CONFIG)
+    if args.roster_sizes:
+        config['roster_sizes'] = args.roster_sizes
+    if args.db_sizes:
+        config['db_sizes'] = args.db_sizes
+    if args.repeat:
+        config['repeat'] = args.repeat
+    suites = [suite.strip() for suite in args.suites.split(',') if suite.strip()]
+
+    recorder = Recorder()
+    workdir = tempfile.mkdtemp(prefix='attendance-bench-')
+    started = time.perf_counter()
+    try:
+        for suite in suites:
+            print(f"Running {suite} benchmarks...", file=sys.stderr)
+            try:
+                if suite == 'decode':
+                    bench_decode(recorder, config, workdir, args.seed)
+                elif suite == 'roster':
+                    bench_roster(recorder, config, args.seed)
+                elif suite == 'checkin':
+                    bench_checkin(recorder, config, workdir, config['db_sizes'], args.seed)
+                elif suite == 'attendance':
+                    bench_attendance(recorder, config, workdir, config['db_sizes'], args.seed)
+                else:
+                    parser.error(f"unknown suite: {suite}")
+            except ImportError as e:
+                # e.g. no camera stack on a build machine; the other suites still run
+                recorder.skip(suite, str(e))
+    finally:
+        if args.keep:
+            print(f"Benchmark data kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': dict(machine_info(), quick=args.quick, seed=args.seed, config=config,
+                     elapsed_s=round(time.perf_counter() - started, 2)),
+        'results': recorder.results,
+    }
+
+    status = 0
+    if args.compare:
+        report['regressions'] = compare(recorder.results, args.compare, args.threshold)
+        status = 1 if report['regressions'] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+GUI-independent check-in engine.
+
+Owns everything a check-in needs apart from widgets: the roster index,
+badge payload resolution, the group-commit writer and a small pool of read
+connections. The Tk kiosk, the HTTP server and the batch tools all go
+through this class, so they share one duplicate check and one write path.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import arrival_stats
+import attendance_db
+import qr_payload
+from checkin_writer import CheckinWriter
+from fuzzy_index import FuzzyIndex
+from replication import SyncThread
+from roster_index import RosterIndex
+
+# Roster used when there is neither a database roster nor names_list.json
+DEFAULT_NAMES = [
+    "John Doe", "Jane Smith", "Bob Johnson", "Alice Williams",
+    "Charlie Brown", "Diana Prince", "Edward Norton", "Fiona Apple"
+]
+
+
+class UnknownAttendee(LookupError):
+    """A scanned payload that does not match anyone on the roster"""
+
+    def __init__(self, payload, compact=False):
+        super().__init__(f"Unknown attendee: {payload}")
+        self.payload = payload
+        self.compact = compact
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections that may be used from any thread"""
+
+    def __init__(self, path, size=4):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._connections.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._connections.get().close()
+
+
+class CheckinResult:
+    """Outcome of a check-in request"""
+
+    def __init__(self, name, attendee_id, registered):
+        self.name = name
+        self.attendee_id = attendee_id
+        self.registered = registered
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'attendee_id': self.attendee_id,
+            'status': 'registered' if self.registered else 'already_registered',
+        }
+
+
+class CheckinEngine:
+    """Roster, payload resolution and queued check-ins behind one interface"""
+
+    def __init__(self, db_path=attendance_db.DB_PATH, durability='normal', pool_size=4):
+        self.db_path = db_path
+
+        # Creates/migrates the schema before any other connection is opened
+        conn = attendance_db.connect(db_path)
+        try:
+            self._seed_roster(conn)
+            self.roster = RosterIndex(attendance_db.iter_attendee_names(conn))
+        finally:
+            conn.close()
+        self._roster_lock = threading.Lock()
+        self._fuzzy = None
+
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.writer = CheckinWriter(db_path, durability=durability)
+        self.writer.start()
+        self.sync = None
+
+    def _seed_roster(self, conn):
+        """Seed an empty roster from names_list.json or the default names"""
+        if attendance_db.attendee_count(conn) > 0:
+            return
+        if os.path.exists('names_list.json'):
+            # Roster used to live in names_list.json; import it once
+            attendance_db.import_names_json(conn, 'names_list.json')
+        else:
+            attendance_db.add_attendees(conn, DEFAULT_NAMES)
+
+    def resolve(self, payload):
+        """Return (name, attendee_id or None) for a scanned payload
+
+        Raises qr_payload.InvalidPayload for a tampered compact code and
+        UnknownAttendee if nobody on the roster matches.
+        """
+        if qr_payload.is_compact(payload):
+            qr_payload.parse_payload(payload)
+            with self.pool.connection() as conn:
+                match = attendance_db.attendee_by_qr(conn, payload.upper())
+            if match is None:
+                raise UnknownAttendee(payload, compact=True)
+            attendee_id, name = match
+            return name, attendee_id
+
+        with self._roster_lock:
+            known = payload in self.roster
+        if not known:
+            raise UnknownAttendee(payload)
+        return payload, None
+
+    def submit_check_in(self, name, attendee_id=None, checked_in_at=None, keep_earliest=False):
+        """Queue a check-in for a resolved name; the Future yields a CheckinResult"""
+        result = Future()
+
+        def done(future):
+            try:
+                result.set_result(CheckinResult(name, attendee_id, future.result()))
+            except Exception as e:
+                result.set_exception(e)
+
+        self.writer.submit(name, checked_in_at, attendee_id, keep_earliest).add_done_callback(done)
+        return result
+
+    def check_in(self, payload, checked_in_at=None, keep_earliest=False):
+        """Resolve a payload and queue its check-in (resolution errors raise here)"""
+        name, attendee_id = self.resolve(payload)
+        return self.submit_check_in(name, attendee_id, checked_in_at, keep_earliest)
+
+    def add_attendee(self, name):
+        """Add a walk-in guest to the roster; returns False if already present
+
+        The name is stored first and only then indexed, so a failed insert
+        (e.g. a locked database) raises and leaves the roster unchanged.
+        """
+        with self._roster_lock:
+            if name in self.roster:
+                return False
+        with self.pool.connection() as conn:
+            if not attendance_db.add_attendee(conn, name):
+                return False
+        with self._roster_lock:
+            if self.roster.add(name) and self._fuzzy is not None:
+                self._fuzzy.add(name)
+        return True
+
+    def search(self, term, limit=50):
+        with self._roster_lock:
+            names = self.roster.matching_names(term)
+        return names[:limit]
+
+    def fuzzy_index(self):
+        """Typo-tolerant index over the roster, built on first use"""
+        if self._fuzzy is None:
+            # Built outside the lock so check-ins are not held up meanwhile
+            with self._roster_lock:
+                names = list(self.roster)
+            index = FuzzyIndex(names)
+            with self._roster_lock:
+                if self._fuzzy is None:
+                    for name in self.roster:
+                        index.add(name)  # Walk-ins added while building
+                    self._fuzzy = index
+        return self._fuzzy
+
+    def suggest(self, text, limit=5, min_score=0.6):
+        """Roster names close to a payload or typed name, as (name, score) pairs"""
+        index = self.fuzzy_index()
+        with self._roster_lock:
+            return index.suggest(text, limit, min_score)
+
+    def same_person(self, name):
+        """Roster names that differ from name only in case, spacing or accents"""
+        index = self.fuzzy_index()
+        with self._roster_lock:
+            return index.same_key(name)
+
+    def attendance_since(self, after_id=0, limit=200, event_id=None):
+        """Check-ins with id > after_id, oldest first (for incremental clients)
+
+        Limited to one event if event_id is given.
+        """
+        with self.pool.connection() as conn:
+            if event_id is None:
+                rows = conn.execute('''
+                    SELECT id, name, checked_in_at FROM attendance
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (after_id, limit)).fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT id, name, checked_in_at FROM attendance
+                    WHERE event_id = ? AND id > ? ORDER BY id LIMIT ?
+                ''', (event_id, after_id, limit)).fetchall()
+        return [{'id': row_id, 'name': name, 'checked_in_at': checked_in_at}
+                for row_id, name, checked_in_at in rows]
+
+    def events(self):
+        with self.pool.connection() as conn:
+            return attendance_db.list_events(conn)
+
+    def arrival_report(self, event_id=None, missing_limit=0):
+        """Arrival statistics of an event (default: today's), see arrival_stats"""
+        with self.pool.connection() as conn:
+            return arrival_stats.arrival_report(conn, event_id, missing_limit)
+
+    def stats(self):
+        return {
+            'roster_size': len(self.roster),
+            'written': self.writer.written,
+            'commits': self.writer.commits,
+            'replicated': self.sync.total_applied if self.sync else 0,
+        }
+
+    def start_sync(self, directory, interval=5.0):
+        """Replicate check-ins with other stations through a shared directory"""
+        self.sync = SyncThread(self.db_path, directory, interval)
+        self.sync.start()
+
+    def flush(self, timeout=None):
+        self.writer.flush(timeout)
+
+    def close(self):
+        """Flush queued check-ins and close all connections"""
+        self.writer.close()
+        if self.sync:
+            # After the writer, so the final export includes the last check-ins
+            self.sync.stop()
+        self.pool.close()
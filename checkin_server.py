@@ -0,0 +1,304 @@
+"""
+Local HTTP API in front of the check-in engine.
+
+Runs a small asyncio HTTP/1.1 server (keep-alive, JSON bodies) so several
+scanning stations and the React front-end can share one engine and one
+database. Check-ins are awaited through the engine's group-commit writer;
+other database reads run on a thread pool using the engine's connection
+pool, so the event loop never blocks on SQLite.
+
+Browsers may only call the API from the origin given as allow_origin
+(e.g. http://localhost:5173 for the front-end); without one CORS is off
+and any request carrying an Origin header is refused, so a web page open
+on the kiosk cannot check people in.
+
+Endpoints:
+    POST /checkin           {"payload": "..."} or {"name": "..."}
+    POST /attendees         {"name": "..."}
+    GET  /attendance        ?after=<id>&limit=<n>&event=<event id>
+    GET  /events
+    GET  /report            ?event=<event id>&missing=<names to list>
+    GET  /roster/search     ?q=<term>&limit=<n>
+    GET  /roster/suggest    ?q=<misspelled name>&limit=<n>
+    GET  /stats
+    GET  /health
+"""
+
+import asyncio
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import attendance_db
+import metrics
+import qr_payload
+from checkin_engine import CheckinEngine, UnknownAttendee
+
+MAX_BODY = 64 * 1024
+
+REASONS = {
+    200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request',
+    403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict',
+    413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class CheckinServer:
+    """asyncio HTTP server exposing a CheckinEngine"""
+
+    def __init__(self, engine, host='127.0.0.1', port=8765, workers=8, allow_origin=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        # The one browser origin allowed to call the API (None: CORS off)
+        self.allow_origin = allow_origin
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self.server = None
+        self.requests = 0
+
+        self.routes = {
+            ('POST', '/checkin'): self.post_checkin,
+            ('POST', '/attendees'): self.post_attendee,
+            ('GET', '/attendance'): self.get_attendance,
+            ('GET', '/events'): self.get_events,
+            ('GET', '/report'): self.get_report,
+            ('GET', '/roster/search'): self.get_search,
+            ('GET', '/roster/suggest'): self.get_suggest,
+            ('GET', '/stats'): self.get_stats,
+            ('GET', '/health'): self.get_health,
+        }
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        # Port 0 picks a free port; report the real one
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def run_blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                status, payload = await self.dispatch(method, path, query, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e:
+            self.write_response(writer, e.status, {'error': e.message}, False)
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return method.upper(), url.path, query, headers, body
+
+    async def dispatch(self, method, path, query, headers, body):
+        self.requests += 1
+        if metrics.enabled():
+            started = time.perf_counter()
+            try:
+                return await self._dispatch(method, path, query, headers, body)
+            finally:
+                route = f"http {method} {path}" if (method, path) in self.routes else 'http other'
+                metrics.record(route, time.perf_counter() - started)
+        return await self._dispatch(method, path, query, headers, body)
+
+    async def _dispatch(self, method, path, query, headers, body):
+        # Browsers send Origin on cross-site requests; only the configured one may call
+        origin = headers.get('origin')
+        if origin is not None and origin != self.allow_origin:
+            return 403, {'error': "Origin not allowed"}
+        if method == 'OPTIONS':
+            return 204, None
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return 405, {'error': "Method not allowed"}
+            return 404, {'error': "Not found"}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "Expected a JSON object")
+            return await handler(query, data)
+        except HttpError as e:
+            return e.status, {'error': e.message}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    def write_response(self, writer, status, payload, keep_alive):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        cors = ''
+        if self.allow_origin:
+            cors = (
+                f"Access-Control-Allow-Origin: {self.allow_origin}\r\n"
+                f"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                f"Access-Control-Allow-Headers: Content-Type\r\n"
+            )
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"{cors}"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+    async def post_checkin(self, query, data):
+        payload = data.get('payload') or data.get('name')
+        if not isinstance(payload, str) or not payload.strip():
+            raise HttpError(400, "Expected a 'payload' or 'name' string")
+        try:
+            if qr_payload.is_compact(payload):
+                # Compact codes need a database lookup; keep it off the loop
+                future = await self.run_blocking(self.engine.check_in, payload.strip())
+            else:
+                future = self.engine.check_in(payload.strip())
+        except qr_payload.InvalidPayload as e:
+            raise HttpError(400, str(e))
+        except UnknownAttendee as e:
+            raise HttpError(404, str(e))
+        try:
+            result = await asyncio.wrap_future(future)
+        except attendance_db.EventArchived as e:
+            raise HttpError(409, str(e))
+        return 200, result.to_dict()
+
+    async def post_attendee(self, query, data):
+        name = ' '.join(str(data.get('name', '')).split())
+        if not name:
+            raise HttpError(400, "Expected a 'name' string")
+        added = await self.run_blocking(self.engine.add_attendee, name)
+        if not added:
+            return 409, {'name': name, 'status': 'exists'}
+        return 201, {'name': name, 'status': 'added'}
+
+    async def get_attendance(self, query, data):
+        after = int(query.get('after', 0))
+        limit = min(int(query.get('limit', 200)), 1000)
+        event_id = int(query['event']) if query.get('event') else None
+        rows = await self.run_blocking(self.engine.attendance_since, after, limit, event_id)
+        return 200, {'attendance': rows}
+
+    async def get_events(self, query, data):
+        return 200, {'events': await self.run_blocking(self.engine.events)}
+
+    async def get_report(self, query, data):
+        event_id = int(query['event']) if query.get('event') else None
+        missing_limit = min(int(query.get('missing', 0)), 1000)
+        report = await self.run_blocking(self.engine.arrival_report, event_id, missing_limit)
+        if report is None:
+            raise HttpError(404, "No events yet")
+        return 200, report
+
+    async def get_search(self, query, data):
+        limit = min(int(query.get('limit', 50)), 500)
+        names = await self.run_blocking(self.engine.search, query.get('q', ''), limit)
+        return 200, {'names': names}
+
+    async def get_suggest(self, query, data):
+        limit = min(int(query.get('limit', 5)), 50)
+        matches = await self.run_blocking(self.engine.suggest, query.get('q', ''), limit)
+        return 200, {'suggestions': [{'name': name, 'score': score} for name, score in matches]}
+
+    async def get_stats(self, query, data):
+        stats = self.engine.stats()
+        stats['requests'] = self.requests
+        return 200, stats
+
+    async def get_health(self, query, data):
+        return 200, {'status': 'ok'}
+
+
+async def serve_forever(engine, host, port, allow_origin=None):
+    server = CheckinServer(engine, host, port, allow_origin=allow_origin)
+    await server.start()
+    print(f"Check-in API listening on http://{server.host}:{server.port}")
+
+    # Stop cleanly on SIGINT/SIGTERM so queued check-ins get flushed
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
+
+
+def serve(db_path, host='127.0.0.1', port=8765, durability='normal', sync_dir=None,
+          metrics_path=None, allow_origin=None):
+    """Run the HTTP API until interrupted"""
+    engine = CheckinEngine(db_path, durability=durability)
+    if sync_dir:
+        engine.start_sync(sync_dir)
+    metrics_writer = None
+    if metrics_path:
+        metrics.enable()
+        metrics_writer = metrics.MetricsWriter(metrics_path,
+                                               extra=lambda: {'checkins': engine.stats()})
+        metrics_writer.start()
+    try:
+        asyncio.run(serve_forever(engine, host, port, allow_origin))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+        if metrics_writer:
+            metrics_writer.stop()
@@ -0,0 +1,237 @@
+"""
+Write-behind queue for attendance check-ins.
+
+A single writer thread owns its own SQLite connection and commits queued
+check-ins in groups: it waits for the first request and takes whatever else
+is already queued. A lone request is written right away; when several
+arrived together (a burst at the door) it keeps collecting for up to
+``batch_window`` seconds or ``batch_size`` requests, and then writes the
+whole group in one transaction. Each request runs in its own savepoint,
+so a request that fails is rolled back and fails only its own Future while
+the rest of the group is committed. Callers get a Future back, so the UI
+never waits on the disk.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import attendance_db
+import metrics
+
+# Presets for the ``durability`` argument: (PRAGMA synchronous, batch window
+# kept open during a burst)
+DURABILITY = {
+    'fast': ('OFF', 0.10),
+    'normal': ('NORMAL', 0.05),
+    'full': ('FULL', 0.0),
+}
+
+_STOP = object()
+
+
+class CheckinRequest:
+    """A queued check-in and the Future that receives its result"""
+
+    def __init__(self, name, checked_in_at=None, attendee_id=None, keep_earliest=False):
+        self.name = name
+        # Stamp the time of the request, not of the (later) commit
+        self.checked_in_at = checked_in_at or attendance_db.now_timestamp()
+        self.attendee_id = attendee_id
+        self.keep_earliest = keep_earliest
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class CheckinWriter:
+    """Owns the write connection and group-commits queued check-ins"""
+
+    def __init__(self, path=attendance_db.DB_PATH, durability='normal',
+                 batch_window=None, batch_size=64):
+        synchronous, default_window = DURABILITY[durability]
+        self.path = path
+        self.synchronous = synchronous
+        self.batch_window = default_window if batch_window is None else batch_window
+        self.batch_size = batch_size
+
+        self.commits = 0
+        self.written = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        # Set once the writer stops taking requests; guarded by _lock so
+        # nothing is queued after the writer thread has drained the queue
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self):
+        """Start the writer thread and wait until its connection is open"""
+        self._thread = threading.Thread(target=self._run, name='checkin-writer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def submit(self, name, checked_in_at=None, attendee_id=None, keep_earliest=False):
+        """Queue a check-in; the Future resolves to True (new) or False (already in)
+
+        keep_earliest: see attendance_db.check_in.
+        """
+        request = CheckinRequest(name, checked_in_at, attendee_id, keep_earliest)
+        if not self._enqueue(request):
+            request.future.set_exception(RuntimeError("Check-in writer is not running"))
+        return request.future
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed
+
+        Raises RuntimeError if the writer is not running (or stops first).
+        """
+        barrier = Future()
+        if not self._enqueue(barrier):
+            raise RuntimeError("Check-in writer is not running")
+        barrier.result(timeout)
+
+    def close(self, timeout=5.0):
+        """Stop taking requests, commit everything still queued and stop the writer thread
+
+        Returns False if the thread is still writing after timeout; it then
+        goes on to resolve the queued requests.
+        """
+        with self._lock:
+            if self._thread is None:
+                return True
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return False
+        self._thread = None
+        return True
+
+    def _enqueue(self, item):
+        with self._lock:
+            if self._stopped or self._thread is None or not self._thread.is_alive():
+                return False
+            self._queue.put(item)
+            return True
+
+    def _run(self):
+        try:
+            conn = attendance_db.connect(self.path, synchronous=self.synchronous)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            stopping = False
+            while not stopping:
+                batch, barriers, stopping = self._collect_batch()
+                if batch:
+                    self._write_batch(conn, batch)
+                for barrier in barriers:
+                    barrier.set_result(None)
+        finally:
+            conn.close()
+            # Whatever is still queued now (the thread died) is never written
+            barriers = []
+            with self._lock:
+                self._stopped = True
+                leftover = self._drain(barriers)
+            error = RuntimeError("Check-in writer stopped")
+            for request in leftover:
+                request.future.set_exception(error)
+            for barrier in barriers:
+                barrier.set_exception(error)
+
+    def _collect_batch(self):
+        """Wait for one request, take what else is queued and, during a burst,
+        gather more until the window closes"""
+        batch, barriers = [], []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            if item is _STOP:
+                # Drain whatever was queued before the stop request
+                return batch + self._drain(barriers), barriers, True
+            if isinstance(item, CheckinRequest):
+                batch.append(item)
+            else:
+                barriers.append(item)
+                break
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+                continue
+            except queue.Empty:
+                pass
+            # Queue empty: a lone request is written now, a burst may wait for more
+            remaining = deadline - time.monotonic()
+            if len(batch) < 2 or remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, barriers, False
+
+    def _drain(self, barriers):
+        # Everything still queued, without waiting; barriers go to `barriers`
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if isinstance(item, CheckinRequest):
+                batch.append(item)
+            elif item is not _STOP:
+                barriers.append(item)
+
+    def _write_batch(self, conn, batch):
+        started = time.perf_counter()
+        try:
+            with conn:
+                # One transaction for the group; _check_in nests a savepoint per request
+                conn.execute('BEGIN IMMEDIATE')
+                results = [self._check_in(conn, request) for request in batch]
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.commits += 1
+        self.written += sum(1 for result in results if result is True)
+        if metrics.enabled():
+            now = time.perf_counter()
+            metrics.record('checkin.commit', now - started)
+            for request in batch:
+                # Queue wait plus batch window plus commit, as the caller sees it
+                metrics.record('checkin.latency', now - request.submitted_at)
+        for request, registered in zip(batch, results):
+            if isinstance(registered, Exception):
+                request.future.set_exception(registered)
+            else:
+                request.future.set_result(registered)
+
+    def _check_in(self, conn, request):
+        conn.execute('SAVEPOINT checkin')
+        try:
+            registered = attendance_db.check_in(conn, request.name, request.checked_in_at,
+                                                request.attendee_id, commit=False,
+                                                keep_earliest=request.keep_earliest)
+        except Exception as e:
+            # Only this request fails (archived event, bad value, constraint...);
+            # the rest of the batch is committed
+            conn.execute('ROLLBACK TO checkin')
+            conn.execute('RELEASE checkin')
+            return e
+        conn.execute('RELEASE checkin')
+        return registered
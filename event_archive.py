@@ -0,0 +1,112 @@
+"""
+Cold storage for the check-ins of past events.
+
+archive_event() streams an event's check-ins into a gzip-compressed CSV
+file and deletes the rows from the live attendance table, recording the
+file and row count on the event. Both happen inside one IMMEDIATE
+transaction, so a check-in synced in while archiving either makes it into
+the file or waits until the event is marked archived (and is then
+refused). The file is written under a temporary name and only renamed
+into place and made read-only once the delete has committed, so a failed
+archive leaves nothing behind and can simply be run again. The live
+database only ever holds the events still in use, which keeps its
+indexes, and with them check-in and list latency, the same size year
+after year.
+
+Archives are plain CSV once decompressed; iter_archive() reads them back.
+"""
+
+import csv
+import gzip
+import io
+import os
+import re
+
+import attendance_db
+
+ARCHIVE_COLUMNS = ('id', 'attendee_id', 'name', 'checked_in_at', 'day', 'origin')
+
+
+def archive_filename(event_id, name):
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'event'
+    return f"event-{event_id:05d}-{slug}.csv.gz"
+
+
+def archive_event(conn, event_id, directory, allow_current=False, batch_size=5000):
+    """Move an event's check-ins to <directory>/event-<id>-<name>.csv.gz
+
+    Returns (path, rows). Raises ValueError for an unknown or already
+    archived event, and for one that has not ended yet unless
+    allow_current is set.
+    """
+    row = conn.execute(
+        'SELECT name, last_day, archived_at FROM events WHERE id = ?', (event_id,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"No event with id {event_id}")
+    name, last_day, archived_at = row
+    if archived_at:
+        raise ValueError(f"Event '{name}' is already archived")
+    if last_day >= attendance_db.today() and not allow_current:
+        raise ValueError(f"Event '{name}' has not ended yet")
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, archive_filename(event_id, name)))
+    tmp_path = path + '.tmp'
+
+    # Holds off other writers until the rows are gone from the live table
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = _write_archive(conn, event_id, tmp_path, batch_size)
+        # Marked first, so the statistics triggers keep the event's counts
+        conn.execute('''
+            UPDATE events SET archived_at = ?, archive_path = ?, archived_rows = ?
+            WHERE id = ?
+        ''', (attendance_db.now_timestamp(), path, rows, event_id))
+        conn.execute('DELETE FROM attendance WHERE event_id = ?', (event_id,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    os.chmod(path, 0o444)
+    return path, rows
+
+
+def _write_archive(conn, event_id, path, batch_size):
+    cursor = conn.execute(f'''
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM attendance
+        WHERE event_id = ? ORDER BY id
+    ''', (event_id,))
+    rows = 0
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+            text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(ARCHIVE_COLUMNS)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                rows += len(batch)
+            text.flush()
+            text.detach()
+        # The live rows are deleted right after; the archive must be on disk
+        raw.flush()
+        os.fsync(raw.fileno())
+    return rows
+
+
+def iter_archive(path):
+    """Yield the archived check-ins of an event as dicts"""
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def compact_database(conn):
+    """Give the space freed by archiving back to the file system"""
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
@@ -0,0 +1,239 @@
+"""
+Fuzzy name matching over the roster.
+
+Names are folded (normalized, accents and punctuation removed) and indexed
+two ways:
+
+- character trigrams, each word padded with spaces so word order does not
+  matter, in an inverted index (trigram -> names);
+- whole words by their one-deletion variants ("john" -> "ohn", "jhn",
+  "jon", "joh"), so words at most one edit apart ("Jon"/"John",
+  "Jhon"/"John") find each other with a few dict lookups.
+
+A suggestion query collects candidates from both: names sharing many
+trigrams (only the query's rarest trigram lists are scanned, since a name
+that is MIN_DICE similar must share one of them) and names in which every
+query word has a partner at most one edit away. The best few are re-ranked
+with difflib's ratio, which is what the returned scores are.
+
+duplicate_groups() uses the word index for a single pass over the whole
+roster instead of comparing every pair.
+"""
+
+import difflib
+import math
+import unicodedata
+from collections import Counter
+from itertools import chain
+
+from roster_index import normalize_name
+
+# Trigram similarity (Dice) a name needs to be considered by its trigrams
+MIN_DICE = 0.4
+
+# Candidates per query checked for exact trigram overlap, and how many of
+# the best of those are re-ranked with difflib
+SHORTLIST = 40
+RERANK = 10
+
+# Words shorter than this only match exactly ("Al" is not "Ali" or "Ed")
+MIN_EDIT_LENGTH = 3
+
+
+def fold_name(name):
+    """Matching key: normalized, accents stripped, punctuation as spaces"""
+    key = unicodedata.normalize('NFKD', normalize_name(name))
+    key = ''.join(c if c.isalnum() else ' ' for c in key if not unicodedata.combining(c))
+    return ' '.join(key.split())
+
+
+def trigrams(key):
+    """Set of space-padded word trigrams of a folded key"""
+    grams = set()
+    for word in key.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def deletions(word):
+    """The word and every variant of it with one character removed
+
+    Two words at most one edit apart (insert, delete, substitute or swap
+    two neighbours) always share one of these.
+    """
+    if len(word) < MIN_EDIT_LENGTH:
+        return {word}
+    variants = {word}
+    variants.update(word[:i] + word[i + 1:] for i in range(len(word)))
+    return variants
+
+
+def similarity(a, b):
+    """Score in [0, 1] of two folded keys, ignoring word order"""
+    score = difflib.SequenceMatcher(None, a, b).ratio()
+    if ' ' in a or ' ' in b:
+        a_sorted = ' '.join(sorted(a.split()))
+        b_sorted = ' '.join(sorted(b.split()))
+        score = max(score, difflib.SequenceMatcher(None, a_sorted, b_sorted).ratio())
+    return score
+
+
+class FuzzyIndex:
+    """Trigram and word-edit indexes over names for typo-tolerant matching"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self._keys = []
+        self._sizes = []
+        self._ids = {}
+        self._by_key = {}
+        self._postings = {}
+        self._word_names = {}
+        self._variant_words = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """Index a name; returns False if it is already indexed"""
+        if name in self._ids:
+            return False
+        i = len(self.names)
+        key = fold_name(name)
+        grams = trigrams(key)
+        self.names.append(name)
+        self._keys.append(key)
+        self._sizes.append(len(grams))
+        self._ids[name] = i
+        self._by_key.setdefault(key, []).append(i)
+
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = [i]
+            else:
+                posting.append(i)
+
+        for word in set(key.split()):
+            ids = self._word_names.get(word)
+            if ids is None:
+                self._word_names[word] = [i]
+                for variant in deletions(word):
+                    self._variant_words.setdefault(variant, []).append(word)
+            else:
+                ids.append(i)
+        return True
+
+    def same_key(self, name):
+        """Indexed names that fold to the same key (e.g. "John  doe" for "John Doe")"""
+        return [self.names[i] for i in self._by_key.get(fold_name(name), ())]
+
+    def suggest(self, text, limit=5, min_score=0.6):
+        """Up to `limit` (name, score) pairs most similar to text, best first"""
+        key = fold_name(text)
+        if not key:
+            return []
+        candidates = self._trigram_candidates(key)
+        candidates.extend(i for i in self._word_candidates(key, 2 * RERANK)
+                          if i not in candidates)
+
+        keys = self._keys
+        scored = []
+        for i in candidates:
+            score = 1.0 if keys[i] == key else similarity(key, keys[i])
+            if score >= min_score:
+                scored.append((score, self.names[i]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(name, round(score, 3)) for score, name in scored[:limit]]
+
+    def duplicate_groups(self, min_score=0.85):
+        """Groups of indexed names that look like the same person
+
+        One pass over the roster: two names are compared only if they have
+        the same number of words and every word has a partner at most one
+        edit away. Compared names that are at least min_score similar are
+        merged with union-find.
+        """
+        keys = self._keys
+        parent = list(range(len(keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        near_cache = {}
+        for i, key in enumerate(keys):
+            for j in self._word_candidates(key, cache=near_cache):
+                if j <= i:
+                    continue
+                other = keys[j]
+                if other.count(' ') != key.count(' '):
+                    continue
+                if other == key or similarity(key, other) >= min_score:
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j:
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups = {}
+        for i in range(len(keys)):
+            groups.setdefault(find(i), []).append(self.names[i])
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    def _near(self, word, cache=None):
+        """Ids of names having a word at most one edit from this one"""
+        if cache is not None and word in cache:
+            return cache[word]
+        variant_words, word_names = self._variant_words, self._word_names
+        similar = {other for variant in deletions(word)
+                   for other in variant_words.get(variant, ())}
+        ids = set(chain.from_iterable(word_names[other] for other in similar))
+        if cache is not None:
+            cache[word] = ids
+        return ids
+
+    def _word_candidates(self, key, limit=None, cache=None):
+        """Names in which every word of key has a partner at most one edit away"""
+        word_names = self._word_names
+        # Rarest words first, so the intersection shrinks quickly
+        words = sorted(set(key.split()), key=lambda word: len(word_names.get(word, ())))
+        if not words:
+            return []
+        candidates = self._near(words[0], cache)
+        for word in words[1:]:
+            if not candidates:
+                break
+            candidates = candidates & self._near(word, cache)
+        if limit is not None and len(candidates) > limit:
+            return []  # Too common to be a useful suggestion; trigrams decide
+        return list(candidates)
+
+    def _trigram_candidates(self, key):
+        """Ids of the names sharing the most trigrams with key, best first"""
+        grams = trigrams(key)
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+
+        # A candidate with Dice >= MIN_DICE shares at least `needed` grams, so
+        # it appears in one of the len(grams) - needed + 1 shortest lists
+        # (grams missing from the index count as empty lists)
+        needed = max(1, math.ceil(MIN_DICE * len(grams) / (2 - MIN_DICE)))
+        scan_lists = len(postings) - needed + 1
+        if scan_lists <= 0:
+            return []
+        postings.sort(key=len)
+        counts = Counter(chain.from_iterable(postings[:scan_lists]))
+
+        sizes, keys = self._sizes, self._keys
+        ranked = []
+        for i, _ in counts.most_common(SHORTLIST):
+            # Exact trigram overlap for the shortlisted names only
+            dice = 2 * len(grams & trigrams(keys[i])) / (len(grams) + sizes[i])
+            if dice >= MIN_DICE:
+                ranked.append((dice, i))
+        ranked.sort(reverse=True)
+        return [i for _, i in ranked[:RERANK]]
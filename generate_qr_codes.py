@@ -1,59 +1,499 @@
 """
 Helper script to generate QR codes for names in the names list.
 This makes it easy to create QR codes for all attendees.
+
+Rendering is spread over a process pool. A manifest of content hashes
+(payload plus QR parameters) is kept next to the images, so by default
+only new or changed names are re-rendered and files for names that left
+the roster are removed.
+
+By default a code contains the person's name. With --payload id it holds a
+compact attendee id instead (see qr_payload), which keeps every code at a
+low QR version; the payloads are stored in attendees.qr_code so scans
+resolve with a keyed lookup.
+
+Besides one PNG per person, codes can be rendered straight into printable
+multi-up sheets (a paginated PDF or PNG sheets with the name under each
+code) or streamed into a ZIP/tar archive. Those modes never write
+intermediate files and render page by page with a bounded number of pages
+in flight, so memory stays flat however large the roster is.
 """
 
 import qrcode
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
+import argparse
+import hashlib
+import io
 import json
 import os
+import sqlite3
+import sys
+import tarfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_qr_for_name(name, output_dir='qr_codes'):
-    """Generate a QR code for a given name"""
-    # Create output directory if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    # Create QR code
+import attendance_db
+
+MANIFEST_NAME = 'manifest.json'
+
+# Everything that affects the rendered image; part of the manifest hash
+QR_PARAMS = {
+    'version': 1,
+    'error_correction': 'L',
+    'box_size': 10,
+    'border': 4,
+    'fill_color': 'black',
+    'back_color': 'white',
+}
+
+# Multi-up sheet layout: A4 portrait at 150 dpi, 3 x 4 badges per page
+SHEET_LAYOUT = {
+    'page_size': (1240, 1754),
+    'dpi': 150,
+    'columns': 3,
+    'rows': 4,
+    'margin': 60,
+    'font_size': 26,
+}
+
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+def make_qr_image(data, params=QR_PARAMS):
+    """Render QR code data to a PIL image"""
     qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        version=params['version'],
+        error_correction=ERROR_CORRECTION[params['error_correction']],
+        box_size=params['box_size'],
+        border=params['border'],
     )
-    qr.add_data(name)
+    qr.add_data(data)
     qr.make(fit=True)
-    
-    # Create image
-    img = qr.make_image(fill_color="black", back_color="white")
-    
+    return qr.make_image(fill_color=params['fill_color'], back_color=params['back_color'])
+
+def safe_filename(name):
+    """File name (without extension) for a person's QR code"""
+    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+
+def assign_filenames(names):
+    """Map each name to a unique file name (without extension)
+
+    Sanitizing can make two names collide (e.g. "Ann-Marie" and "Ann Marie?"
+    differ only in dropped characters, or only in case on case-insensitive
+    file systems). Colliding and empty names get a short hash of the full
+    name appended; everyone else keeps the plain sanitized name.
+    """
+    by_key = {}
+    for name in names:
+        by_key.setdefault(safe_filename(name).casefold(), []).append(name)
+
+    filenames = {}
+    for key, group in by_key.items():
+        for name in group:
+            stem = safe_filename(name)
+            if len(group) > 1 or not stem:
+                suffix = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+                stem = f"{stem}-{suffix}" if stem else f"qr-{suffix}"
+            filenames[name] = stem
+    return filenames
+
+def content_hash(data, params=QR_PARAMS):
+    """Hash of the QR payload and parameters, used to skip unchanged codes"""
+    blob = json.dumps([data, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def generate_qr_for_name(name, output_dir='qr_codes', quiet=False):
+    """Generate a QR code for a given name"""
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    img = make_qr_image(name)
+
     # Save with name as filename (sanitized)
-    safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-    filename = os.path.join(output_dir, f"{safe_name}.png")
+    filename = os.path.join(output_dir, f"{safe_filename(name)}.png")
     img.save(filename)
-    
-    print(f"Generated QR code for: {name} -> {filename}")
+
+    if not quiet:
+        print(f"Generated QR code for: {name} -> {filename}")
     return filename
 
-def generate_all_qr_codes():
-    """Generate QR codes for all names in the names list"""
-    # Load names list
+def _render_job(job):
+    """Process pool worker: render one code to its target file"""
+    data, filename, params = job
+    make_qr_image(data, params).save(filename)
+    return filename
+
+def _png_bytes_job(job):
+    """Process pool worker: render one code to PNG bytes"""
+    data, params = job
+    buffer = io.BytesIO()
+    make_qr_image(data, params).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def load_font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default()
+
+def fit_text(draw, text, font, max_width):
+    """Shorten text with an ellipsis until it fits max_width pixels"""
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + '...', font=font) > max_width:
+        text = text[:-1]
+    return text + '...'
+
+def render_sheet(entries, layout=SHEET_LAYOUT, params=QR_PARAMS):
+    """Render one page of badges from (name, payload) pairs, name under each code"""
+    width, height = layout['page_size']
+    columns, rows, margin = layout['columns'], layout['rows'], layout['margin']
+    cell_w = (width - 2 * margin) // columns
+    cell_h = (height - 2 * margin) // rows
+    label_h = layout['font_size'] + 16
+    qr_size = min(cell_w, cell_h - label_h) - 20
+
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = load_font(layout['font_size'])
+
+    for i, (name, data) in enumerate(entries):
+        x = margin + (i % columns) * cell_w
+        y = margin + (i // columns) * cell_h
+        code = make_qr_image(data, params).convert('L').resize((qr_size, qr_size), Image.NEAREST)
+        page.paste(code, (x + (cell_w - qr_size) // 2, y))
+
+        label = fit_text(draw, name, font, cell_w - 10)
+        label_w = draw.textlength(label, font=font)
+        draw.text((x + (cell_w - label_w) / 2, y + qr_size + 8), label, fill=0, font=font)
+    return page
+
+def _pdf_page_job(job):
+    """Process pool worker: one sheet as a Flate-compressed grayscale raster"""
+    entries, layout, params = job
+    page = render_sheet(entries, layout, params)
+    return page.size, zlib.compress(page.tobytes(), 6)
+
+def _png_page_job(job):
+    """Process pool worker: one sheet as PNG bytes"""
+    entries, layout, params = job
+    buffer = io.BytesIO()
+    render_sheet(entries, layout, params).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def iter_chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def bounded_map(fn, jobs, workers=None, window=None):
+    """Like executor.map, but with at most `window` jobs in flight (results in order)"""
+    if workers == 1:
+        yield from map(fn, jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = window or 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(fn, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+class PdfSheetWriter:
+    """Minimal streaming PDF writer: one full-page grayscale image per page
+
+    Objects are written as soon as a page is added; only the byte offsets
+    are kept for the cross-reference table written on close().
+    """
+
+    def __init__(self, f, dpi=150):
+        self.f = f
+        self.dpi = dpi
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        # 1 = catalog and 2 = page tree, both written on close()
+        self.next_id = 3
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.f.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.position
+        self._write(f"{obj_id} 0 obj\n".encode('ascii') + body)
+        if stream is not None:
+            self._write(b'\nstream\n')
+            self._write(stream)
+            self._write(b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def add_page(self, size, compressed_gray):
+        """Add a page from (width, height) and zlib-compressed 8-bit gray pixels"""
+        width, height = size
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        pt_w = width * 72 / self.dpi
+        pt_h = height * 72 / self.dpi
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/Length {len(compressed_gray)} >>"
+        ).encode('ascii'), compressed_gray)
+
+        content = f"q {pt_w:.2f} 0 0 {pt_h:.2f} 0 0 cm /Im0 Do Q".encode('ascii')
+        self._object(content_id, f"<< /Length {len(content)} >>".encode('ascii'), content)
+
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pt_w:.2f} {pt_h:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('ascii'))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode('ascii'))
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_at = self.position
+        size = self.next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self.offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n")
+        self._write(''.join(lines).encode('ascii'))
+
+def open_output(path):
+    """Binary output file, or stdout for '-'"""
+    if path == '-':
+        return sys.stdout.buffer, False
+    return open(path, 'wb'), True
+
+def write_sheets_pdf(entries, path, workers=None, layout=SHEET_LAYOUT):
+    """Render all badges into one paginated PDF"""
+    per_page = layout['columns'] * layout['rows']
+    jobs = ((chunk, layout, QR_PARAMS) for chunk in iter_chunks(entries, per_page))
+    f, owned = open_output(path)
+    try:
+        writer = PdfSheetWriter(f, dpi=layout['dpi'])
+        for pages, (size, data) in enumerate(bounded_map(_pdf_page_job, jobs, workers), start=1):
+            writer.add_page(size, data)
+            report_progress("Pages", pages)
+        writer.close()
+    finally:
+        if owned:
+            f.close()
+    return len(writer.page_ids)
+
+def write_sheets_png(entries, output_dir, workers=None, layout=SHEET_LAYOUT):
+    """Render all badges into numbered PNG sheets"""
+    os.makedirs(output_dir, exist_ok=True)
+    per_page = layout['columns'] * layout['rows']
+    jobs = ((chunk, layout, QR_PARAMS) for chunk in iter_chunks(entries, per_page))
+    pages = 0
+    for pages, data in enumerate(bounded_map(_png_page_job, jobs, workers), start=1):
+        with open(os.path.join(output_dir, f"sheet_{pages:04d}.png"), 'wb') as f:
+            f.write(data)
+        report_progress("Pages", pages)
+    return pages
+
+def write_archive(entries, path, kind, workers=None):
+    """Stream one PNG per person into a ZIP or tar.gz archive"""
+    filenames = assign_filenames(name for name, _ in entries)
+    jobs = ((data, QR_PARAMS) for _, data in entries)
+    f, owned = open_output(path)
+    try:
+        if kind == 'zip':
+            # Codes are already compressed PNGs; storing them avoids a second pass
+            archive = zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED)
+        else:
+            archive = tarfile.open(fileobj=f, mode='w|gz')
+        with archive:
+            for count, ((name, _), data) in enumerate(
+                    zip(entries, bounded_map(_png_bytes_job, jobs, workers, window=256)), start=1):
+                member = f"{filenames[name]}.png"
+                if kind == 'zip':
+                    with archive.open(member, 'w') as entry:
+                        entry.write(data)
+                else:
+                    info = tarfile.TarInfo(member)
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    archive.addfile(info, io.BytesIO(data))
+                report_progress("Codes", count)
+    finally:
+        if owned:
+            f.close()
+    return len(entries)
+
+def report_progress(label, count, every=500):
+    if count % every == 0:
+        print(f"{label}: {count}", file=sys.stderr)
+
+def load_roster():
+    """Load roster names from attendance.db, falling back to names_list.json"""
+    if os.path.exists('attendance.db'):
+        conn = sqlite3.connect('attendance.db')
+        try:
+            return [name for (name,) in conn.execute('SELECT name FROM attendees ORDER BY name')]
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+
     if os.path.exists('names_list.json'):
         with open('names_list.json', 'r', encoding='utf-8') as f:
-            names_list = json.load(f)
-    else:
-        print("names_list.json not found. Please run the attendance system first to create it.")
+            return json.load(f)
+    return None
+
+def load_entries(payload='name', secret=None):
+    """Return (name, QR payload) pairs for the roster, or None if there is none"""
+    if payload == 'name':
+        names_list = load_roster()
+        return [(name, name) for name in names_list] if names_list else None
+
+    # Compact ids need the roster in the database; keep attendees.qr_code in sync
+    if not os.path.exists('attendance.db'):
+        return None
+    conn = attendance_db.connect('attendance.db')
+    try:
+        attendance_db.sync_qr_codes(conn, secret)
+        return list(attendance_db.iter_attendee_payloads(conn)) or None
+    finally:
+        conn.close()
+
+def load_manifest(output_dir):
+    """Return {filename: hash} for codes rendered by a previous run"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    """Write the manifest atomically so an interrupted run cannot corrupt it"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def plan_generation(entries, output_dir, manifest, params=QR_PARAMS, full=False):
+    """Work out which codes to render and which stale files to remove"""
+    filenames = assign_filenames(name for name, _ in entries)
+    wanted = {}
+    for name, data in entries:
+        wanted[f"{filenames[name]}.png"] = (data, content_hash(data, params))
+
+    to_render = [
+        (data, filename, digest) for filename, (data, digest) in wanted.items()
+        if full or manifest.get(filename) != digest
+        or not os.path.exists(os.path.join(output_dir, filename))
+    ]
+    stale = [filename for filename in manifest if filename not in wanted]
+    return wanted, to_render, stale
+
+def generate_all_qr_codes(output_dir='qr_codes', workers=None, full=False, payload='name'):
+    """Generate QR codes for all names in the roster"""
+    # Load names list
+    entries = load_entries(payload)
+    if not entries:
+        print("No roster found. Please run the attendance system first to create it.")
         return
-    
-    print(f"Generating QR codes for {len(names_list)} names...")
+
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    # Even a full run needs the old manifest to find codes of removed names
+    manifest = load_manifest(output_dir)
+    wanted, to_render, stale = plan_generation(entries, output_dir, manifest, full=full)
+
+    print(f"{len(entries)} names: {len(to_render)} to render, "
+          f"{len(wanted) - len(to_render)} unchanged, {len(stale)} stale")
     print("-" * 50)
-    
-    for name in names_list:
-        generate_qr_for_name(name)
-    
+
+    for filename in stale:
+        path = os.path.join(output_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+        manifest.pop(filename, None)
+
+    jobs = [(data, os.path.join(output_dir, filename), QR_PARAMS) for data, filename, _ in to_render]
+    executor = None
+    if workers == 1 or len(jobs) < 2:
+        results = map(_render_job, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        results = executor.map(_render_job, jobs, chunksize=chunksize)
+
+    try:
+        for done, ((data, filename, digest), _) in enumerate(zip(to_render, results), start=1):
+            manifest[filename] = digest
+            if done % 500 == 0 or done == len(to_render):
+                print(f"Rendered {done}/{len(to_render)}")
+    finally:
+        # Record whatever finished, so a rerun picks up where this one stopped
+        save_manifest(output_dir, manifest)
+        if executor:
+            executor.shutdown()
+
     print("-" * 50)
-    print(f"All QR codes generated in 'qr_codes' directory!")
+    print(f"QR codes are up to date in '{output_dir}' ({time.perf_counter() - started:.1f}s)")
 
-if __name__ == "__main__":
-    generate_all_qr_codes()
+DEFAULT_OUTPUTS = {
+    'pdf': 'qr_sheets.pdf',
+    'sheets': 'qr_sheets',
+    'zip': 'qr_codes.zip',
+    'tar': 'qr_codes.tar.gz',
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate QR codes for the roster")
+    parser.add_argument('--format', choices=['png', 'pdf', 'sheets', 'zip', 'tar'], default='png',
+                        help="png: one file per person (default); pdf/sheets: printable multi-up "
+                             "pages; zip/tar: streamed archive of per-person PNGs")
+    parser.add_argument('--output', help="Output file or directory ('-' = stdout for pdf/zip/tar)")
+    parser.add_argument('--output-dir', default='qr_codes')
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores, 1 = serial)")
+    parser.add_argument('--full', action='store_true', help="Re-render every code (stale ones are still removed)")
+    parser.add_argument('--payload', choices=['name', 'id'], default='name',
+                        help="name: plain name (default); id: compact attendee id, signed "
+                             "with ATTENDANCE_QR_SECRET if set (needs attendance.db)")
+    args = parser.parse_args(argv)
+
+    if args.format == 'png':
+        generate_all_qr_codes(args.output or args.output_dir, workers=args.workers,
+                              full=args.full, payload=args.payload)
+        return
 
+    entries = load_entries(args.payload)
+    if not entries:
+        print("No roster found. Please run the attendance system first to create it.")
+        return
+    output = args.output or DEFAULT_OUTPUTS[args.format]
+    started = time.perf_counter()
+    if args.format == 'pdf':
+        count = write_sheets_pdf(entries, output, workers=args.workers)
+        summary = f"{count} pages"
+    elif args.format == 'sheets':
+        count = write_sheets_png(entries, output, workers=args.workers)
+        summary = f"{count} sheets"
+    else:
+        count = write_archive(entries, output, args.format, workers=args.workers)
+        summary = f"{count} codes"
+    print(f"Wrote {summary} for {len(entries)} names to {output} "
+          f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Switchable per-stage timing for the scanner and the check-in path.
+
+Code wraps each stage it wants measured in ``metrics.stage(name)``:
+
+    with metrics.stage('decode.zbar'):
+        pyzbar.decode(image)
+
+While metrics are disabled (the default) ``stage`` returns one shared no-op
+context manager, so an instrumented stage costs a function call and an
+attribute check. Once enabled, every stage gets a latency histogram with
+fixed log-spaced buckets: recording is a bisect and two additions, memory
+stays constant however long the kiosk runs, and percentiles are read
+from the bucket counts.
+
+MetricsWriter appends a JSON snapshot of all histograms (plus any extra
+numbers, such as the scanner's FPS) to a file every few seconds.
+"""
+
+import bisect
+import json
+import threading
+import time
+
+# Bucket upper bounds in seconds: 20 µs to ~20 s, 10% apart
+BUCKETS = tuple(20e-6 * 1.1 ** i for i in range(146))
+
+
+class Histogram:
+    """Latency histogram with fixed log-spaced buckets"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        target = fraction * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(BUCKETS[i], largest) if i < len(BUCKETS) else largest
+        return largest
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class _NullStage:
+    """Context manager used for every stage while metrics are off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add(time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """Named latency histograms that can be switched on and off"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def stage(self, name):
+        """Context manager timing one run of a stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self.histogram(name))
+
+    def record(self, name, seconds):
+        """Record a duration measured elsewhere (e.g. across threads)"""
+        if self.enabled:
+            self.histogram(name).add(seconds)
+
+    def p95_ms(self, name):
+        histogram = self._histograms.get(name)
+        return histogram.percentile(0.95) * 1000 if histogram else 0.0
+
+    def snapshot(self):
+        """Summary of every stage recorded so far"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return {name: histogram.summary() for name, histogram in items}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+        self.started_at = time.time()
+
+
+# Process-wide registry used by the scanner, the writer and the kiosk
+registry = Metrics()
+
+
+def stage(name):
+    return registry.stage(name)
+
+
+def record(name, seconds):
+    registry.record(name, seconds)
+
+
+def enabled():
+    return registry.enabled
+
+
+def enable(on=True):
+    registry.enabled = on
+
+
+class MetricsWriter:
+    """Appends a JSON line with a metrics snapshot to a file every few seconds
+
+    ``extra`` is an optional callable returning a dict merged into each
+    snapshot; it runs on the writer thread and must not touch Tk.
+    """
+
+    def __init__(self, path, interval=10.0, extra=None, metrics=None):
+        self.path = path
+        self.interval = interval
+        self.extra = extra
+        self.metrics = metrics or registry
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def write_snapshot(self):
+        snapshot = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime_s': round(time.time() - self.metrics.started_at, 1),
+            'stages': self.metrics.snapshot(),
+        }
+        if self.extra:
+            snapshot.update(self.extra())
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.write_snapshot()
+                self.last_error = None
+            except OSError as e:
+                self.last_error = e
+            if stopping:
+                return
@@ -0,0 +1,281 @@
+"""
+QR decode engine used by the scan pipeline.
+
+Each frame is converted to grayscale once and then decoded in up to three
+passes, cheapest first:
+
+1. a region of interest around the last place a code was seen,
+2. a downscaled copy of the whole frame,
+3. the full-resolution frame.
+
+When nothing has been seen for a while the engine starts skipping frames,
+and it goes back to decoding every frame as soon as a code shows up again.
+
+The actual symbol decoding is done by a pluggable backend: pyzbar,
+OpenCV's QRCodeDetector, or a cascade that tries one and falls back to the
+other on a miss. ``auto`` picks the backend that reads a small synthetic
+test set (straight, tilted and blurred codes) best and fastest on this
+machine; the choice is made once per process.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+# Backend used when none is given; override with ATTENDANCE_QR_BACKEND
+DEFAULT_BACKEND = os.environ.get('ATTENDANCE_QR_BACKEND', 'auto')
+BACKEND_NAMES = ('auto', 'pyzbar', 'opencv', 'cascade', 'opencv+pyzbar')
+
+
+class QRHit:
+    """A decoded QR code with its polygon in full-frame coordinates"""
+
+    def __init__(self, data, polygon):
+        self.data = data
+        self.polygon = polygon
+
+
+class PyzbarBackend:
+    """ZBar through pyzbar; fast on clean, upright codes"""
+
+    name = 'pyzbar'
+
+    def __init__(self):
+        # Imported here so hosts without the zbar library can still use OpenCV
+        from pyzbar import pyzbar
+        from pyzbar.pyzbar import ZBarSymbol
+        self._decode = pyzbar.decode
+        self._symbols = [ZBarSymbol.QRCODE]
+
+    def decode(self, gray):
+        """Return [(data, [(x, y), ...]), ...] for the codes in a grayscale image"""
+        with metrics.stage('decode.pyzbar'):
+            symbols = self._decode(gray, symbols=self._symbols)
+        return [
+            (obj.data.decode('utf-8'), [(point.x, point.y) for point in obj.polygon])
+            for obj in symbols
+        ]
+
+
+class OpenCVBackend:
+    """cv2.QRCodeDetector; no extra dependency and tolerant of tilted codes"""
+
+    name = 'opencv'
+
+    def __init__(self):
+        self._detector = cv2.QRCodeDetector()
+
+    def decode(self, gray):
+        with metrics.stage('decode.opencv'):
+            found, texts, points, _ = self._detector.detectAndDecodeMulti(gray)
+        if not found or points is None:
+            return []
+        # Detected but undecodable codes come back with empty text
+        return [
+            (text, [(int(x), int(y)) for x, y in corners])
+            for text, corners in zip(texts, points) if text
+        ]
+
+
+class CascadeBackend:
+    """Tries a fast backend first and a more robust one only when it misses"""
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.name = f"{first.name}+{second.name}"
+        self.fallback_hits = 0
+
+    def decode(self, gray):
+        found = self.first.decode(gray)
+        if not found:
+            found = self.second.decode(gray)
+            if found:
+                self.fallback_hits += 1
+        return found
+
+
+def make_backend(name=None):
+    """Create a decoder backend by name (see BACKEND_NAMES)"""
+    name = name or DEFAULT_BACKEND
+    if name == 'auto':
+        return make_backend(select_backend_name())
+    if name == 'pyzbar':
+        return PyzbarBackend()
+    if name == 'opencv':
+        return OpenCVBackend()
+    if name == 'cascade':
+        return CascadeBackend(PyzbarBackend(), OpenCVBackend())
+    if name == 'opencv+pyzbar':
+        return CascadeBackend(OpenCVBackend(), PyzbarBackend())
+    raise ValueError(f"Unknown QR decoder backend: {name}")
+
+
+def available_backends():
+    """Names of the concrete backends that can be created on this host"""
+    names = []
+    for name in BACKEND_NAMES[1:]:
+        try:
+            make_backend(name)
+        except (ImportError, OSError):
+            continue
+        names.append(name)
+    return names
+
+
+def sample_frames(text='Benchmark Guest 0001', size=(640, 480)):
+    """Synthetic grayscale frames: a straight, a tilted and a blurred code"""
+    code = cv2.QRCodeEncoder.create().encode(text)
+    code = cv2.copyMakeBorder(code, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=255)
+    side = size[1] // 2
+    code = cv2.resize(code, (side, side), interpolation=cv2.INTER_NEAREST)
+
+    width, height = size
+    frame = np.full((height, width), 150, np.uint8)
+    x, y = (width - side) // 2, (height - side) // 2
+    frame[y:y + side, x:x + side] = code
+
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), 25, 1.0)
+    tilted = cv2.warpAffine(frame, rotation, size, borderValue=150)
+    blurred = cv2.GaussianBlur(frame, (0, 0), 2.0)
+    return text, [frame, tilted, blurred]
+
+
+def benchmark_backends(names=None, repeat=5):
+    """Decode the test frames with each backend; returns {name: (hits, seconds per frame)}"""
+    text, frames = sample_frames()
+    report = {}
+    for name in names or available_backends():
+        backend = make_backend(name)
+        hits = sum(1 for frame in frames if any(data == text for data, _ in backend.decode(frame)))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for frame in frames:
+                backend.decode(frame)
+        report[name] = (hits, (time.perf_counter() - started) / (repeat * len(frames)))
+    return report
+
+
+_selected_name = None
+_select_lock = threading.Lock()
+
+
+def select_backend_name():
+    """Backend that reads the most test frames, fastest first; measured once"""
+    global _selected_name
+    with _select_lock:
+        if _selected_name is None:
+            report = benchmark_backends()
+            if not report:
+                raise ImportError("No QR decoder backend is available")
+            _selected_name = min(report, key=lambda name: (-report[name][0], report[name][1]))
+        return _selected_name
+
+
+class DecodeEngine:
+    """ROI-tracking, multi-scale QR decoder"""
+
+    def __init__(self, downscale_width=640, roi_margin=0.5, roi_ttl=1.0,
+                 idle_after=2.0, max_skip=4, backend=None):
+        self.backend = backend if backend is not None else make_backend()
+        self.downscale_width = downscale_width
+        self.roi_margin = roi_margin
+        self.roi_ttl = roi_ttl
+        self.idle_after = idle_after
+        self.max_skip = max_skip
+
+        self._roi = None
+        self._last_hit_at = None
+        self._frame_counter = 0
+
+        self.counts = {'roi': 0, 'downscaled': 0, 'full': 0, 'miss': 0, 'skipped': 0}
+
+    def reset(self):
+        """Forget the tracked region and the idle state"""
+        self._roi = None
+        self._last_hit_at = None
+        self._frame_counter = 0
+
+    def skip_interval(self, now=None):
+        """How many frames apart we decode given how long we have been idle"""
+        now = time.monotonic() if now is None else now
+        if self._last_hit_at is None:
+            return 1
+        idle = now - self._last_hit_at
+        if idle < self.idle_after:
+            return 1
+        # One extra skipped frame for every further idle_after seconds
+        return min(self.max_skip, 1 + int(idle // self.idle_after))
+
+    def decode(self, frame, now=None):
+        """Decode a BGR or grayscale frame; returns a list of QRHit, or None if skipped"""
+        now = time.monotonic() if now is None else now
+        if self._last_hit_at is None:
+            # The idle clock starts with the first frame we are given
+            self._last_hit_at = now
+
+        self._frame_counter += 1
+        if self._frame_counter % self.skip_interval(now):
+            self.counts['skipped'] += 1
+            return None
+
+        with metrics.stage('decode.gray'):
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        hits = None
+        if self._roi is not None and now - self._last_hit_at <= self.roi_ttl:
+            hits = self._decode_roi(gray)
+            if hits:
+                self.counts['roi'] += 1
+        if not hits:
+            hits = self._decode_downscaled(gray)
+            if hits:
+                self.counts['downscaled'] += 1
+        if not hits:
+            hits = self._decode_region(gray, 0, 0, 1.0)
+            if hits:
+                self.counts['full'] += 1
+
+        if hits:
+            self._last_hit_at = now
+            self._roi = self._bounding_roi(hits, gray.shape)
+        else:
+            self.counts['miss'] += 1
+        return hits
+
+    def _decode_roi(self, gray):
+        x0, y0, x1, y1 = self._roi
+        return self._decode_region(gray[y0:y1, x0:x1], x0, y0, 1.0)
+
+    def _decode_downscaled(self, gray):
+        height, width = gray.shape
+        if width <= self.downscale_width:
+            return []
+        scale = self.downscale_width / width
+        with metrics.stage('decode.downscale'):
+            small = cv2.resize(gray, (self.downscale_width, int(height * scale)),
+                               interpolation=cv2.INTER_AREA)
+        return self._decode_region(small, 0, 0, 1.0 / scale)
+
+    def _decode_region(self, image, offset_x, offset_y, scale):
+        hits = []
+        for data, points in self.backend.decode(image):
+            polygon = [(int(x * scale) + offset_x, int(y * scale) + offset_y) for x, y in points]
+            hits.append(QRHit(data, polygon))
+        return hits
+
+    def _bounding_roi(self, hits, shape):
+        xs = [x for hit in hits for x, _ in hit.polygon]
+        ys = [y for hit in hits for _, y in hit.polygon]
+        margin_x = int((max(xs) - min(xs)) * self.roi_margin)
+        margin_y = int((max(ys) - min(ys)) * self.roi_margin)
+        height, width = shape
+        return (
+            max(0, min(xs) - margin_x), max(0, min(ys) - margin_y),
+            min(width, max(xs) + margin_x), min(height, max(ys) + margin_y),
+        )
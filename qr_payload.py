@@ -0,0 +1,77 @@
+"""
+Compact QR payloads based on attendee IDs.
+
+A compact payload looks like ``ID:1Z4:K3M9QX``: the attendee's row id in
+base 36 followed by a short tag. Everything is upper-case letters, digits
+and ':', which QR codes store in their dense alphanumeric mode, so even a
+large roster fits in a version 1 code regardless of how long or non-ASCII
+the person's name is.
+
+The tag is an HMAC-SHA256 of the id, truncated to six base-36 digits. With
+ATTENDANCE_QR_SECRET set it authenticates the badge; without a secret it
+still works as a checksum against misreads and typos.
+
+Payloads that do not start with ``ID:`` are plain names (the original
+format) and are left to the roster lookup.
+"""
+
+import hashlib
+import hmac
+import os
+
+PREFIX = 'ID:'
+TAG_LENGTH = 6
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class InvalidPayload(ValueError):
+    """A compact payload whose tag does not match its id"""
+
+
+def default_secret():
+    """Secret used to sign payloads, taken from ATTENDANCE_QR_SECRET"""
+    return os.environ.get('ATTENDANCE_QR_SECRET', '')
+
+
+def to_base36(number):
+    if number == 0:
+        return '0'
+    digits = []
+    while number:
+        number, remainder = divmod(number, 36)
+        digits.append(ALPHABET[remainder])
+    return ''.join(reversed(digits))
+
+
+def compute_tag(attendee_id, secret=None):
+    secret = default_secret() if secret is None else secret
+    digest = hmac.new(secret.encode('utf-8'), str(attendee_id).encode('ascii'),
+                      hashlib.sha256).digest()
+    return to_base36(int.from_bytes(digest[:8], 'big')).rjust(TAG_LENGTH, '0')[:TAG_LENGTH]
+
+
+def make_payload(attendee_id, secret=None):
+    """Compact payload for an attendee id"""
+    return f"{PREFIX}{to_base36(attendee_id)}:{compute_tag(attendee_id, secret)}"
+
+
+def is_compact(data):
+    return data.startswith(PREFIX)
+
+
+def parse_payload(data, secret=None):
+    """Return the attendee id of a compact payload, or None for a plain name
+
+    Raises InvalidPayload if the payload is compact but malformed or its tag
+    does not match.
+    """
+    if not is_compact(data):
+        return None
+    try:
+        encoded_id, tag = data[len(PREFIX):].upper().split(':')
+        attendee_id = int(encoded_id, 36)
+    except ValueError:
+        raise InvalidPayload(f"Malformed badge code: {data}")
+    if not hmac.compare_digest(tag, compute_tag(attendee_id, secret)):
+        raise InvalidPayload(f"Badge code failed verification: {data}")
+    return attendee_id
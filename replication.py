@@ -0,0 +1,214 @@
+"""
+Offline replication of check-ins between kiosk stations.
+
+Every station publishes its own check-ins as an append-only changefeed in
+a shared directory (a network share or a synced folder):
+
+    <sync dir>/<station id>/<first seq>-<last seq>.jsonl
+
+and pulls the feeds of every other station. Watermarks are change
+sequence numbers (attendance.change_seq): a check-in made at this station
+and a check-in this station moved to an earlier time both take the next
+number. A station remembers the highest sequence number it has published
+and, per peer, the highest one it has applied, so each sync only exports
+and reads the changes since the last one. Segment files are named by their
+sequence range, so already-applied segments are skipped without being
+opened.
+
+Rows are applied idempotently with an upsert on the unique (name, day)
+index. If two doors checked in the same guest, every station keeps the
+earliest check-in, so all databases converge to the same result. Each
+station files incoming rows under its own event for that day, and rows of
+events it has already archived are not brought back.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+
+import attendance_db
+
+# What one sync round can fail with and still be retried on the next one:
+# an unavailable share, a locked database (archiving, a check-in batch) or
+# a malformed peer changefeed file
+SYNC_ERRORS = (OSError, ValueError, KeyError, TypeError, sqlite3.Error)
+
+
+def _get_state(conn, key, default=None):
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(conn, key, value):
+    conn.execute('''
+        INSERT INTO sync_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    ''', (key, str(value)))
+
+
+def station_id(conn):
+    """This database's station id, created on first use"""
+    value = _get_state(conn, 'station_id')
+    if value is None:
+        value = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        with conn:
+            _set_state(conn, 'station_id', value)
+    return value
+
+
+class ChangeFeed:
+    """Publishes local check-ins to, and applies peers' check-ins from, a shared directory"""
+
+    def __init__(self, db_path, directory, batch_size=5000):
+        self.conn = attendance_db.connect(db_path, check_same_thread=False)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.station = station_id(self.conn)
+        self.total_applied = 0
+
+    def close(self):
+        self.conn.close()
+
+    def export(self):
+        """Write local changes newer than the export watermark; returns the row count"""
+        exported_upto = int(_get_state(self.conn, 'exported_upto', 0))
+        rows = self.conn.execute('''
+            SELECT change_seq, name, checked_in_at, day FROM attendance
+            WHERE change_seq > ? AND origin IS NULL
+            ORDER BY change_seq
+        ''', (exported_upto,))
+
+        station_dir = os.path.join(self.directory, self.station)
+        os.makedirs(station_dir, exist_ok=True)
+
+        exported = 0
+        while True:
+            batch = rows.fetchmany(self.batch_size)
+            if not batch:
+                break
+            first_seq, last_seq = batch[0][0], batch[-1][0]
+            path = os.path.join(station_dir, f"{first_seq:012d}-{last_seq:012d}.jsonl")
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for seq, name, checked_in_at, day in batch:
+                    f.write(json.dumps({'seq': seq, 'name': name,
+                                        'checked_in_at': checked_in_at, 'day': day},
+                                       ensure_ascii=False) + '\n')
+            # Readers only ever see complete segments
+            os.replace(tmp_path, path)
+
+            with self.conn:
+                _set_state(self.conn, 'exported_upto', last_seq)
+            exported += len(batch)
+        return exported
+
+    def pull(self):
+        """Apply new rows from every peer's changefeed; returns rows inserted or updated"""
+        if not os.path.isdir(self.directory):
+            return 0
+
+        applied = 0
+        for peer in sorted(os.listdir(self.directory)):
+            peer_dir = os.path.join(self.directory, peer)
+            if peer == self.station or not os.path.isdir(peer_dir):
+                continue
+            applied += self._pull_peer(peer, peer_dir)
+        self.total_applied += applied
+        return applied
+
+    def _pull_peer(self, peer, peer_dir):
+        key = f"peer:{peer}"
+        watermark = int(_get_state(self.conn, key, 0))
+
+        segments = []
+        for filename in os.listdir(peer_dir):
+            if not filename.endswith('.jsonl'):
+                continue
+            try:
+                first_seq, last_seq = (int(part) for part in filename[:-6].split('-'))
+            except ValueError:
+                continue
+            if last_seq > watermark:
+                segments.append((first_seq, last_seq, filename))
+
+        applied = 0
+        for first_seq, last_seq, filename in sorted(segments):
+            with open(os.path.join(peer_dir, filename), 'r', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            # Segments written before change_seq existed carry the row id,
+            # which is the sequence number those rows were given
+            rows = [row for row in rows if row.get('seq', row.get('id')) > watermark]
+
+            with self.conn:
+                events = {}
+                applicable = []
+                for row in rows:
+                    if row['day'] not in events:
+                        events[row['day']] = attendance_db.event_for_day(self.conn, row['day'])
+                    event_id, _, archived = events[row['day']]
+                    # Check-ins of archived events stay in the archive
+                    if not archived:
+                        applicable.append(dict(row, origin=peer, event_id=event_id))
+
+                # A row already held is moved to the peer's time if that is earlier.
+                # rowcount sums the rows each upsert inserted or updated; unlike
+                # total_changes it leaves out trigger writes and new events
+                cursor = self.conn.executemany('''
+                    INSERT INTO attendance (name, checked_in_at, day, origin, event_id)
+                    VALUES (:name, :checked_in_at, :day, :origin, :event_id)
+                    ON CONFLICT(name, day) DO UPDATE SET
+                        checked_in_at = excluded.checked_in_at,
+                        origin = excluded.origin,
+                        attendee_id = NULL
+                    WHERE excluded.checked_in_at < attendance.checked_in_at
+                ''', applicable)
+                applied += cursor.rowcount
+                watermark = max(watermark, last_seq)
+                _set_state(self.conn, key, watermark)
+        return applied
+
+    def sync(self):
+        """Export local changes, then pull everyone else's; returns (exported, applied)"""
+        return self.export(), self.pull()
+
+
+class SyncThread:
+    """Runs ChangeFeed.sync() every few seconds in the background"""
+
+    def __init__(self, db_path, directory, interval=5.0):
+        self.feed = ChangeFeed(db_path, directory)
+        self.interval = interval
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='attendance-sync', daemon=True)
+
+    @property
+    def total_applied(self):
+        return self.feed.total_applied
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.feed.close()
+
+    def _run(self):
+        while True:
+            try:
+                self.feed.sync()
+                self.last_error = None
+            except SYNC_ERRORS as e:
+                # Must neither stop check-ins nor end the sync thread
+                self.last_error = e
+            if self._stop.wait(self.interval):
+                # One last export so check-ins made just before shutdown are published
+                try:
+                    self.feed.export()
+                except SYNC_ERRORS as e:
+                    self.last_error = e
+                return
@@ -0,0 +1,141 @@
+"""
+In-memory index over the roster of names.
+
+Keeps the names in display (sorted) order together with pre-normalized
+search keys, a name -> position map for O(1) lookups, and a sorted token
+list for word-prefix search. Substring search runs over one joined string
+of all keys, so the scan happens inside str.find instead of a Python loop,
+and a search that extends the previous term only re-filters the previous
+matches.
+"""
+
+import bisect
+import unicodedata
+
+
+def normalize_name(name):
+    """Normalized search key: NFC, casefolded, single spaces"""
+    return ' '.join(unicodedata.normalize('NFC', name).casefold().split())
+
+
+class RosterIndex:
+    """Sorted roster with hash, substring and word-prefix lookups"""
+
+    def __init__(self, names=()):
+        self.names = sorted(set(names))
+        self._keys = [normalize_name(name) for name in self.names]
+        self._position = {name: i for i, name in enumerate(self.names)}
+        self._tokens = sorted(
+            (token, name) for name, key in zip(self.names, self._keys) for token in key.split()
+        )
+        self._blob = None
+        self._offsets = None
+        self._last_term = None
+        self._last_result = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._position
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def index_of(self, name):
+        """Position of the name in sorted order, or None if not in the roster"""
+        return self._position.get(name)
+
+    def add(self, name):
+        """Insert a name in sorted position; returns False if already present"""
+        if name in self._position:
+            return False
+
+        i = bisect.bisect_left(self.names, name)
+        key = normalize_name(name)
+        self.names.insert(i, name)
+        self._keys.insert(i, key)
+        for j in range(i, len(self.names)):
+            self._position[self.names[j]] = j
+        for token in key.split():
+            bisect.insort(self._tokens, (token, name))
+
+        # Derived search state is rebuilt on the next search
+        self._blob = None
+        self._last_term = None
+        self._last_result = None
+        return True
+
+    def search(self, term):
+        """Return positions of names matching the search term, in sorted order
+
+        A name matches if the normalized term is a substring of it, or if
+        every word of the term is a prefix of some word in the name.
+        """
+        term = normalize_name(term)
+        if not term:
+            return range(len(self.names))
+
+        if self._last_term is not None and term.startswith(self._last_term) \
+                and ' ' not in term:
+            # Narrow the previous result instead of searching from scratch
+            keys = self._keys
+            result = [i for i in self._last_result if term in keys[i]]
+        else:
+            result = self._substring_search(term)
+            words = term.split()
+            if len(words) > 1:
+                result = sorted(set(result) | self._word_prefix_search(words))
+
+        self._last_term = term
+        self._last_result = result
+        return result
+
+    def matching_names(self, term):
+        """Names matching the search term, in sorted order"""
+        names = self.names
+        return [names[i] for i in self.search(term)]
+
+    def prefix_search(self, prefix):
+        """Names having a word that starts with the given prefix"""
+        prefix = normalize_name(prefix)
+        start = bisect.bisect_left(self._tokens, (prefix,))
+        matches = set()
+        for token, name in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.add(name)
+        return sorted(matches)
+
+    def _word_prefix_search(self, words):
+        result = None
+        for word in words:
+            positions = {self._position[name] for name in self.prefix_search(word)}
+            result = positions if result is None else result & positions
+            if not result:
+                break
+        return result or set()
+
+    def _substring_search(self, term):
+        if self._blob is None:
+            self._build_blob()
+        blob, offsets = self._blob, self._offsets
+
+        result = []
+        start = blob.find(term)
+        while start != -1:
+            i = bisect.bisect_right(offsets, start) - 1
+            result.append(i)
+            # Jump to the next name; one match per name is enough
+            start = blob.find(term, offsets[i + 1] if i + 1 < len(offsets) else len(blob))
+        return result
+
+    def _build_blob(self):
+        # Keys never contain newlines, so a match cannot span two names
+        offsets = []
+        position = 0
+        for key in self._keys:
+            offsets.append(position)
+            position += len(key) + 1
+        self._offsets = offsets
+        self._blob = '\n'.join(self._keys)
@@ -0,0 +1,212 @@
+"""
+Streaming roster import and attendance export.
+
+Rosters (CSV or JSON Lines) are read row by row and inserted in executemany
+batches inside a single transaction, so a 100k-row HR export needs neither
+the whole file in memory nor one commit per name. Duplicates are skipped by
+the unique index on attendees.name_key (the normalized name) rather than a
+set of names, and only the first rejected rows are kept, so memory use
+does not grow with the roster or the file. Attendance is exported straight
+from a cursor to CSV.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+
+from roster_index import normalize_name
+
+MAX_NAME_LENGTH = 200
+
+# Rejected rows kept for the report; the rest are only counted
+MAX_REJECTED_KEPT = 100
+
+
+class ImportSummary:
+    """Counts and the first rejected rows from a roster import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected_count = 0
+        self.rejected = []  # (row number, reason, raw value), first MAX_REJECTED_KEPT
+
+    def reject(self, row_number, reason, raw):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REJECTED_KEPT:
+            self.rejected.append((row_number, reason, raw))
+
+    def format(self, max_rejected=20):
+        lines = [
+            f"Rows read:   {self.rows}",
+            f"Inserted:    {self.inserted}",
+            f"Duplicates:  {self.duplicates}",
+            f"Rejected:    {self.rejected_count}",
+        ]
+        for row_number, reason, raw in self.rejected[:max_rejected]:
+            lines.append(f"  row {row_number}: {reason} ({raw!r})")
+        if self.rejected_count > max_rejected:
+            lines.append(f"  ... and {self.rejected_count - max_rejected} more")
+        return '\n'.join(lines)
+
+
+def clean_name(raw):
+    """Display form of a name: trimmed, inner whitespace collapsed"""
+    return ' '.join(str(raw).split())
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return 'jsonl' if ext in ('.jsonl', '.ndjson') else 'csv'
+
+
+def iter_csv_names(f, column=None, header=True):
+    """Yield (row number, raw name or None, error) from a CSV roster
+
+    With header (the default) the first row is a header and never a guest:
+    the name column is `column`, else the one headed 'name', else the only
+    column whatever its heading ('Full Name', 'Guest'...); a wider header
+    without a 'name' column raises ValueError instead of guessing. Without
+    header every row is a name in the first column.
+    """
+    reader = csv.reader(f)
+    index, first_row = 0, 1
+    if header:
+        names = next(reader, None)
+        if names is None:
+            return
+        columns = [cell.strip().lower() for cell in names]
+        if column is not None:
+            if column.lower() not in columns:
+                raise ValueError(f"Column {column!r} not found in CSV header")
+            index = columns.index(column.lower())
+        elif 'name' in columns:
+            index = columns.index('name')
+        elif len(columns) > 1:
+            raise ValueError(f"CSV header has no 'name' column ({', '.join(names)}); "
+                             f"choose one with --column")
+        first_row = 2
+    elif column is not None:
+        raise ValueError("A column can only be chosen by its header; drop --no-header")
+
+    for row_number, row in enumerate(reader, start=first_row):
+        if index >= len(row):
+            yield row_number, None, "missing name column"
+        else:
+            yield row_number, row[index], None
+
+
+def iter_jsonl_names(f, column=None):
+    """Yield (row number, raw name or None, error) from a JSON Lines roster"""
+    key = column or 'name'
+    for row_number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            yield row_number, None, "invalid JSON"
+            continue
+        if isinstance(value, dict):
+            value = value.get(key)
+        if not isinstance(value, str):
+            yield row_number, None, f"no string {key!r} value"
+        else:
+            yield row_number, value, None
+
+
+def import_roster(conn, path, fmt=None, column=None, batch_size=5000, progress=None,
+                  header=True):
+    """Stream a CSV/JSONL roster into the attendees table; returns an ImportSummary
+
+    header: whether a CSV roster starts with a header row (see iter_csv_names).
+    """
+    fmt = fmt or detect_format(path)
+    summary = ImportSummary()
+
+    batch = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f, conn:
+        if fmt == 'jsonl':
+            rows = iter_jsonl_names(f, column)
+        else:
+            rows = iter_csv_names(f, column, header)
+        for row_number, raw, error in rows:
+            summary.rows += 1
+            if error:
+                summary.reject(row_number, error, raw)
+                continue
+
+            name = clean_name(raw)
+            if not name:
+                summary.reject(row_number, "empty name", raw)
+                continue
+            if len(name) > MAX_NAME_LENGTH:
+                summary.reject(row_number, "name too long", raw[:40])
+                continue
+
+            batch.append((name, normalize_name(name)))
+            if len(batch) >= batch_size:
+                _insert_batch(conn, batch, summary)
+                batch = []
+                if progress:
+                    progress(summary)
+
+        if batch:
+            _insert_batch(conn, batch, summary)
+    if progress:
+        progress(summary)
+    return summary
+
+
+def _insert_batch(conn, batch, summary):
+    # The unique name_key index drops names already on the roster or earlier in the file;
+    # rowcount leaves out the roster_stats trigger writes that total_changes includes
+    cursor = conn.executemany('INSERT OR IGNORE INTO attendees (name, name_key) VALUES (?, ?)', batch)
+    inserted = cursor.rowcount
+    summary.inserted += inserted
+    summary.duplicates += len(batch) - inserted
+
+
+def export_attendance(conn, path, day=None, event_id=None, batch_size=5000, progress=None):
+    """Stream attendance rows to a CSV file; returns the number of rows written"""
+    query = 'SELECT name, checked_in_at, day FROM attendance'
+    params = ()
+    if event_id is not None:
+        query += ' WHERE event_id = ?'
+        params = (event_id,)
+    elif day:
+        query += ' WHERE day = ?'
+        params = (day,)
+    query += ' ORDER BY id'
+
+    written = 0
+    cursor = conn.execute(query, params)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'checked_in_at', 'day'])
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+def print_progress(label):
+    """Progress callback factory that reports rows and rate on stderr"""
+    started = time.perf_counter()
+
+    def report(value):
+        count = value.rows if isinstance(value, ImportSummary) else value
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"\r{label}: {count} rows ({rate:,.0f} rows/s)", end='', file=sys.stderr, flush=True)
+
+    return report
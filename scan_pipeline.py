@@ -0,0 +1,412 @@
+"""
+Background capture/decode pipeline for the QR scanner.
+
+A capture thread reads camera frames into a single-slot buffer where the
+newest frame always wins, and a decode thread runs the DecodeEngine on
+whatever frame is current. Both OpenCV and pyzbar release the GIL while
+they work, so the Tk main thread only has to poll for finished results and
+preview images.
+
+The preview is rendered by the capture thread at its own rate
+(``preview_fps``), independent of how fast decoding runs, into two
+preallocated RGBA buffers that are swapped when a frame is complete. The
+Tk thread pastes the front buffer into one long-lived PhotoImage, so no
+images are allocated per frame. Rendering stops while
+``preview_enabled`` is False (window minimized or covered).
+
+Stages are timed through the metrics module; with metrics enabled the
+preview also carries a small FPS/latency overlay.
+
+MultiCameraScanner runs one pipeline per camera. Each has its own capture
+and decode threads (which run in parallel, since OpenCV and pyzbar release
+the GIL), and all of them publish into one shared result queue through one
+shared RecentScanCache, so a badge held up to two cameras is reported once.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import metrics
+from qr_decoder import DecodeEngine
+
+# How long (seconds) the outline of a decoded code stays on the preview
+POLYGON_TTL = 0.3
+
+
+class LatestFrameBuffer:
+    """Single-slot frame buffer: a new frame replaces any unread one"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, frame, timestamp):
+        """Store a frame, dropping the previous one if it was never read"""
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = (frame, timestamp)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Wait for the next frame; returns (frame, timestamp) or None"""
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class RateMeter:
+    """Events per second over a sliding time window"""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._events.append(now)
+            while self._events and now - self._events[0] > self.window:
+                self._events.popleft()
+
+    def rate(self):
+        with self._lock:
+            if len(self._events) < 2:
+                return 0.0
+            span = self._events[-1] - self._events[0]
+            return (len(self._events) - 1) / span if span > 0 else 0.0
+
+
+class LatencyStats:
+    """Keeps the most recent latency samples (in seconds)"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self):
+        """Return (mean_ms, p95_ms) of the recent samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0, 0.0
+        mean = sum(samples) / len(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return mean * 1000, p95 * 1000
+
+
+class RecentScanCache:
+    """Remembers recently seen payloads so one badge is only reported once
+
+    A payload stays suppressed while it keeps being seen; it is reported
+    again once it has been out of view for longer than ``cooldown`` seconds.
+    """
+
+    def __init__(self, cooldown=5.0):
+        self.cooldown = cooldown
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, payload, now=None):
+        """Return True if the payload is new, False if it is still cooling down"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            is_new = payload not in self._seen
+            self._seen[payload] = now
+            self._seen.move_to_end(payload)
+            return is_new
+
+    def forget(self, payload):
+        with self._lock:
+            self._seen.pop(payload, None)
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+
+    def _expire(self, now):
+        # Entries are kept in last-seen order, so stale ones are at the front
+        while self._seen:
+            payload, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self.cooldown:
+                break
+            self._seen.popitem(last=False)
+
+
+class DecodeResult:
+    """A QR code found by the decode worker"""
+
+    def __init__(self, data, polygon, captured_at, decoded_at, camera=None):
+        self.data = data
+        self.polygon = polygon
+        self.captured_at = captured_at
+        self.decoded_at = decoded_at
+        self.camera = camera
+
+
+class ScanPipeline:
+    """Runs camera capture and QR decoding on background threads"""
+
+    def __init__(self, camera, preview_size=(400, 300), engine=None, recent=None,
+                 preview_fps=15.0, results=None, name=None):
+        self.camera = camera
+        self.name = name
+        self.preview_size = preview_size
+        self.engine = engine or DecodeEngine()
+        # Optional RecentScanCache; repeats of a payload are not published
+        self.recent = recent
+
+        self.frames = LatestFrameBuffer()
+        # May be shared with other pipelines
+        self.results = results if results is not None else queue.Queue()
+        self.published = 0
+
+        # Preview: a resize target plus front/back RGBA buffers. The PIL images
+        # share the buffers' memory, so pasting them copies straight into Tk.
+        width, height = preview_size
+        self.preview_interval = 1.0 / preview_fps if preview_fps else 0.0
+        self.preview_enabled = True
+        self._preview_small = np.empty((height, width, 3), np.uint8)
+        self._preview_buffers = [np.zeros((height, width, 4), np.uint8) for _ in range(2)]
+        self._preview_images = [
+            Image.frombuffer('RGBA', preview_size, buffer, 'raw', 'RGBA', 0, 1)
+            for buffer in self._preview_buffers
+        ]
+        self._front = 0
+        self._preview_fresh = False
+        self._preview_lock = threading.Lock()
+        self._next_preview_at = 0.0
+        # Polygons of the latest hits (frame coordinates) and when they were seen
+        self._last_polygons = ((), 0.0)
+
+        self.capture_rate = RateMeter()
+        self.decode_rate = RateMeter()
+        self.latency = LatencyStats()
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the capture and decode threads"""
+        self._stop.clear()
+        suffix = '' if self.name is None else f"-{self.name}"
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name=f"qr-capture{suffix}", daemon=True),
+            threading.Thread(target=self._decode_loop, name=f"qr-decode{suffix}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop both threads and wait for them to finish"""
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            with metrics.stage('capture.read'):
+                ret, frame = self.camera.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            now = time.perf_counter()
+            self.capture_rate.tick(now)
+            self.frames.put(frame, now)
+
+            if self.preview_enabled and now >= self._next_preview_at:
+                self._next_preview_at = now + self.preview_interval
+                with metrics.stage('preview.render'):
+                    self._render_preview(frame, now)
+
+    def _decode_loop(self):
+        while not self._stop.is_set():
+            item = self.frames.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, captured_at = item
+
+            with metrics.stage('decode.total'):
+                hits = self.engine.decode(frame)
+            if hits is None:
+                continue
+            decoded_at = time.perf_counter()
+            self.decode_rate.tick(decoded_at)
+            self.latency.add(decoded_at - captured_at)
+            metrics.record('scan.latency', decoded_at - captured_at)
+
+            if hits:
+                # The capture thread draws these onto the next previews
+                self._last_polygons = (tuple(hit.polygon for hit in hits), decoded_at)
+            for hit in hits:
+                if self.recent is None or self.recent.check(hit.data):
+                    self.published += 1
+                    self.results.put(DecodeResult(hit.data, hit.polygon, captured_at, decoded_at,
+                                                  self.name))
+
+    def _render_preview(self, frame, now):
+        """Draw the frame into the back buffer, then make it the front one"""
+        back = self._preview_buffers[1 - self._front]
+        cv2.resize(frame, self.preview_size, dst=self._preview_small)
+        cv2.cvtColor(self._preview_small, cv2.COLOR_BGR2RGBA, dst=back)
+
+        polygons, seen_at = self._last_polygons
+        if polygons and now - seen_at <= POLYGON_TTL:
+            scale_x = self.preview_size[0] / frame.shape[1]
+            scale_y = self.preview_size[1] / frame.shape[0]
+            for polygon in polygons:
+                if len(polygon) == 4:
+                    points = np.array([(x * scale_x, y * scale_y) for x, y in polygon], np.int32)
+                    cv2.polylines(back, [points], True, (0, 255, 0, 255), 2)
+        if metrics.enabled():
+            self._draw_overlay(back)
+
+        # Only the swap needs the lock; the Tk thread never reads the back buffer
+        with self._preview_lock:
+            self._front = 1 - self._front
+            self._preview_fresh = True
+
+    def _draw_overlay(self, image):
+        """Write capture/decode FPS and p95 latency onto the preview"""
+        _, p95_ms = self.latency.summary()
+        text = (f"cap {self.capture_rate.rate():.0f} fps  dec {self.decode_rate.rate():.0f} fps  "
+                f"p95 {p95_ms:.0f} ms")
+        cv2.rectangle(image, (0, 0), (image.shape[1], 22), (0, 0, 0, 255), -1)
+        cv2.putText(image, text, (6, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0, 255), 1,
+                    cv2.LINE_AA)
+
+    def poll_results(self):
+        """Return all decode results published since the last call"""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def paste_preview(self, photo):
+        """Copy the newest preview into a PhotoImage; returns False if nothing new"""
+        with self._preview_lock:
+            if not self._preview_fresh:
+                return False
+            photo.paste(self._preview_images[self._front])
+            self._preview_fresh = False
+        return True
+
+    def stats(self):
+        """Return a dict with capture/decode FPS and decode latency"""
+        mean_ms, p95_ms = self.latency.summary()
+        return {
+            'capture_fps': self.capture_rate.rate(),
+            'decode_fps': self.decode_rate.rate(),
+            'latency_ms': mean_ms,
+            'latency_p95_ms': p95_ms,
+            'dropped_frames': self.frames.dropped,
+            'passes': dict(self.engine.counts),
+            'backend': self.engine.backend.name,
+            'published': self.published,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        return (
+            f"Capture {stats['capture_fps']:.1f} fps | Decode {stats['decode_fps']:.1f} fps | "
+            f"Latency {stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms) | "
+            f"{stats['backend']}"
+        )
+
+
+class MultiCameraScanner:
+    """One ScanPipeline per camera, all feeding a single result queue
+
+    Only one camera is previewed at a time: the first one, until another
+    camera reads a badge. The other pipelines skip preview rendering.
+    """
+
+    def __init__(self, cameras, engine_factory=DecodeEngine, recent=None,
+                 preview_size=(400, 300), preview_fps=15.0):
+        self.results = queue.Queue()
+        self.preview_size = preview_size
+        self.pipelines = [
+            ScanPipeline(camera, preview_size, engine_factory(), recent, preview_fps,
+                         results=self.results, name=name)
+            for name, camera in cameras
+        ]
+        self._by_name = {pipeline.name: pipeline for pipeline in self.pipelines}
+        self.active = self.pipelines[0]
+        self._preview_enabled = True
+
+    def start(self):
+        self.preview_enabled = self._preview_enabled
+        for pipeline in self.pipelines:
+            pipeline.start()
+
+    def stop(self, timeout=1.0):
+        for pipeline in self.pipelines:
+            pipeline.stop(timeout)
+
+    @property
+    def preview_enabled(self):
+        return self._preview_enabled
+
+    @preview_enabled.setter
+    def preview_enabled(self, enabled):
+        self._preview_enabled = enabled
+        for pipeline in self.pipelines:
+            pipeline.preview_enabled = enabled and pipeline is self.active
+
+    def poll_results(self):
+        """Results from every camera, in the order they were published"""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        if results:
+            # Preview the camera that is being used
+            self.active = self._by_name.get(results[-1].camera, self.active)
+            self.preview_enabled = self._preview_enabled
+        return results
+
+    def paste_preview(self, photo):
+        return self.active.paste_preview(photo)
+
+    def stats(self):
+        """Per-camera stats, keyed by camera name"""
+        return {str(pipeline.name): pipeline.stats() for pipeline in self.pipelines}
+
+    def format_stats(self):
+        if len(self.pipelines) == 1:
+            return self.active.format_stats()
+        lines = []
+        for pipeline in self.pipelines:
+            stats = pipeline.stats()
+            marker = '*' if pipeline is self.active else ' '
+            lines.append(
+                f"{marker}Cam {pipeline.name}: capture {stats['capture_fps']:.0f} fps | "
+                f"decode {stats['decode_fps']:.0f} fps | p95 {stats['latency_p95_ms']:.0f} ms | "
+                f"{stats['published']} scans"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,157 @@
+"""
+The trigger-maintained arrival statistics (event_stats and arrival_buckets)
+against inserts, earlier-time updates, event merges and archiving.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arrival_stats  # noqa: E402
+import attendance_db  # noqa: E402
+import event_archive  # noqa: E402
+
+DAY = '2024-12-20'
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = attendance_db.connect(str(tmp_path / 'attendance.db'))
+    yield conn
+    conn.close()
+
+
+def event_of(conn, day=DAY):
+    return attendance_db.event_for_day(conn, day, create=False)[0]
+
+
+def test_insert_counts_check_in(conn):
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 18:20:00')
+    attendance_db.check_in(conn, 'Cat', f'{DAY} 18:40:00')
+
+    summary = arrival_stats.event_summary(conn, event_of(conn))
+    assert summary['checkins'] == 3
+    assert summary['first_at'] == f'{DAY} 18:05:00'
+    assert summary['last_at'] == f'{DAY} 18:40:00'
+    assert summary['buckets'] == [(f'{DAY} 18:00', 1), (f'{DAY} 18:15', 1), (f'{DAY} 18:30', 1)]
+
+
+def test_earlier_check_in_moves_bucket_and_last_arrival(conn):
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:40:00')
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 19:05:00')
+    # A recording processed later saw Bob at 18:10
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 18:10:00', keep_earliest=True)
+
+    summary = arrival_stats.event_summary(conn, event_of(conn))
+    assert summary['checkins'] == 2
+    assert summary['buckets'] == [(f'{DAY} 18:00', 1), (f'{DAY} 18:30', 1)]
+    assert summary['first_at'] == f'{DAY} 18:10:00'
+    assert summary['last_at'] == f'{DAY} 18:40:00'
+
+
+def test_deleted_check_in_moves_first_and_last_arrival(conn):
+    for name, time in (('Ann', '18:05'), ('Bob', '18:20'), ('Cat', '18:40')):
+        attendance_db.check_in(conn, name, f'{DAY} {time}:00')
+    with conn:
+        conn.execute("DELETE FROM attendance WHERE name IN ('Ann', 'Cat')")
+
+    summary = arrival_stats.event_summary(conn, event_of(conn))
+    assert summary['checkins'] == 1
+    assert summary['first_at'] == summary['last_at'] == f'{DAY} 18:20:00'
+    assert summary['buckets'] == [(f'{DAY} 18:15', 1)]
+
+
+def test_create_event_merges_day_statistics(conn):
+    attendance_db.check_in(conn, 'Ann', '2024-12-20 18:05:00')
+    attendance_db.check_in(conn, 'Bob', '2024-12-21 21:50:00')
+    day_events = [event_of(conn, '2024-12-20'), event_of(conn, '2024-12-21')]
+
+    event_id = attendance_db.create_event(conn, 'Winter Party', '2024-12-20', '2024-12-21')
+
+    summary = arrival_stats.event_summary(conn, event_id)
+    assert summary['checkins'] == 2
+    assert summary['first_at'] == '2024-12-20 18:05:00'
+    assert summary['last_at'] == '2024-12-21 21:50:00'
+    assert summary['buckets'] == [('2024-12-20 18:00', 1), ('2024-12-21 21:45', 1)]
+    for day_event in day_events:
+        assert arrival_stats.event_summary(conn, day_event)['checkins'] == 0
+
+
+def test_archive_keeps_statistics(conn, tmp_path):
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 18:20:00')
+    event_id = event_of(conn)
+    before = arrival_stats.event_summary(conn, event_id)
+
+    _, rows = event_archive.archive_event(conn, event_id, str(tmp_path / 'archive'))
+
+    assert rows == 2
+    assert conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 0
+    assert arrival_stats.event_summary(conn, event_id) == before
+
+
+def test_migration_corrects_stale_last_arrival(conn):
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    with conn:
+        # What the version 7 triggers left behind after an earlier-time update
+        conn.execute("UPDATE event_stats SET last_at = ?", (f'{DAY} 23:00:00',))
+        conn.execute('PRAGMA user_version=7')
+
+    attendance_db.migrate(conn)
+
+    assert arrival_stats.event_summary(conn, event_of(conn))['last_at'] == f'{DAY} 18:05:00'
+
+
+def test_invited_and_missing_follow_roster_and_check_ins(conn):
+    attendance_db.add_attendees(conn, ['Ann', 'Bob', 'Cat'])
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    attendance_db.check_in(conn, 'Dan', f'{DAY} 18:10:00')    # Walk-in, not on the roster
+    event_id = event_of(conn)
+
+    summary = arrival_stats.event_summary(conn, event_id)
+    assert (summary['invited'], summary['arrived']) == (3, 1)
+    assert arrival_stats.missing_count(conn, event_id) == 2
+
+    # Adding the walk-in to the roster counts the check-in already made
+    assert attendance_db.add_attendee(conn, 'Dan')
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 18:20:00')
+    with conn:
+        conn.execute("DELETE FROM attendees WHERE name = 'Cat'")
+
+    summary = arrival_stats.event_summary(conn, event_id)
+    assert (summary['invited'], summary['arrived']) == (3, 3)
+    assert arrival_stats.missing_count(conn, event_id) == 0
+
+
+def test_guest_on_several_days_arrives_once_per_event(conn):
+    attendance_db.add_attendees(conn, ['Ann', 'Bob'])
+    attendance_db.check_in(conn, 'Ann', '2024-12-20 18:05:00')
+    attendance_db.check_in(conn, 'Ann', '2024-12-21 18:05:00')
+    attendance_db.check_in(conn, 'Bob', '2024-12-21 19:00:00')
+
+    event_id = attendance_db.create_event(conn, 'Winter Party', '2024-12-20', '2024-12-21')
+    attendance_db.check_in(conn, 'Ann', '2024-12-21 17:00:00', keep_earliest=True)
+
+    summary = arrival_stats.event_summary(conn, event_id)
+    assert (summary['checkins'], summary['arrived']) == (3, 2)
+    assert arrival_stats.missing_count(conn, event_id) == 0
+
+
+def test_migration_fills_roster_summary(conn):
+    attendance_db.add_attendees(conn, ['Ann', 'Bob', 'Cat'])
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    with conn:
+        conn.execute('DROP TABLE roster_stats')
+        conn.execute('UPDATE event_stats SET arrived = 0')
+        conn.execute('PRAGMA user_version=9')
+
+    attendance_db.migrate(conn)
+
+    assert attendance_db.attendee_count(conn) == 3
+    assert arrival_stats.missing_count(conn, event_of(conn)) == 2
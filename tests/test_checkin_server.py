@@ -0,0 +1,126 @@
+"""
+The check-in HTTP API over real sockets: check-ins and duplicates,
+malformed requests and bodies, and the Origin check.
+
+    python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+from checkin_engine import CheckinEngine  # noqa: E402
+from checkin_server import CheckinServer  # noqa: E402
+
+ALLOWED = 'http://localhost:5173'
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'attendance.db')
+    conn = attendance_db.connect(path)
+    attendance_db.add_attendees(conn, ['Ann Lee', 'Bob Stone'])
+    conn.close()
+    return path
+
+
+def exchange(db_path, *requests, allow_origin=None):
+    """Send raw requests, each on its own connection; returns [(status, headers, body)]"""
+    async def run():
+        engine = CheckinEngine(db_path)
+        server = CheckinServer(engine, port=0, allow_origin=allow_origin)
+        await server.start()
+        try:
+            return [await send(server.port, request) for request in requests]
+        finally:
+            await server.stop()
+            engine.close()
+    return asyncio.run(run())
+
+
+async def send(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.lower().split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(body) if body else None
+
+
+def post(path, body, *extra_headers):
+    body = body.encode('utf-8') if isinstance(body, str) else body
+    head = [f'POST {path} HTTP/1.1', f'Content-Length: {len(body)}', 'Connection: close',
+            *extra_headers]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+def get(path, *extra_headers):
+    head = [f'GET {path} HTTP/1.1', 'Connection: close', *extra_headers]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+
+def test_check_in_then_duplicate(db_path):
+    first, again = exchange(db_path, post('/checkin', '{"name": "Ann Lee"}'),
+                            post('/checkin', '{"payload": "Ann Lee"}'))
+    assert first[0] == 200 and first[2]['status'] == 'registered'
+    assert again[0] == 200 and again[2]['status'] == 'already_registered'
+
+    conn = attendance_db.connect(db_path)
+    assert conn.execute('SELECT name FROM attendance').fetchall() == [('Ann Lee',)]
+    conn.close()
+
+
+def test_unknown_guest_is_404(db_path):
+    [(status, _, body)] = exchange(db_path, post('/checkin', '{"name": "Nobody Here"}'))
+    assert status == 404
+    assert 'error' in body
+
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"Ann Lee"', 'null', '{not json', '{"name": ""}'])
+def test_malformed_body_is_400(db_path, body):
+    [(status, _, response)] = exchange(db_path, post('/checkin', body))
+    assert status == 400
+    assert 'error' in response
+
+
+@pytest.mark.parametrize('length', ['abc', '-5', '1.5'])
+def test_bad_content_length_is_400(db_path, length):
+    request = f'POST /checkin HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}'.encode()
+    [(status, _, body)] = exchange(db_path, request)
+    assert status == 400
+    assert body == {'error': "Invalid Content-Length"}
+
+
+def test_origin_refused_without_allow_origin(db_path):
+    plain, browser = exchange(db_path, get('/health'),
+                              post('/checkin', '{"name": "Ann Lee"}', f'Origin: {ALLOWED}'))
+    assert plain[0] == 200
+    assert 'access-control-allow-origin' not in plain[1]
+    assert browser[0] == 403
+
+    conn = attendance_db.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 0
+    conn.close()
+
+
+def test_only_the_allowed_origin_may_call(db_path):
+    preflight, allowed, other = exchange(
+        db_path,
+        f'OPTIONS /checkin HTTP/1.1\r\nOrigin: {ALLOWED}\r\nConnection: close\r\n\r\n'.encode(),
+        post('/checkin', '{"name": "Bob Stone"}', f'Origin: {ALLOWED}'),
+        post('/checkin', '{"name": "Ann Lee"}', 'Origin: http://evil.example'),
+        allow_origin=ALLOWED,
+    )
+    assert preflight[0] == 204
+    assert preflight[1]['access-control-allow-origin'] == ALLOWED
+    assert allowed[0] == 200 and allowed[2]['status'] == 'registered'
+    assert other[0] == 403
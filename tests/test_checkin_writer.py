@@ -0,0 +1,71 @@
+"""
+The group-commit check-in writer: batching, per-request failures and
+what happens once it has stopped.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+from checkin_writer import CheckinWriter  # noqa: E402
+
+
+@pytest.fixture
+def writer(tmp_path):
+    # A long window shows whether a lone request waits it out
+    writer = CheckinWriter(str(tmp_path / 'attendance.db'), batch_window=2.0)
+    writer.start()
+    yield writer
+    writer.close()
+
+
+def test_lone_request_is_written_without_waiting_for_the_window(writer):
+    started = time.monotonic()
+    assert writer.submit('Ann').result(5) is True
+    assert time.monotonic() - started < 1.0
+    assert writer.submit('Ann').result(5) is False
+
+
+def test_burst_is_written_in_few_commits(writer):
+    futures = [writer.submit(f'Guest {i}') for i in range(200)]
+    wait(futures, 10)
+    assert all(future.result() is True for future in futures)
+    assert writer.commits < 20
+
+
+def test_failing_request_only_fails_its_own_future(writer, monkeypatch):
+    check_in = attendance_db.check_in
+
+    def flaky(conn, name, *args, **kwargs):
+        registered = check_in(conn, name, *args, **kwargs)
+        if name == 'Bad':
+            raise ValueError("failed after the insert")
+        return registered
+    monkeypatch.setattr(attendance_db, 'check_in', flaky)
+
+    futures = [writer.submit(name) for name in ('Ann', 'Bad', 'Cat')]
+    wait(futures, 10)
+    assert futures[0].result() is True
+    assert isinstance(futures[1].exception(), ValueError)
+    assert futures[2].result() is True
+
+    conn = attendance_db.connect(writer.path)
+    assert conn.execute('SELECT name FROM attendance ORDER BY name').fetchall() == [('Ann',), ('Cat',)]
+    conn.close()
+
+
+def test_stopped_writer_rejects_requests(writer):
+    writer.submit('Ann')
+    assert writer.close() is True
+
+    with pytest.raises(RuntimeError):
+        writer.flush(1)
+    assert isinstance(writer.submit('Bob').exception(1), RuntimeError)
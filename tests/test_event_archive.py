@@ -0,0 +1,62 @@
+"""
+Archiving an event: the read-only archive file, and a failed archive
+leaving neither a file nor missing rows behind.
+
+    python -m pytest tests
+"""
+
+import os
+import sqlite3
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import event_archive  # noqa: E402
+
+DAY = '2024-12-20'
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = attendance_db.connect(str(tmp_path / 'attendance.db'))
+    attendance_db.check_in(conn, 'Ann', f'{DAY} 18:05:00')
+    attendance_db.check_in(conn, 'Bob', f'{DAY} 18:20:00')
+    yield conn
+    conn.close()
+
+
+def event_of(conn, day=DAY):
+    return attendance_db.event_for_day(conn, day, create=False)[0]
+
+
+def test_archive_is_read_only_and_complete(conn, tmp_path):
+    path, rows = event_archive.archive_event(conn, event_of(conn), str(tmp_path / 'archive'))
+
+    assert rows == 2
+    assert not stat.S_IMODE(os.stat(path).st_mode) & 0o222
+    assert [row['name'] for row in event_archive.iter_archive(path)] == ['Ann', 'Bob']
+    assert os.listdir(tmp_path / 'archive') == [os.path.basename(path)]
+    assert conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 0
+
+
+def test_failed_archive_leaves_no_file_and_can_be_retried(conn, tmp_path):
+    directory = str(tmp_path / 'archive')
+    event_id = event_of(conn)
+    conn.execute('''
+        CREATE TEMP TRIGGER fail_delete BEFORE DELETE ON attendance
+        BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END
+    ''')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        event_archive.archive_event(conn, event_id, directory)
+    assert os.listdir(directory) == []
+    assert conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 2
+    assert conn.execute('SELECT archived_at FROM events WHERE id = ?', (event_id,)).fetchone()[0] is None
+
+    conn.execute('DROP TRIGGER fail_delete')
+    _, rows = event_archive.archive_event(conn, event_id, directory)
+    assert rows == 2
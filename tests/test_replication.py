@@ -0,0 +1,92 @@
+"""
+Replication between two stations through a shared changefeed directory:
+new check-ins, check-ins moved to an earlier time, the applied counts and
+SyncThread surviving a malformed peer segment.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import replication  # noqa: E402
+
+DAY = '2024-12-20'
+
+CHECKINS = 'SELECT name, checked_in_at FROM attendance ORDER BY name'
+
+
+@pytest.fixture
+def stations(tmp_path):
+    sync_dir = str(tmp_path / 'sync')
+    a = replication.ChangeFeed(str(tmp_path / 'a.db'), sync_dir)
+    b = replication.ChangeFeed(str(tmp_path / 'b.db'), sync_dir)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_new_check_ins_reach_the_peer(stations):
+    a, b = stations
+    attendance_db.check_in(a.conn, 'Bob', f'{DAY} 18:10:00')
+    attendance_db.check_in(a.conn, 'Cat', f'{DAY} 20:00:00')
+
+    assert a.export() == 2
+    assert b.pull() == 2
+    assert b.conn.execute(CHECKINS).fetchall() == a.conn.execute(CHECKINS).fetchall()
+    # Nothing new: nothing exported or applied
+    assert a.sync() == (0, 0)
+    assert b.pull() == 0
+
+
+def test_earlier_check_in_converges(stations):
+    a, b = stations
+    attendance_db.check_in(a.conn, 'Bob', f'{DAY} 18:10:00')
+    attendance_db.check_in(a.conn, 'Cat', f'{DAY} 20:00:00')
+    a.sync()
+    b.sync()
+
+    # A recording processed at A saw both earlier; B saw Cat earlier still
+    attendance_db.check_in(a.conn, 'Bob', f'{DAY} 17:00:00', keep_earliest=True)
+    attendance_db.check_in(a.conn, 'Cat', f'{DAY} 17:30:00', keep_earliest=True)
+    attendance_db.check_in(b.conn, 'Cat', f'{DAY} 17:10:00', keep_earliest=True)
+
+    assert a.export() == 2
+    assert b.sync() == (1, 1)   # Bob moved back; A's Cat is later than B's
+    assert a.pull() == 1        # B's Cat
+    assert b.pull() == 0
+
+    expected = [('Bob', f'{DAY} 17:00:00'), ('Cat', f'{DAY} 17:10:00')]
+    assert a.conn.execute(CHECKINS).fetchall() == expected
+    assert b.conn.execute(CHECKINS).fetchall() == expected
+    assert a.total_applied == 1
+    assert b.total_applied == 3
+
+
+def test_sync_thread_survives_malformed_segment(tmp_path):
+    peer_dir = tmp_path / 'sync' / 'peer'
+    peer_dir.mkdir(parents=True)
+    segment = peer_dir / '000000000001-000000000001.jsonl'
+    segment.write_text('{"seq": 1, "name": "Ann"}\n')
+
+    thread = replication.SyncThread(str(tmp_path / 'a.db'), str(tmp_path / 'sync'), interval=0.02)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while thread.last_error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert isinstance(thread.last_error, KeyError)
+
+        segment.write_text(f'{{"seq": 1, "name": "Ann", "day": "{DAY}", '
+                           f'"checked_in_at": "{DAY} 18:00:00"}}\n')
+        while thread.total_applied == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert thread.total_applied == 1
+    finally:
+        thread.stop()
@@ -0,0 +1,64 @@
+"""
+Roster imports: header handling of CSV files and duplicate detection.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import roster_io  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = attendance_db.connect(str(tmp_path / 'attendance.db'))
+    yield conn
+    conn.close()
+
+
+def roster_file(tmp_path, text, name='roster.csv'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def names(conn):
+    return [name for (name,) in conn.execute('SELECT name FROM attendees ORDER BY name')]
+
+
+@pytest.mark.parametrize('heading', ['name', 'Full Name', 'Guest'])
+def test_one_column_header_is_not_a_guest(conn, tmp_path, heading):
+    path = roster_file(tmp_path, f"{heading}\nAnn Lee\nBob Stone\n")
+    summary = roster_io.import_roster(conn, path)
+    assert summary.inserted == 2
+    assert names(conn) == ['Ann Lee', 'Bob Stone']
+
+
+def test_no_header_imports_every_row(conn, tmp_path):
+    path = roster_file(tmp_path, "Ann Lee\nBob Stone\n")
+    summary = roster_io.import_roster(conn, path, header=False)
+    assert summary.inserted == 2
+    assert names(conn) == ['Ann Lee', 'Bob Stone']
+
+
+def test_wide_header_without_name_column_needs_column(conn, tmp_path):
+    path = roster_file(tmp_path, "Guest,Table\nAnn Lee,4\n")
+    with pytest.raises(ValueError):
+        roster_io.import_roster(conn, path)
+    summary = roster_io.import_roster(conn, path, column='guest')
+    assert summary.inserted == 1
+    assert names(conn) == ['Ann Lee']
+
+
+def test_duplicates_are_counted_not_inserted(conn, tmp_path):
+    attendance_db.add_attendee(conn, 'Ann Lee')
+    path = roster_file(tmp_path, "name\nann  lee\nBob Stone\nBOB STONE\n\n")
+    summary = roster_io.import_roster(conn, path)
+    assert (summary.inserted, summary.duplicates, summary.rejected_count) == (1, 2, 1)
+    assert names(conn) == ['Ann Lee', 'Bob Stone']